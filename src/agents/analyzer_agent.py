@@ -1,7 +1,9 @@
 import scripts.main as main
-from src.core.analyzer import InfrastructureAnalyzer
+from src.core.analyzer import InfrastructureAnalyzer, load_fields
+from src.core.frame import load_frame
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END, MessagesState, START
+from langgraph.config import get_stream_writer
 from openai import OpenAI
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
@@ -39,8 +41,8 @@ def run_analyzer(input_file: str = "data/outputs/realtime_metrics.json") -> str:
 
     try:
         analyzer = InfrastructureAnalyzer()
-        metrics = analyzer.load_data(input_file)
-        analysis = analyzer.detect_anomalies(metrics)
+        # columns are parsed once per file version and shared by repeated calls
+        analysis = analyzer.analyze_frame(load_frame(input_file))
 
         result = f"\nAnalysis Summary:\n"
         result += f"  - Total metrics analyzed: {analysis['total_metrics']}\n"
@@ -66,6 +68,15 @@ def run_analyzer(input_file: str = "data/outputs/realtime_metrics.json") -> str:
         return f"Error analyzing metrics: {str(e)}"
 
 
+def emit_recommendation(recommendation):
+    """Forward a streamed recommendation to graph.stream(stream_mode="custom") consumers."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"recommendation": recommendation})
+
+
 @tool
 def run_full_pipeline(input_file: str = "data/outputs/realtime_metrics.json") -> str:
     """
@@ -82,7 +93,7 @@ def run_full_pipeline(input_file: str = "data/outputs/realtime_metrics.json") ->
         with redirect_stdout(f):
             # Set up sys.argv for main.py
             sys.argv = ['main.py', input_file]
-            main.main()
+            main.main(on_recommendation=emit_recommendation)
 
         output = f.getvalue()
         return output
@@ -113,25 +124,16 @@ def generate_metric_graph(metric_name: str, input_file: str = "data/outputs/real
         return f"Error: File {input_file} not found"
 
     try:
-        with open(input_file, 'r') as f:
-            data = json.load(f)
+        # only the plotted metric is validated and kept
+        records = load_fields(input_file, [metric_name])
 
-        if not data:
+        if not records:
             return f"Error: No data found in {input_file}. Please run the realtime analyzer first to collect some data."
 
-        df = pd.DataFrame(data)
-
-        if 'service_status' in df.columns:
-            try:
-                df['database_status'] = df['service_status'].apply(lambda x: x['database'])
-                df['api_gateway_status'] = df['service_status'].apply(lambda x: x['api_gateway'])
-                df['cache_status'] = df['service_status'].apply(lambda x: x['cache'])
-
-                df.drop(columns=['service_status'], inplace=True)
-            except BaseException:
-                pass
-
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime([record.timestamp for record in records]),
+            metric_name: [getattr(record, metric_name) for record in records]
+        })
         df = df.sort_values(by='timestamp', ascending=True).reset_index(drop=True)
 
         plt.figure(figsize=(12, 6))
@@ -257,7 +259,10 @@ The monitoring will continue running in the background until you close this appl
         return f"Error starting realtime analyzer: {str(e)}"
 
 
-llm = ChatOpenAI(model="gpt-4o")
+llm = ChatOpenAI(model="gpt-4o", streaming=True)
+
+# Nodes whose LLM tokens are user-facing and can be rendered as they arrive.
+STREAMING_NODES = {"general_node"}
 llm_with_tools = llm.bind_tools([
     run_analyzer,
     run_full_pipeline,
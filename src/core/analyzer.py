@@ -1,12 +1,146 @@
+import gc
+import heapq
 import json
-from collections import defaultdict
-from typing import List, Dict, Any
-from datetime import datetime
-from .models import Metrics
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from operator import itemgetter
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Set, Tuple
+from datetime import datetime, timedelta
+from statistics import median
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pydantic import BaseModel, ValidationError
+from .correlation import CorrelationAnalyzer, merge_correlated_pairs
+from .detectors import RollingDetector, build_default_detectors, metric_columns
+from .merge_reader import MergeReader
+from .frame import MetricsFrame
+from .models import Metrics, list_adapter, projected_model
+from .incidents import IncidentAggregator, TopAnomalies, rank_incidents
+from .sinks import open_sink
+from .sketches import PercentileTracker
+from .watermark import ReorderBuffer
+
+
+# Metrics fields read by the threshold and window rules and the ingestion summary
+RULE_FIELDS = {
+    'cpu_usage', 'memory_usage', 'latency_ms', 'disk_usage', 'network_in_kbps', 'network_out_kbps',
+    'error_rate', 'temperature_celsius', 'service_status', 'top_processes'
+}
+
+# samples per host checked before their anomalies are time-sorted and flushed
+CHUNK_SIZE = 4096
+
+
+@contextmanager
+def paused_gc():
+    """Pause the cyclic garbage collector: bulk runs create millions of small
+    acyclic objects that would otherwise trigger repeated full collections.
+
+    This affects the whole process, so it is only for command-line runs,
+    never for library calls that may share the process with other threads.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def load_fields(filepath: str, fields: Iterable[str]) -> List[Any]:
+    """Records of a metrics file with only ``fields`` (plus host and timestamp)
+    validated and kept; invalid records are skipped."""
+    model = projected_model(frozenset(fields))
+    with open(filepath, 'rb') as f:
+        payload = f.read()
+    try:
+        return list_adapter(model).validate_json(payload)
+    except ValidationError:
+        records = []
+        for record in json.loads(payload):
+            try:
+                records.append(model(**record))
+            except Exception:
+                continue
+        return records
+
+
+class DetectionState:
+    """Counters and incidents for one detection run.
+
+    Checks append to ``anomalies``; ``flush`` then feeds the new entries to
+    the incident aggregator, the ``top`` heap and the optional ``sink``
+    (any object with a ``write(anomaly)`` method). Unless ``keep_anomalies``
+    is set, the raw list is emptied after each flush and only the first
+    ``sample_size`` entries are kept. While ``deferred`` is set, flushes
+    wait; ``flush(in_order=True)`` sorts the waiting entries by timestamp
+    first, as the incident aggregator expects.
+    """
+
+    def __init__(self, interval_limit: Optional[int] = None, keep_anomalies: bool = False, sample_size: int = 10,
+                 top: Optional[TopAnomalies] = None, sink=None,
+                 percentile_fields: Sequence[str] = ('latency_ms', 'error_rate')):
+        self.total_metrics = 0
+        self.anomalies = []
+        self.keep_anomalies = keep_anomalies
+        self.top = top or TopAnomalies()
+        self.sink = sink
+        self.sample_size = sample_size
+        self.samples = []
+        self.total_anomalies = 0
+        self.flushed = 0
+        self.deferred = False
+        self.incidents = IncidentAggregator()
+        self.service_issues = defaultdict(int)
+        self.severity_count = defaultdict(int)
+        self.anomaly_types = defaultdict(int)
+        self.intervals = deque(maxlen=interval_limit) if interval_limit else []
+        self.percentiles = PercentileTracker(percentile_fields)
+
+    def flush(self, in_order: bool = False):
+        if self.deferred:
+            return
+        new = self.anomalies[self.flushed:]
+        if in_order:
+            new.sort(key=itemgetter('timestamp'))
+            self.anomalies[self.flushed:] = new
+        self.incidents.add_many(new)
+        self.top.add_many(new)
+        if self.sink is not None:
+            for anomaly in new:
+                self.sink.write(anomaly)
+        self.total_anomalies += len(new)
+        if len(self.samples) < self.sample_size:
+            self.samples.extend(new[:self.sample_size - len(self.samples)])
+        if self.keep_anomalies:
+            self.flushed = len(self.anomalies)
+        else:
+            self.anomalies.clear()
+            self.flushed = 0
+
+    def max_gap(self) -> Optional[timedelta]:
+        return median(self.intervals) * 1.5 if self.intervals else None
 
 
 class InfrastructureAnalyzer:
-    def __init__(self):
+    """Threshold, window and detector checks over ``Metrics`` series.
+
+    Results hold counters, incidents and the ``top_k`` highest ranked
+    anomalies (``top_by`` is ``'severity'`` or ``'recent'``); every anomaly
+    also goes to ``sink`` when one is given. The full anomaly list is only
+    kept with ``keep_anomalies``, otherwise memory does not grow with the
+    number of anomalies. ``rules``, ``percentile_fields`` and ``correlation``
+    turn the other stages off; ingestion then only decodes the fields the
+    remaining stages read (see ``required_fields``).
+    """
+
+    def __init__(self, detectors: Optional[List[RollingDetector]] = None, keep_anomalies: bool = False,
+                 top_k: Optional[int] = None, top_by: str = 'severity', sink=None, rules: bool = True,
+                 percentile_fields: Sequence[str] = ('latency_ms', 'error_rate'), correlation: bool = True):
         self.thresholds = {
             'cpu': {'warning': 70, 'high': 80, 'critical': 90},
             'memory': {'warning': 70, 'high': 80, 'critical': 90},
@@ -15,9 +149,42 @@ class InfrastructureAnalyzer:
             'latency': {'warning': 200, 'high': 300, 'critical': 500},
             'disk': {'warning': 70, 'high': 80, 'critical': 90}
         }
+        self.window_size = 10
+        self.detectors = build_default_detectors() if detectors is None else list(detectors)
+        self.keep_anomalies = keep_anomalies
+        self.top_k = int(os.getenv('ANALYZER_TOP_K', '20')) if top_k is None else top_k
+        self.top_by = top_by
+        self.sink = sink
+        self.percentiles = None
+        self.percentile_fields = tuple(percentile_fields)
+        self.correlation = CorrelationAnalyzer() if correlation else None
+        self.rules = rules
         self.valid_records = 0
         self.invalid_records = 0
         self.critical_metrics_count = 0
+        self.start_time = None
+        self.end_time = None
+
+    @classmethod
+    def for_detectors(cls, detectors: List[RollingDetector], **kwargs) -> 'InfrastructureAnalyzer':
+        """Analyzer that only runs ``detectors``: no threshold rules, correlation
+        or percentiles, so ingestion only validates and keeps the fields the
+        detectors declare."""
+        return cls(detectors=detectors, rules=False, percentile_fields=(), correlation=False, **kwargs)
+
+    def required_fields(self) -> Set[str]:
+        """Metrics fields read by the enabled stages; ingestion skips the rest."""
+        fields = set(self.percentile_fields).union(*(detector.fields for detector in self.detectors))
+        if self.rules:
+            fields |= RULE_FIELDS
+        if self.correlation is not None:
+            fields.update(self.correlation.fields)
+        return fields
+
+    @property
+    def model(self):
+        """``Metrics``, or a projection of it when the enabled stages need fewer fields."""
+        return projected_model(frozenset(self.required_fields()))
 
     def load_data(self, filepath: str) -> List[Metrics]:
         print("\n=== Data Ingestion Node ===")
@@ -28,399 +195,775 @@ class InfrastructureAnalyzer:
 
         print(f"Loaded {len(raw_data)} records from {filepath}")
 
-        metrics = []
-        start_time = datetime.now()
+        return self.load_records(raw_data)
 
+    def load_records(self, raw_data: List[Dict[str, Any]]) -> List[Metrics]:
         print("Processing batches...")
-        for i, record in enumerate(raw_data):
+        metrics = list(self.validate_stream(raw_data))
+
+        print("\nProcessing Complete!")
+        print(f"  - Total records: {len(raw_data)}")
+        self._print_ingestion_summary()
+
+        return metrics
+
+    def load_stream(self, filepaths: List[str]) -> Iterator[Metrics]:
+        """Lazily merge several time-sorted report files into one validated,
+        time-ordered stream for ``detect_anomalies_stream``."""
+        print("\n=== Data Ingestion Node ===")
+        print(f"Merging {len(filepaths)} sources: {', '.join(filepaths)}")
+
+        reader = MergeReader(filepaths)
+        yield from self.validate_stream(reader)
+
+        print("\nMerge Complete!")
+        print(f"  - Records merged: {reader.records}")
+        print(f"  - Duplicate timestamps dropped: {reader.duplicates}")
+        if reader.unsorted:
+            print(f"  - Warning: {reader.unsorted} records were out of order within their source")
+        self._print_ingestion_summary()
+
+    def validate_stream(self, records: Iterable[Any]) -> Iterator[Metrics]:
+        """Validate raw records against ``model`` (already validated records pass
+        through, anything else counts as invalid) and track the critical count
+        and time range."""
+        self.start_time = None
+        self.end_time = None
+        model = self.model
+
+        for i, record in enumerate(records):
             try:
-                metric = Metrics(**record)
-                metrics.append(metric)
+                if isinstance(record, dict):
+                    metric = model(**record)
+                elif isinstance(record, BaseModel):
+                    metric = record
+                else:
+                    raise TypeError(f"expected an object, got {type(record).__name__}")
                 self.valid_records += 1
 
-                if (metric.cpu_usage > 90 or metric.memory_usage > 90 or
-                    metric.temperature_celsius > 80 or metric.error_rate > 0.1 or
-                    metric.service_status.api_gateway == 'offline' or
-                    metric.service_status.database == 'offline' or
-                        metric.service_status.cache == 'offline'):
+                if self.rules and self._is_critical(metric):
                     self.critical_metrics_count += 1
 
             except Exception as e:
                 self.invalid_records += 1
                 if self.invalid_records <= 3:
                     print(f"  - Validation error in record {i}: {str(e)[:50]}...")
+                continue
 
-        print("\nProcessing Complete!")
-        print(f"  - Total records: {len(raw_data)}")
+            if self.start_time is None or metric.timestamp < self.start_time:
+                self.start_time = metric.timestamp
+            if self.end_time is None or metric.timestamp > self.end_time:
+                self.end_time = metric.timestamp
+
+            yield metric
+
+    @staticmethod
+    def _is_critical(metric: Metrics) -> bool:
+        return (metric.cpu_usage > 90 or metric.memory_usage > 90 or
+                metric.temperature_celsius > 80 or metric.error_rate > 0.1 or
+                metric.service_status.api_gateway == 'offline' or
+                metric.service_status.database == 'offline' or
+                metric.service_status.cache == 'offline')
+
+    def _print_ingestion_summary(self):
         print(f"  - Valid records: {self.valid_records}")
         print(f"  - Invalid records: {self.invalid_records}")
         print(f"  - Critical metrics: {self.critical_metrics_count}")
 
-        if metrics:
-            timestamps = [m.timestamp for m in metrics]
-            start_time = min(timestamps)
-            end_time = max(timestamps)
-            duration = end_time - start_time
-
+        if self.start_time is not None:
             print("\nTime Range:")
-            print(f"  - Start: {start_time}")
-            print(f"  - End: {end_time}")
-            print(f"  - Duration: {duration}")
+            print(f"  - Start: {self.start_time}")
+            print(f"  - End: {self.end_time}")
+            print(f"  - Duration: {self.end_time - self.start_time}")
 
-        return metrics
+    def analyze_file(self, filepath: str, verbose: bool = True) -> Dict[str, Any]:
+        """``load_data`` followed by ``detect_anomalies``, fused.
 
-    def detect_anomalies(self, metrics: List[Metrics]) -> Dict[str, Any]:
-        print("\n=== Anomaly Detection Node ===")
+        The file is parsed and validated natively in one call, decoding only
+        the fields in ``required_fields``; when it holds invalid records, it
+        falls back to per-record validation.
+        """
+        print("\n=== Data Ingestion Node ===")
+        print(f"Loading data from {filepath}...")
 
-        anomalies = []
-        service_issues = defaultdict(int)
-        severity_count = defaultdict(int)
-        anomaly_types = defaultdict(int)
+        with open(filepath, 'rb') as f:
+            payload = f.read()
+        try:
+            records = list_adapter(self.model).validate_json(payload)
+        except ValidationError:
+            records = json.loads(payload)
+        del payload
+
+        print(f"Loaded {len(records)} records from {filepath}")
+        return self.analyze_records(records, verbose)
+
+    def analyze_records(self, records: List[Any], verbose: bool = True) -> Dict[str, Any]:
+        """``load_records`` followed by ``detect_anomalies`` in a single pass.
+
+        Each record is validated, counted into the ingestion summary and
+        appended to its host's series in the same loop; the sampling
+        intervals then fix the incident gap, and the rule, window, detector
+        and correlation stages run on those series (see ``_detect_series``).
+        Results are identical to the two-step path.
+        """
+        print("Processing batches...")
+        state = self._new_state()
 
+        host_series = {}
+        first_seen = {}
+        unsorted = set()
+        for index, metric in enumerate(self.validate_stream(records)):
+            series = host_series.get(metric.host)
+            if series is None:
+                host_series[metric.host] = [metric]
+                first_seen[metric.host] = (metric.timestamp, index)
+                continue
+            if metric.timestamp < series[-1].timestamp:
+                unsorted.add(metric.host)
+                if metric.timestamp < first_seen[metric.host][0]:
+                    first_seen[metric.host] = (metric.timestamp, index)
+            series.append(metric)
+
+        print("\nProcessing Complete!")
+        print(f"  - Total records: {len(records)}")
+        self._print_ingestion_summary()
+        if verbose:
+            print("\n=== Anomaly Detection Node ===")
+
+        # same host order and per-host order as the stable time sort in detect_anomalies
+        for host in unsorted:
+            host_series[host].sort(key=lambda m: m.timestamp)
+        host_series = {host: host_series[host] for host in sorted(host_series, key=first_seen.__getitem__)}
+        for series in host_series.values():
+            state.intervals.extend(b.timestamp - a.timestamp for a, b in zip(series, series[1:]))
+        state.incidents.max_gap = state.max_gap()
+
+        return self._detect_series(state, host_series, verbose)
+
+    def analyze_frame(self, frame: Any, verbose: bool = True) -> Dict[str, Any]:
+        """``analyze_records`` for samples already held as columns: a pandas
+        DataFrame, a mapping of field -> array or a ``MetricsFrame``.
+
+        Columns are checked as a whole instead of validating every sample
+        (samples missing a value in a needed column, and the frame's
+        ``skipped`` records, count as invalid). The per-sample and window
+        rules read lightweight rows; the detector, percentile and correlation
+        stages read the NumPy columns, in place when the frame holds one host
+        in time order.
+        """
+        if not isinstance(frame, MetricsFrame):
+            frame = MetricsFrame(frame)
+        required = self.required_fields()
+        missing = frame.missing(required) if len(frame) else []
+        if missing:
+            raise ValueError(f"Metrics frame is missing columns: {', '.join(missing)}")
+
+        print("Processing batches...")
+        complete = frame.complete(required)
+        valid = int(complete.sum())
+        self.valid_records += valid
+        self.invalid_records += len(frame) - valid + frame.skipped
+        total = len(frame) + frame.skipped
+        if valid < len(frame):
+            frame = frame.take(np.flatnonzero(complete))
+
+        state = self._new_state()
+        rows = frame.rows()
+        if self.rules:
+            self.critical_metrics_count += sum(map(self._is_critical, rows))
+        self.start_time = min(frame.timestamps, default=None)
+        self.end_time = max(frame.timestamps, default=None)
+
+        print("\nProcessing Complete!")
+        print(f"  - Total records: {total}")
+        self._print_ingestion_summary()
+        if verbose:
+            print("\n=== Anomaly Detection Node ===")
+
+        # same host order and per-host order as the stable time sort in detect_anomalies
+        groups = defaultdict(list)
+        for index, host in enumerate(frame.hosts):
+            groups[host].append(index)
+        orders = {}
+        for host, indices in groups.items():
+            indices = np.asarray(indices)
+            orders[host] = indices[np.argsort(frame.epochs[indices], kind='stable')]
+        hosts = sorted(orders, key=lambda host: (frame.timestamps[orders[host][0]], orders[host][0]))
+
+        host_series = {}
+        series_columns = {}
+        for host in hosts:
+            order = orders[host]
+            in_place = len(order) == len(frame) and bool(np.all(order[1:] > order[:-1]))
+            series = host_series[host] = [rows[i] for i in order]
+            series_columns[host] = ((frame.columns, frame.epochs) if in_place else
+                                    (frame.select(order), frame.epochs[order]))
+            state.intervals.extend(b.timestamp - a.timestamp for a, b in zip(series, series[1:]))
+        state.incidents.max_gap = state.max_gap()
+
+        return self._detect_series(state, host_series, verbose, series_columns)
+
+    def detect_anomalies(self, metrics: List[Metrics], verbose: bool = True) -> Dict[str, Any]:
+        if verbose:
+            print("\n=== Anomaly Detection Node ===")
+
+        state = self._new_state()
+
+        sorted_metrics = sorted(metrics, key=lambda m: m.timestamp)
+        host_series = defaultdict(list)
+        for metric in sorted_metrics:
+            host_series[metric.host].append(metric)
+        for series in host_series.values():
+            state.intervals.extend(b.timestamp - a.timestamp for a, b in zip(series, series[1:]))
+        state.incidents.max_gap = state.max_gap()
+
+        return self._detect_series(state, host_series, verbose)
+
+    def _detect_series(self, state: DetectionState, host_series: Dict[Optional[str], List[Metrics]], verbose: bool,
+                       series_columns: Optional[Dict[Optional[str], Tuple[Dict[str, np.ndarray], np.ndarray]]] = None
+                       ) -> Dict[str, Any]:
+        """Rule, window, detector, percentile and correlation stages over time-sorted per-host
+        series; ``series_columns`` gives each host's columns and epochs when already built."""
+        fields = set(state.percentiles.fields).union(*(detector.fields for detector in self.detectors))
+        if self.rules:
+            fields.add('cpu_usage')
+        if self.correlation is not None:
+            fields.update(self.correlation.fields)
+        host_columns = {}
+        host_epochs = {}
+
+        for host, series in host_series.items():
+            if series_columns is not None:
+                all_columns, epochs = series_columns[host]
+                columns = {field: all_columns[field] for field in fields}
+            else:
+                columns = metric_columns(series, fields)
+                epochs = np.fromiter((m.timestamp.timestamp() for m in series), dtype=float, count=len(series))
+            self._check_series(series, columns, state)
+            state.percentiles.add_columns(epochs, columns, host)
+            if self.correlation is not None:
+                host_columns[host] = columns
+                host_epochs[host] = epochs
+
+        results = self._finish(state, verbose)
+        if self.correlation is not None:
+            self.correlation.annotate(results['incidents'], host_columns, host_epochs)
+            results['correlated_metrics'] = self.correlation.correlated_pairs(host_columns)
+            if verbose:
+                self._print_leading_indicators(results['incidents'])
+        return results
+
+    def _check_series(self, series: List[Metrics], columns: Dict[str, np.ndarray], state: DetectionState):
+        """Rules, windows and detectors over one host's time-sorted series.
+
+        Stages run one after the other on chunks of ``CHUNK_SIZE`` samples;
+        each chunk's anomalies are time-sorted before they are flushed, so
+        incidents see every (type, host) in time order while only one chunk
+        of anomalies is held.
+        """
+        windows = self._window_candidates(columns['cpu_usage']) if self.rules else []
+        next_window = 0
+        detected = heapq.merge(*(detector.detect_batch(series, columns) for detector in self.detectors),
+                               key=itemgetter('timestamp'))
+        pending = next(detected, None)
+
+        for start in range(0, len(series), CHUNK_SIZE):
+            chunk = series[start:start + CHUNK_SIZE]
+            end = start + len(chunk)
+            state.deferred = True
+            for metric in chunk:
+                self._check_metric(metric, state)
+            while next_window < len(windows) and windows[next_window] + self.window_size <= end:
+                i = windows[next_window]
+                self._check_window(series[i:i + self.window_size], state)
+                next_window += 1
+            last = chunk[-1].timestamp.isoformat()
+            found = []
+            while pending is not None and pending['timestamp'] <= last:
+                found.append(pending)
+                pending = next(detected, None)
+            self._record(found, state)
+            state.deferred = False
+            state.flush(in_order=True)
+
+        if pending is not None:
+            self._record([pending, *detected], state)
+
+    def _print_leading_indicators(self, incidents: List[Dict[str, Any]]):
+        explained = [incident for incident in incidents if 'leading_indicators' in incident]
+        if not explained:
+            return
+        print("\nLeading Indicators:")
+        for incident in explained[:5]:
+            hints = ', '.join(f"{hint['field']} ({hint['lag_seconds']}s earlier, r={hint['correlation']:+.2f})"
+                              for hint in incident['leading_indicators'])
+            print(f"  - {incident['type']} on {incident.get('host', 'unknown')} at {incident['start']}: {hints}")
+
+    def detect_anomalies_stream(self, metrics: Iterable[Metrics], verbose: bool = True,
+                                allowed_lateness: Optional[timedelta] = None,
+                                max_buffered: int = 10000) -> Dict[str, Any]:
+        """Single-pass variant of ``detect_anomalies``.
+
+        Only the last ``window_size`` samples of each host are kept, so
+        memory does not grow with the number of samples. Input is assumed to
+        be time-ordered unless ``allowed_lateness`` is given, in which case
+        samples go through a per-host ``ReorderBuffer`` first and samples
+        later than the watermark are dropped and counted. Incidents are
+        merged as anomalies are raised, with the gap re-estimated from the
+        recent sampling intervals as the stream goes.
+        """
+        if verbose:
+            print("\n=== Streaming Anomaly Detection Node ===")
+
+        state = self._new_state(interval_limit=10000)
+        windows = defaultdict(lambda: deque(maxlen=self.window_size))
+        for detector in self.detectors:
+            detector.reset()
+
+        def process(metric):
+            window = windows[metric.host]
+            if window:
+                state.intervals.append(metric.timestamp - window[-1].timestamp)
+            if state.total_metrics < 100 or state.total_metrics % 1000 == 0:
+                state.incidents.max_gap = state.max_gap()
+
+            self._check_metric(metric, state)
+            state.percentiles.add(metric)
+            for detector in self.detectors:
+                self._record(detector.update(metric), state)
+
+            window.append(metric)
+            if self.rules and len(window) == self.window_size:
+                self._check_window(list(window), state)
+
+        if allowed_lateness is None:
+            for metric in metrics:
+                process(metric)
+            return self._finish(state, verbose)
+
+        reorder = ReorderBuffer(allowed_lateness, max_buffered=max_buffered)
         for metric in metrics:
-            if metric.cpu_usage >= self.thresholds['cpu']['critical']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'cpu_high',
-                    'severity': 'critical',
-                    'value': metric.cpu_usage,
-                    'description': f'CPU usage critically high at {metric.cpu_usage}%'
-                })
-                anomaly_types['cpu_high'] += 1
-                severity_count['critical'] += 1
-            elif metric.cpu_usage >= self.thresholds['cpu']['high']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'cpu_high',
-                    'severity': 'high',
-                    'value': metric.cpu_usage,
-                    'description': f'CPU usage high at {metric.cpu_usage}%'
-                })
-                anomaly_types['cpu_high'] += 1
-                severity_count['high'] += 1
+            for ready in reorder.push(metric):
+                process(ready)
+        for ready in reorder.flush():
+            process(ready)
 
-            elif metric.cpu_usage >= self.thresholds['cpu']['warning']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'cpu_high',
-                    'severity': 'warning',
-                    'value': metric.cpu_usage,
-                    'description': f'CPU usage high at {metric.cpu_usage}%'
-                })
-                anomaly_types['cpu_high'] += 1
-                severity_count['warning'] += 1
+        watermark_stats = reorder.stats()
+        if verbose:
+            print(f"\nWatermark (allowed lateness {allowed_lateness.total_seconds():g}s):")
+            print(f"  - Samples reordered: {watermark_stats['reordered_samples']}")
+            print(f"  - Samples dropped as too late: {watermark_stats['late_samples_dropped']}")
+            if watermark_stats['forced_releases']:
+                print(f"  - Released early (buffer full): {watermark_stats['forced_releases']}")
 
-            if metric.memory_usage >= self.thresholds['memory']['critical']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'memory_high',
-                    'severity': 'critical',
-                    'value': metric.memory_usage,
-                    'description': f'Memory usage critically high at {metric.memory_usage}%'
-                })
-                anomaly_types['memory_high'] += 1
-                severity_count['critical'] += 1
-            elif metric.memory_usage >= self.thresholds['memory']['high']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'memory_high',
-                    'severity': 'high',
-                    'value': metric.memory_usage,
-                    'description': f'Memory usage high at {metric.memory_usage}%'
-                })
-                anomaly_types['memory_high'] += 1
-                severity_count['high'] += 1
+        results = self._finish(state, verbose)
+        results['late_samples_dropped'] = watermark_stats['late_samples_dropped']
+        results['watermark'] = watermark_stats
+        return results
 
-            elif metric.memory_usage >= self.thresholds['memory']['warning']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'memory_high',
-                    'severity': 'warning',
-                    'value': metric.memory_usage,
-                    'description': f'Memory usage high at {metric.memory_usage}%'
-                })
-                anomaly_types['memory_high'] += 1
-                severity_count['warning'] += 1
+    def _new_state(self, interval_limit: Optional[int] = None) -> DetectionState:
+        return DetectionState(interval_limit=interval_limit, keep_anomalies=self.keep_anomalies,
+                              top=TopAnomalies(self.top_k, self.top_by), sink=self.sink,
+                              percentile_fields=self.percentile_fields)
 
-            if metric.temperature_celsius >= self.thresholds['temperature']['critical']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'temperature_high',
-                    'severity': 'critical',
-                    'value': metric.temperature_celsius,
-                    'description': f'Temperature critically high at {metric.temperature_celsius}°C'
-                })
-                anomaly_types['temperature_high'] += 1
-                severity_count['critical'] += 1
-            elif metric.temperature_celsius >= self.thresholds['temperature']['high']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'temperature_high',
-                    'severity': 'high',
-                    'value': metric.temperature_celsius,
-                    'description': f'Temperature high at {metric.temperature_celsius}°C'
-                })
-                anomaly_types['temperature_high'] += 1
-                severity_count['high'] += 1
+    def _check_metric(self, metric: Metrics, state: DetectionState):
+        state.total_metrics += 1
+        if not self.rules:
+            return
+        timestamp = metric.timestamp.isoformat()
+        thresholds = self.thresholds
+        anomalies = state.anomalies
+        anomaly_types = state.anomaly_types
+        severity_count = state.severity_count
+        service_issues = state.service_issues
 
-            elif metric.temperature_celsius >= self.thresholds['temperature']['warning']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'temperature_high',
-                    'severity': 'warning',
-                    'value': metric.temperature_celsius,
-                    'description': f'Temperature high at {metric.temperature_celsius}°C'
-                })
-                anomaly_types['temperature_high'] += 1
-                severity_count['warning'] += 1
+        first_new_anomaly = len(anomalies)
 
-            if metric.error_rate >= self.thresholds['error_rate']['critical']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'error_rate_high',
-                    'severity': 'critical',
-                    'value': metric.error_rate,
-                    'description': f'Error rate critically high at {metric.error_rate:.2%}'
-                })
-                anomaly_types['error_rate_high'] += 1
-                severity_count['critical'] += 1
-            elif metric.error_rate >= self.thresholds['error_rate']['high']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'error_rate_high',
-                    'severity': 'high',
-                    'value': metric.error_rate,
-                    'description': f'Error rate high at {metric.error_rate:.2%}'
-                })
-                anomaly_types['error_rate_high'] += 1
-                severity_count['high'] += 1
+        if metric.cpu_usage >= thresholds['cpu']['critical']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'cpu_high',
+                'severity': 'critical',
+                'value': metric.cpu_usage,
+                'description': f'CPU usage critically high at {metric.cpu_usage}%'
+            })
+            anomaly_types['cpu_high'] += 1
+            severity_count['critical'] += 1
+        elif metric.cpu_usage >= thresholds['cpu']['high']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'cpu_high',
+                'severity': 'high',
+                'value': metric.cpu_usage,
+                'description': f'CPU usage high at {metric.cpu_usage}%'
+            })
+            anomaly_types['cpu_high'] += 1
+            severity_count['high'] += 1
 
-            elif metric.error_rate >= self.thresholds['error_rate']['warning']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'error_rate_high',
-                    'severity': 'warning',
-                    'value': metric.error_rate,
-                    'description': f'Error rate high at {metric.error_rate:.2%}'
-                })
-                anomaly_types['error_rate_high'] += 1
-                severity_count['warning'] += 1
+        elif metric.cpu_usage >= thresholds['cpu']['warning']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'cpu_high',
+                'severity': 'warning',
+                'value': metric.cpu_usage,
+                'description': f'CPU usage high at {metric.cpu_usage}%'
+            })
+            anomaly_types['cpu_high'] += 1
+            severity_count['warning'] += 1
 
-            if metric.disk_usage >= self.thresholds['disk']['critical']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'disk_high',
-                    'severity': 'critical',
-                    'value': metric.disk_usage,
-                    'description': f'Disk usage critically high at {metric.disk_usage}%'
-                })
-                anomaly_types['disk_high'] += 1
-                severity_count['critical'] += 1
+        if metric.memory_usage >= thresholds['memory']['critical']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'memory_high',
+                'severity': 'critical',
+                'value': metric.memory_usage,
+                'description': f'Memory usage critically high at {metric.memory_usage}%'
+            })
+            anomaly_types['memory_high'] += 1
+            severity_count['critical'] += 1
+        elif metric.memory_usage >= thresholds['memory']['high']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'memory_high',
+                'severity': 'high',
+                'value': metric.memory_usage,
+                'description': f'Memory usage high at {metric.memory_usage}%'
+            })
+            anomaly_types['memory_high'] += 1
+            severity_count['high'] += 1
 
-            elif metric.disk_usage >= self.thresholds['disk']['warning']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'disk_high',
-                    'severity': 'warning',
-                    'value': metric.disk_usage,
-                    'description': f'Disk usage high at {metric.disk_usage}%'
-                })
-                anomaly_types['disk_high'] += 1
-                severity_count['warning'] += 1
+        elif metric.memory_usage >= thresholds['memory']['warning']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'memory_high',
+                'severity': 'warning',
+                'value': metric.memory_usage,
+                'description': f'Memory usage high at {metric.memory_usage}%'
+            })
+            anomaly_types['memory_high'] += 1
+            severity_count['warning'] += 1
 
-            if metric.latency_ms >= self.thresholds['latency']['critical']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'latency_high',
-                    'severity': 'critical',
-                    'value': metric.latency_ms,
-                    'description': f'Latency critically high at {metric.latency_ms}ms'
-                })
-                anomaly_types['latency_high'] += 1
-                severity_count['critical'] += 1
+        if metric.temperature_celsius >= thresholds['temperature']['critical']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'temperature_high',
+                'severity': 'critical',
+                'value': metric.temperature_celsius,
+                'description': f'Temperature critically high at {metric.temperature_celsius}°C'
+            })
+            anomaly_types['temperature_high'] += 1
+            severity_count['critical'] += 1
+        elif metric.temperature_celsius >= thresholds['temperature']['high']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'temperature_high',
+                'severity': 'high',
+                'value': metric.temperature_celsius,
+                'description': f'Temperature high at {metric.temperature_celsius}°C'
+            })
+            anomaly_types['temperature_high'] += 1
+            severity_count['high'] += 1
 
-            elif metric.latency_ms >= self.thresholds['latency']['warning']:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'latency_high',
-                    'severity': 'warning',
-                    'value': metric.latency_ms,
-                    'description': f'Latency high at {metric.latency_ms}ms'
-                })
-                anomaly_types['latency_high'] += 1
-                severity_count['warning'] += 1
+        elif metric.temperature_celsius >= thresholds['temperature']['warning']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'temperature_high',
+                'severity': 'warning',
+                'value': metric.temperature_celsius,
+                'description': f'Temperature high at {metric.temperature_celsius}°C'
+            })
+            anomaly_types['temperature_high'] += 1
+            severity_count['warning'] += 1
 
-            if metric.service_status.api_gateway == 'offline':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_offline',
-                    'severity': 'critical',
-                    'value': 0,
-                    'description': 'API Gateway is offline'
-                })
-                anomaly_types['service_offline'] += 1
-                severity_count['critical'] += 1
-                service_issues['api_gateway'] += 1
-            elif metric.service_status.api_gateway == 'degraded':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_degraded',
-                    'severity': 'high',
-                    'value': 0.5,
-                    'description': 'Api Gateway is degraded'
-                })
-                anomaly_types['service_degraded'] += 1
-                severity_count['high'] += 1
-                service_issues['api_gateway'] += 1
+        if metric.error_rate >= thresholds['error_rate']['critical']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'error_rate_high',
+                'severity': 'critical',
+                'value': metric.error_rate,
+                'description': f'Error rate critically high at {metric.error_rate:.2%}'
+            })
+            anomaly_types['error_rate_high'] += 1
+            severity_count['critical'] += 1
+        elif metric.error_rate >= thresholds['error_rate']['high']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'error_rate_high',
+                'severity': 'high',
+                'value': metric.error_rate,
+                'description': f'Error rate high at {metric.error_rate:.2%}'
+            })
+            anomaly_types['error_rate_high'] += 1
+            severity_count['high'] += 1
 
-            elif metric.service_status.api_gateway == 'degraded':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_degraded',
-                    'severity': 'warning',
-                    'value': 0.5,
-                    'description': 'Api Gateway is degraded'
-                })
-                anomaly_types['service_degraded'] += 1
-                severity_count['warning'] += 1
-                service_issues['api_gateway'] += 1
+        elif metric.error_rate >= thresholds['error_rate']['warning']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'error_rate_high',
+                'severity': 'warning',
+                'value': metric.error_rate,
+                'description': f'Error rate high at {metric.error_rate:.2%}'
+            })
+            anomaly_types['error_rate_high'] += 1
+            severity_count['warning'] += 1
 
-            if metric.service_status.database == 'offline':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_offline',
-                    'severity': 'critical',
-                    'value': 0,
-                    'description': 'Database is offline'
-                })
-                anomaly_types['service_offline'] += 1
-                severity_count['critical'] += 1
-                service_issues['database'] += 1
-            elif metric.service_status.database == 'degraded':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_degraded',
-                    'severity': 'high',
-                    'value': 0.5,
-                    'description': 'Database is degraded'
-                })
-                anomaly_types['service_degraded'] += 1
-                severity_count['high'] += 1
-                service_issues['database'] += 1
+        if metric.disk_usage >= thresholds['disk']['critical']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'disk_high',
+                'severity': 'critical',
+                'value': metric.disk_usage,
+                'description': f'Disk usage critically high at {metric.disk_usage}%'
+            })
+            anomaly_types['disk_high'] += 1
+            severity_count['critical'] += 1
 
-            elif metric.service_status.database == 'degraded':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_degraded',
-                    'severity': 'warning',
-                    'value': 0.5,
-                    'description': 'Database is degraded'
-                })
-                anomaly_types['service_degraded'] += 1
-                severity_count['warning'] += 1
-                service_issues['database'] += 1
+        elif metric.disk_usage >= thresholds['disk']['warning']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'disk_high',
+                'severity': 'warning',
+                'value': metric.disk_usage,
+                'description': f'Disk usage high at {metric.disk_usage}%'
+            })
+            anomaly_types['disk_high'] += 1
+            severity_count['warning'] += 1
 
-            if metric.service_status.cache == 'offline':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_offline',
-                    'severity': 'critical',
-                    'value': 0,
-                    'description': 'Cache is offline'
-                })
-                anomaly_types['service_offline'] += 1
-                severity_count['critical'] += 1
-                service_issues['cache'] += 1
-            elif metric.service_status.cache == 'degraded':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_degraded',
-                    'severity': 'high',
-                    'value': 0.5,
-                    'description': 'Cache is degraded'
-                })
-                anomaly_types['service_degraded'] += 1
-                severity_count['high'] += 1
-                service_issues['cache'] += 1
+        if metric.latency_ms >= thresholds['latency']['critical']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'latency_high',
+                'severity': 'critical',
+                'value': metric.latency_ms,
+                'description': f'Latency critically high at {metric.latency_ms}ms'
+            })
+            anomaly_types['latency_high'] += 1
+            severity_count['critical'] += 1
 
-            elif metric.service_status.cache == 'degraded':
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'service_degraded',
-                    'severity': 'warning',
-                    'value': 0.5,
-                    'description': 'Cache is degraded'
-                })
-                anomaly_types['service_degraded'] += 1
-                severity_count['warning'] += 1
-                service_issues['cache'] += 1
+        elif metric.latency_ms >= thresholds['latency']['warning']:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'latency_high',
+                'severity': 'warning',
+                'value': metric.latency_ms,
+                'description': f'Latency high at {metric.latency_ms}ms'
+            })
+            anomaly_types['latency_high'] += 1
+            severity_count['warning'] += 1
 
-            if metric.cpu_usage > 85 and metric.memory_usage > 85:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'resource_exhaustion',
-                    'severity': 'critical',
-                    'value': (metric.cpu_usage + metric.memory_usage) / 2,
-                    'description': 'Resource exhaustion detected (CPU + Memory both > 85%)'
-                })
-                anomaly_types['resource_exhaustion'] += 1
-                severity_count['critical'] += 1
+        if metric.service_status.api_gateway == 'offline':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_offline',
+                'severity': 'critical',
+                'value': 0,
+                'description': 'API Gateway is offline'
+            })
+            anomaly_types['service_offline'] += 1
+            severity_count['critical'] += 1
+            service_issues['api_gateway'] += 1
+        elif metric.service_status.api_gateway == 'degraded':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_degraded',
+                'severity': 'high',
+                'value': 0.5,
+                'description': 'Api Gateway is degraded'
+            })
+            anomaly_types['service_degraded'] += 1
+            severity_count['high'] += 1
+            service_issues['api_gateway'] += 1
 
-            network_total = metric.network_in_kbps + metric.network_out_kbps
-            if network_total > 15000 and metric.latency_ms > 200:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'network_saturation',
-                    'severity': 'high',
-                    'value': network_total,
-                    'description': f'Network saturation detected ({network_total} kbps with {metric.latency_ms}ms latency)'
-                })
-                anomaly_types['network_saturation'] += 1
-                severity_count['high'] += 1
+        elif metric.service_status.api_gateway == 'degraded':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_degraded',
+                'severity': 'warning',
+                'value': 0.5,
+                'description': 'Api Gateway is degraded'
+            })
+            anomaly_types['service_degraded'] += 1
+            severity_count['warning'] += 1
+            service_issues['api_gateway'] += 1
 
-            if metric.temperature_celsius > 75 and metric.cpu_usage > 80:
-                anomalies.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'type': 'temperature_high',
-                    'severity': 'high',
-                    'value': metric.temperature_celsius,
-                    'description': 'Possible thermal throttling (high temp + high CPU)'
-                })
-                anomaly_types['temperature_high'] += 1
-                severity_count['high'] += 1
+        if metric.service_status.database == 'offline':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_offline',
+                'severity': 'critical',
+                'value': 0,
+                'description': 'Database is offline'
+            })
+            anomaly_types['service_offline'] += 1
+            severity_count['critical'] += 1
+            service_issues['database'] += 1
+        elif metric.service_status.database == 'degraded':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_degraded',
+                'severity': 'high',
+                'value': 0.5,
+                'description': 'Database is degraded'
+            })
+            anomaly_types['service_degraded'] += 1
+            severity_count['high'] += 1
+            service_issues['database'] += 1
 
-        sorted_metrics = sorted(metrics, key=lambda m: m.timestamp)
+        elif metric.service_status.database == 'degraded':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_degraded',
+                'severity': 'warning',
+                'value': 0.5,
+                'description': 'Database is degraded'
+            })
+            anomaly_types['service_degraded'] += 1
+            severity_count['warning'] += 1
+            service_issues['database'] += 1
+
+        if metric.service_status.cache == 'offline':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_offline',
+                'severity': 'critical',
+                'value': 0,
+                'description': 'Cache is offline'
+            })
+            anomaly_types['service_offline'] += 1
+            severity_count['critical'] += 1
+            service_issues['cache'] += 1
+        elif metric.service_status.cache == 'degraded':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_degraded',
+                'severity': 'high',
+                'value': 0.5,
+                'description': 'Cache is degraded'
+            })
+            anomaly_types['service_degraded'] += 1
+            severity_count['high'] += 1
+            service_issues['cache'] += 1
+
+        elif metric.service_status.cache == 'degraded':
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'service_degraded',
+                'severity': 'warning',
+                'value': 0.5,
+                'description': 'Cache is degraded'
+            })
+            anomaly_types['service_degraded'] += 1
+            severity_count['warning'] += 1
+            service_issues['cache'] += 1
+
+        if metric.cpu_usage > 85 and metric.memory_usage > 85:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'resource_exhaustion',
+                'severity': 'critical',
+                'value': (metric.cpu_usage + metric.memory_usage) / 2,
+                'description': 'Resource exhaustion detected (CPU + Memory both > 85%)'
+            })
+            anomaly_types['resource_exhaustion'] += 1
+            severity_count['critical'] += 1
+
+        network_total = metric.network_in_kbps + metric.network_out_kbps
+        if network_total > 15000 and metric.latency_ms > 200:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'network_saturation',
+                'severity': 'high',
+                'value': network_total,
+                'description': f'Network saturation detected ({network_total} kbps with {metric.latency_ms}ms latency)'
+            })
+            anomaly_types['network_saturation'] += 1
+            severity_count['high'] += 1
+
+        if metric.temperature_celsius > 75 and metric.cpu_usage > 80:
+            anomalies.append({
+                'timestamp': timestamp,
+                'type': 'temperature_high',
+                'severity': 'high',
+                'value': metric.temperature_celsius,
+                'description': 'Possible thermal throttling (high temp + high CPU)'
+            })
+            anomaly_types['temperature_high'] += 1
+            severity_count['high'] += 1
+
+        if metric.top_processes:
+            self._attach_culprits(metric, anomalies[first_new_anomaly:])
+        if metric.host is not None:
+            for anomaly in anomalies[first_new_anomaly:]:
+                anomaly['host'] = metric.host
+        state.flush()
 
-        window_size = 10
-        for i in range(len(sorted_metrics) - window_size + 1):
-            window = sorted_metrics[i:i + window_size]
-            avg_cpu = sum(m.cpu_usage for m in window) / window_size
-            if avg_cpu > 85:
+    def _window_candidates(self, cpu: np.ndarray) -> List[int]:
+        """Start of every window whose CPU average may exceed the trend threshold;
+        ``_check_window`` makes the exact decision, so only these need checking."""
+        if len(cpu) < self.window_size:
+            return []
+        averages = sliding_window_view(cpu, self.window_size).sum(axis=1) / self.window_size
+        return np.flatnonzero(averages > 85 - 1e-6).tolist()
+
+    def _check_window(self, window: List[Metrics], state: DetectionState):
+        anomalies = state.anomalies
+        anomaly_types = state.anomaly_types
+        severity_count = state.severity_count
+        first_new_anomaly = len(anomalies)
+
+        avg_cpu = sum(m.cpu_usage for m in window) / self.window_size
+        if avg_cpu > 85:
+            anomalies.append({
+                'timestamp': window[-1].timestamp.isoformat(),
+                'type': 'cpu_trend',
+                'severity': 'medium',
+                'value': avg_cpu,
+                'description': f'Sustained high CPU usage (avg: {avg_cpu:.1f}% over 3 hours)'
+            })
+            anomaly_types['cpu_trend'] += 1
+            severity_count['medium'] += 1
+
+            error_rates = [m.error_rate for m in window]
+            if all(error_rates[i] <= error_rates[i + 1] for i in range(len(error_rates) - 1)) and error_rates[-1] > 0.05:
                 anomalies.append({
                     'timestamp': window[-1].timestamp.isoformat(),
-                    'type': 'cpu_trend',
+                    'type': 'error_rate_high',
                     'severity': 'medium',
-                    'value': avg_cpu,
-                    'description': f'Sustained high CPU usage (avg: {avg_cpu:.1f}% over 3 hours)'
+                    'value': error_rates[-1],
+                    'description': 'Increasing error rate trend detected'
                 })
-                anomaly_types['cpu_trend'] += 1
+                anomaly_types['error_rate_high'] += 1
                 severity_count['medium'] += 1
 
-                error_rates = [m.error_rate for m in window]
-                if all(error_rates[i] <= error_rates[i + 1] for i in range(len(error_rates) - 1)) and error_rates[-1] > 0.05:
-                    anomalies.append({
-                        'timestamp': window[-1].timestamp.isoformat(),
-                        'type': 'error_rate_high',
-                        'severity': 'medium',
-                        'value': error_rates[-1],
-                        'description': 'Increasing error rate trend detected'
-                    })
-                    anomaly_types['error_rate_high'] += 1
-                    severity_count['medium'] += 1
+        host = window[-1].host
+        if host is not None:
+            for anomaly in anomalies[first_new_anomaly:]:
+                anomaly['host'] = host
+        state.flush()
+
+    def _record(self, anomalies: List[Dict[str, Any]], state: DetectionState):
+        for anomaly in anomalies:
+            state.anomalies.append(anomaly)
+            state.anomaly_types[anomaly['type']] += 1
+            state.severity_count[anomaly['severity']] += 1
+        state.flush()
+
+    def _finish(self, state: DetectionState, verbose: bool) -> Dict[str, Any]:
+        anomaly_types = state.anomaly_types
+        severity_count = state.severity_count
+        service_issues = state.service_issues
+
+        incidents = state.incidents.incidents()
+        self.percentiles = state.percentiles
+        percentiles = state.percentiles.summary()
+
+        if not verbose:
+            return self._summary(state, incidents, percentiles)
 
         print("\nAnalysis Complete!")
-        print(f"  - Metrics analyzed: {len(metrics)}")
-        print(f"  - Anomalies detected: {len(anomalies)}")
+        print(f"  - Metrics analyzed: {state.total_metrics}")
+        print(f"  - Anomalies detected: {state.total_anomalies}")
+        print(f"  - Incidents: {len(incidents)}")
 
         print("\nSeverity Distribution:")
         for severity in ['critical', 'high', 'medium', 'low']:
@@ -432,44 +975,202 @@ class InfrastructureAnalyzer:
         for atype, count in sorted_types:
             print(f"  - {atype}: {count}")
 
-        if anomalies:
+        if state.samples:
             print("\nSample Anomalies:")
             print("-" * 100)
             print(f"{'Timestamp':<28} {'Type':<18} {'Severity':<10} {'Description'}")
             print("-" * 100)
-            for anomaly in anomalies[:5]:
+            for anomaly in state.samples[:5]:
                 print(f"{anomaly['timestamp']:<28} {anomaly['type']:<18} {anomaly['severity'].upper():<10} {anomaly['description']}")
 
+        latency = percentiles['latency_ms']['overall'] if 'latency_ms' in percentiles else None
+        if latency and latency['count']:
+            print(f"\nLatency percentiles (±{self.percentiles.relative_accuracy:.0%}): "
+                  f"p50 {latency['p50']:.1f}ms, p95 {latency['p95']:.1f}ms, p99 {latency['p99']:.1f}ms")
+
+        return self._summary(state, incidents, percentiles)
+
+    def _summary(self, state: DetectionState, incidents, percentiles) -> Dict[str, Any]:
+        summary = {
+            'total_metrics': state.total_metrics,
+            'total_anomalies': state.total_anomalies,
+            'anomaly_breakdown': dict(state.anomaly_types),
+            'service_issues': dict(state.service_issues),
+            'critical_count': state.severity_count.get('critical', 0),
+            'severity_distribution': dict(state.severity_count),
+            'sample_anomalies': state.samples,
+            'top_anomalies': state.top.items(),
+            'incidents': incidents,
+            'percentiles': percentiles
+        }
+        if state.keep_anomalies:
+            summary['anomalies'] = state.anomalies
+        return summary
+
+    def detect_anomalies_by_host(self, metrics: List[Metrics], max_workers: Optional[int] = None,
+                                 top_hosts: int = 10) -> Dict[str, Any]:
+        """Run detection separately for each host and roll the results up.
+
+        Hosts are analysed in parallel worker processes. The returned dict
+        has the same keys as ``detect_anomalies`` (fleet-wide totals), plus
+        ``hosts`` (per-host results), ``top_offending_hosts`` and
+        ``anomaly_heatmap`` (anomaly type counts per host). The fleet
+        ``correlated_metrics`` merges each host's list, weighted by its windows.
+        """
+        print("\n=== Fleet Anomaly Detection Node ===")
+
+        groups = defaultdict(list)
+        for metric in metrics:
+            groups[metric.host or 'unknown'].append(metric)
+
+        hosts = list(groups)
+        print(f"Analyzing {len(metrics)} metrics across {len(hosts)} hosts...")
+
+        # workers cannot share the sink: with one, they return their anomalies for it
+        options = {'keep_anomalies': self.keep_anomalies or self.sink is not None,
+                   'top_k': self.top_k, 'top_by': self.top_by, 'rules': self.rules,
+                   'percentile_fields': self.percentile_fields, 'correlation': self.correlation is not None}
+        if len(hosts) == 1 or max_workers == 1:
+            results = [_detect_host_group(self.thresholds, self.detectors, options, groups[host]) for host in hosts]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                chunksize = max(1, len(hosts) // ((max_workers or os.cpu_count() or 1) * 4))
+                results = list(executor.map(_detect_host_group, repeat(self.thresholds), repeat(self.detectors),
+                                             repeat(options), (groups[host] for host in hosts), chunksize=chunksize))
+
+        per_host = {host: result for host, (result, _) in zip(hosts, results)}
+        if self.sink is not None:
+            for result in per_host.values():
+                anomalies = result['anomalies'] if self.keep_anomalies else result.pop('anomalies')
+                for anomaly in anomalies:
+                    self.sink.write(anomaly)
+        self.percentiles = PercentileTracker(self.percentile_fields)
+        for _, percentiles in results:
+            self.percentiles.merge(percentiles)
+        fleet = self._fleet_rollup(per_host, top_hosts)
+        fleet['percentiles'] = self.percentiles.summary()
+        if self.correlation is not None:
+            fleet['correlated_metrics'] = merge_correlated_pairs(
+                [result['correlated_metrics'] for result in per_host.values()],
+                [result['total_metrics'] // self.correlation.window for result in per_host.values()])
+
+        print("\nFleet Analysis Complete!")
+        print(f"  - Hosts analyzed: {len(per_host)}")
+        print(f"  - Metrics analyzed: {fleet['total_metrics']}")
+        print(f"  - Anomalies detected: {fleet['total_anomalies']}")
+        print("\nTop Offending Hosts:")
+        for entry in fleet['top_offending_hosts'][:5]:
+            print(f"  - {entry['host']}: {entry['total_anomalies']} anomalies ({entry['critical_count']} critical)")
+
+        return fleet
+
+    def _fleet_rollup(self, per_host: Dict[str, Dict[str, Any]], top_hosts: int) -> Dict[str, Any]:
+        anomaly_types = defaultdict(int)
+        service_issues = defaultdict(int)
+        severity_count = defaultdict(int)
+        incidents = []
+        sample_anomalies = []
+        top = TopAnomalies(self.top_k, self.top_by)
+
+        for result in per_host.values():
+            for atype, count in result['anomaly_breakdown'].items():
+                anomaly_types[atype] += count
+            for service, count in result['service_issues'].items():
+                service_issues[service] += count
+            for severity, count in result['severity_distribution'].items():
+                severity_count[severity] += count
+            incidents.extend(result['incidents'])
+            sample_anomalies.extend(result['sample_anomalies'])
+            top.add_many(result['top_anomalies'])
+
+        offenders = sorted(
+            ({'host': host, 'total_anomalies': result['total_anomalies'], 'critical_count': result['critical_count']}
+             for host, result in per_host.items()),
+            key=lambda entry: (entry['critical_count'], entry['total_anomalies']),
+            reverse=True
+        )
+
         return {
-            'total_metrics': len(metrics),
-            'total_anomalies': len(anomalies),
+            'total_metrics': sum(result['total_metrics'] for result in per_host.values()),
+            'total_anomalies': sum(result['total_anomalies'] for result in per_host.values()),
             'anomaly_breakdown': dict(anomaly_types),
             'service_issues': dict(service_issues),
             'critical_count': severity_count.get('critical', 0),
             'severity_distribution': dict(severity_count),
-            'sample_anomalies': anomalies[:10]
+            'sample_anomalies': sorted(sample_anomalies, key=lambda a: a['timestamp'])[:10],
+            'top_anomalies': top.items(),
+            'incidents': rank_incidents(incidents),
+            'hosts': per_host,
+            'top_offending_hosts': offenders[:top_hosts],
+            'anomaly_heatmap': {host: result['anomaly_breakdown'] for host, result in per_host.items()}
         }
 
+    def _attach_culprits(self, metric: Metrics, anomalies: List[Dict[str, Any]]):
+        by_cpu = sorted(metric.top_processes, key=lambda p: p.cpu_percent, reverse=True)[:3]
+        by_memory = sorted(metric.top_processes, key=lambda p: p.memory_mb, reverse=True)[:3]
+
+        for anomaly in anomalies:
+            if anomaly['type'] == 'cpu_high':
+                culprits = [f"{p.name}[{p.pid}] {p.cpu_percent}%" for p in by_cpu]
+            elif anomaly['type'] == 'memory_high':
+                culprits = [f"{p.name}[{p.pid}] {p.memory_mb}MB" for p in by_memory]
+            elif anomaly['type'] == 'resource_exhaustion':
+                culprits = [f"{p.name}[{p.pid}] {p.cpu_percent}% / {p.memory_mb}MB" for p in by_cpu]
+            else:
+                continue
+            anomaly['culprits'] = culprits
+            anomaly['description'] += f" (top: {', '.join(culprits)})"
+
+
+def _detect_host_group(thresholds: Dict[str, Dict[str, float]], detectors: List[RollingDetector],
+                       options: Dict[str, Any], metrics: List[Metrics]) -> Tuple[Dict[str, Any], PercentileTracker]:
+    analyzer = InfrastructureAnalyzer(detectors=detectors, **options)
+    analyzer.thresholds = thresholds
+    return analyzer.detect_anomalies(metrics, verbose=False), analyzer.percentiles
+
 
 if __name__ == "__main__":
     import sys
     import os
 
-    if len(sys.argv) != 2:
-        print("Usage: python analyzer.py <input_file.json>")
+    by_host = "--by-host" in sys.argv[1:]
+    lateness = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--allowed-lateness=")), None)
+    export = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--export=")), None)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+    if not args:
+        print("Usage: python analyzer.py <input_file.json> [more_files.json ...] [--by-host] [--allowed-lateness=SECONDS] "
+              "[--export=anomalies.ndjson[.gz]|anomalies.csv[.gz]|store:file.json]")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    for input_file in args:
+        if not os.path.exists(input_file):
+            print(f"Error: File {input_file} not found")
+            sys.exit(1)
 
-    if not os.path.exists(input_file):
-        print(f"Error: File {input_file} not found")
-        sys.exit(1)
+    print(f"\nAnalyzing infrastructure metrics from {', '.join(args)}...")
 
-    print(f"\nAnalyzing infrastructure metrics from {input_file}...")
+    sink = open_sink(export) if export else None
+    analyzer = InfrastructureAnalyzer(sink=sink)
+    # a one-off process with no other threads, so collection can pause for the whole run
+    with paused_gc():
+        if lateness is not None and not by_host:
+            analysis = analyzer.detect_anomalies_stream(analyzer.load_stream(args),
+                                                        allowed_lateness=timedelta(seconds=float(lateness)))
+        elif len(args) > 1 and not by_host:
+            analysis = analyzer.detect_anomalies_stream(analyzer.load_stream(args))
+        elif not by_host:
+            analysis = analyzer.analyze_file(args[0])
+        else:
+            if len(args) > 1:
+                metrics = list(analyzer.load_stream(args))
+            else:
+                metrics = analyzer.load_data(args[0])
+            analysis = analyzer.detect_anomalies_by_host(metrics)
 
-    analyzer = InfrastructureAnalyzer()
-    metrics = analyzer.load_data(input_file)
-    analysis = analyzer.detect_anomalies(metrics)
+    if sink is not None:
+        sink.close()
+        print(f"\nExported {sink.written} anomalies to {export}")
 
     print(f"\nAnalysis Summary:")
     print(f"  - Total metrics analyzed: {analysis['total_metrics']}")
@@ -0,0 +1,233 @@
+import os
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .detectors import NUMERIC_FIELDS, MIN_SCALE, RollingDetector, metric_columns
+from .merge_reader import iter_json_records
+from .models import Metrics
+from .sketches import QuantileSketch
+
+
+HOURS_PER_WEEK = 168
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+DEFAULT_BASELINE_PATH = "data/processed/seasonal_baseline.npz"
+
+
+def hour_of_week(epochs: np.ndarray) -> np.ndarray:
+    """UTC hour of the week, 0 = Monday 00:00 (the epoch started on a Thursday)."""
+    return ((epochs // 3600).astype(np.int64) + 72) % HOURS_PER_WEEK
+
+
+def describe_hour(how: int) -> str:
+    return f"{DAY_NAMES[how // 24]} {how % 24:02d}:00 UTC"
+
+
+class SeasonalBaseline:
+    """Per-field hour-of-week profiles: count, mean, std and quantiles.
+
+    Arrays are shaped ``(len(fields), 168)`` and stored as one compressed
+    ``.npz`` file of a few tens of kilobytes regardless of history length.
+    """
+
+    def __init__(self, fields: Sequence[str], count: np.ndarray, mean: np.ndarray, std: np.ndarray,
+                 quantiles: Dict[float, np.ndarray], samples: int = 0,
+                 start: Optional[str] = None, end: Optional[str] = None):
+        self.fields = list(fields)
+        self.index = {field: i for i, field in enumerate(self.fields)}
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.quantiles = quantiles
+        self.samples = samples
+        self.start = start
+        self.end = end
+
+    def save(self, path: str = DEFAULT_BASELINE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        levels = sorted(self.quantiles)
+        np.savez_compressed(
+            path,
+            fields=np.array(self.fields),
+            count=self.count.astype(np.int32),
+            mean=self.mean.astype(np.float32),
+            std=self.std.astype(np.float32),
+            quantile_levels=np.array(levels),
+            quantiles=np.stack([self.quantiles[q] for q in levels]).astype(np.float32),
+            meta=np.array([self.samples, self.start or '', self.end or ''])
+        )
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_BASELINE_PATH) -> 'SeasonalBaseline':
+        with np.load(path) as data:
+            samples, start, end = data['meta'].tolist()
+            return cls(
+                data['fields'].tolist(), data['count'], data['mean'].astype(float), data['std'].astype(float),
+                {float(q): values.astype(float) for q, values in zip(data['quantile_levels'], data['quantiles'])},
+                samples=int(samples), start=start or None, end=end or None
+            )
+
+
+class BaselineBuilder:
+    """Accumulates hour-of-week profiles in one pass over any number of chunks.
+
+    Counts, sums and sums of squares are accumulated with ``np.bincount``;
+    quantiles come from one ``QuantileSketch`` per field and hour (within
+    ``relative_accuracy``), so memory does not depend on history length.
+    """
+
+    def __init__(self, fields: Sequence[str] = NUMERIC_FIELDS, quantiles: Sequence[float] = (0.05, 0.5, 0.95),
+                 relative_accuracy: float = 0.01):
+        self.fields = list(fields)
+        self.quantile_levels = list(quantiles)
+        shape = (len(self.fields), HOURS_PER_WEEK)
+        self.count = np.zeros(HOURS_PER_WEEK, dtype=np.int64)
+        self.sums = np.zeros(shape)
+        self.squares = np.zeros(shape)
+        self.sketches = [[QuantileSketch(relative_accuracy) for _ in range(HOURS_PER_WEEK)] for _ in self.fields]
+        self.start = None
+        self.end = None
+
+    def add_columns(self, epochs: np.ndarray, columns: Dict[str, np.ndarray]):
+        if not len(epochs):
+            return
+        how = hour_of_week(epochs)
+        order = np.argsort(how, kind='stable')
+        present, starts = np.unique(how[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        self.count += np.bincount(how, minlength=HOURS_PER_WEEK)
+        for i, field in enumerate(self.fields):
+            values = columns[field]
+            self.sums[i] += np.bincount(how, weights=values, minlength=HOURS_PER_WEEK)
+            self.squares[i] += np.bincount(how, weights=values * values, minlength=HOURS_PER_WEEK)
+            ordered = values[order]
+            for cell, start, end in zip(present.tolist(), starts.tolist(), ends.tolist()):
+                self.sketches[i][cell].add_many(ordered[start:end])
+
+        first, last = float(epochs.min()), float(epochs.max())
+        self.start = first if self.start is None else min(self.start, first)
+        self.end = last if self.end is None else max(self.end, last)
+
+    def add_metrics(self, metrics: Sequence[Metrics]):
+        epochs = np.fromiter((m.timestamp.timestamp() for m in metrics), dtype=float, count=len(metrics))
+        self.add_columns(epochs, metric_columns(metrics, self.fields))
+
+    def add_records(self, records: Iterable[Dict[str, Any]], chunk_size: int = 100000):
+        """Add raw report records, converting each chunk to columns with pandas."""
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            frame = pd.DataFrame.from_records(chunk, columns=['timestamp'] + self.fields)
+            frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True, format='ISO8601', errors='coerce')
+            frame = frame.dropna()
+            epochs = (frame['timestamp'] - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy()
+            self.add_columns(epochs, {field: frame[field].to_numpy(dtype=float) for field in self.fields})
+
+    def build(self) -> SeasonalBaseline:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(self.count > 0, self.sums / self.count, np.nan)
+            std = np.sqrt(np.maximum(np.where(self.count > 0, self.squares / self.count, np.nan) - mean * mean, 0.0))
+
+        quantiles = {
+            q: np.array([[sketch.quantile(q) if sketch.count else np.nan for sketch in row] for row in self.sketches])
+            for q in self.quantile_levels
+        }
+        as_iso = lambda epoch: None if epoch is None else datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+        return SeasonalBaseline(self.fields, np.tile(self.count, (len(self.fields), 1)), mean, std, quantiles,
+                                samples=int(self.count.sum()), start=as_iso(self.start), end=as_iso(self.end))
+
+
+class SeasonalDetector(RollingDetector):
+    """Scores each sample against the baseline for its hour of the week.
+
+    Scoring is one table lookup per field. Hours with fewer than
+    ``min_count`` historical samples are not scored.
+    """
+
+    name = 'seasonal'
+    label = 'hour-of-week'
+
+    def __init__(self, baseline: Optional[SeasonalBaseline] = None, fields: Optional[Sequence[str]] = None,
+                 threshold: float = 4.0, min_count: int = 3):
+        if baseline is None:
+            path = os.getenv('SEASONAL_BASELINE', DEFAULT_BASELINE_PATH)
+            if not os.path.exists(path):
+                raise ValueError(f"No seasonal baseline at {path}; build one with "
+                                 f"'python -m src.core.baselines <reports...> --output={path}'")
+            baseline = SeasonalBaseline.load(path)
+        super().__init__([field for field in (fields or baseline.fields) if field in baseline.index], threshold)
+        self.baseline = baseline
+        self.min_count = min_count
+
+    def update(self, metric: Metrics) -> List[Dict[str, Any]]:
+        how = (int(metric.timestamp.timestamp() // 3600) + 72) % HOURS_PER_WEEK
+        anomalies = []
+        for field in self.fields:
+            row = self.baseline.index[field]
+            if self.baseline.count[row, how] < self.min_count:
+                continue
+            value = float(getattr(metric, field))
+            center = self.baseline.mean[row, how]
+            score = (value - center) / max(self.baseline.std[row, how], MIN_SCALE)
+            if abs(score) >= self.threshold:
+                anomalies.append(self._seasonal_anomaly(metric, field, value, score, row, how))
+        return anomalies
+
+    def detect_batch(self, series: Sequence[Metrics],
+                     columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+        if not series:
+            return []
+        if columns is None:
+            columns = metric_columns(series, self.fields)
+        how = hour_of_week(np.fromiter((m.timestamp.timestamp() for m in series), dtype=float, count=len(series)))
+
+        flagged = []
+        for position, field in enumerate(self.fields):
+            row = self.baseline.index[field]
+            values = columns[field]
+            scores = (values - self.baseline.mean[row, how]) / np.maximum(self.baseline.std[row, how], MIN_SCALE)
+            scored = self.baseline.count[row, how] >= self.min_count
+            for i in np.flatnonzero(scored & (np.abs(scores) >= self.threshold)):
+                flagged.append((i, position, self._seasonal_anomaly(series[i], field, values[i], scores[i], row, how[i])))
+
+        flagged.sort(key=lambda item: (item[0], item[1]))
+        return [anomaly for _, _, anomaly in flagged]
+
+    def _seasonal_anomaly(self, metric: Metrics, field: str, value: float, score: float, row: int, how: int):
+        anomaly = self._anomaly(metric, field, value, score, self.baseline.mean[row, how])
+        spread = self.baseline.std[row, how]
+        anomaly['description'] = (f"{field} of {value:g} is unusual for {describe_hour(int(how))} "
+                                  f"(baseline {self.baseline.mean[row, how]:.4g} ± {spread:.2g}, {score:+.1f} sigma)")
+        return anomaly
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    output = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--output=")), DEFAULT_BASELINE_PATH)
+    inputs = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+    if not inputs:
+        print("Usage: python -m src.core.baselines <report.json> [more_reports.json ...] [--output=path.npz]")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    builder = BaselineBuilder()
+    for path in inputs:
+        print(f"Reading {path}...")
+        builder.add_records(iter_json_records(path))
+
+    baseline = builder.build()
+    baseline.save(output)
+    print(f"Built hour-of-week baseline from {baseline.samples} samples ({baseline.start} to {baseline.end}) "
+          f"in {time.perf_counter() - started:.2f}s")
+    print(f"Saved to {output} ({os.path.getsize(output) / 1024:.1f} KB)")
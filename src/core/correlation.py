@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .detectors import NUMERIC_FIELDS
+
+
+# Metric behind each threshold / detector anomaly type; types named
+# "<field>_<detector>" are resolved by prefix.
+INCIDENT_FIELDS = {
+    'cpu_high': 'cpu_usage',
+    'cpu_trend': 'cpu_usage',
+    'resource_exhaustion': 'cpu_usage',
+    'memory_high': 'memory_usage',
+    'memory_exhaustion': 'memory_usage',
+    'disk_high': 'disk_usage',
+    'disk_exhaustion': 'disk_usage',
+    'connections_exhaustion': 'active_connections',
+    'temperature_high': 'temperature_celsius',
+    'error_rate_high': 'error_rate',
+    'error_rate_burn_rate': 'error_rate',
+    'service_offline': 'error_rate',
+    'latency_high': 'latency_ms',
+    'latency_burn_rate': 'latency_ms',
+    'service_degraded': 'latency_ms',
+    'network_saturation': 'network_in_kbps'
+}
+
+
+def incident_field(incident_type: str) -> Optional[str]:
+    if incident_type in INCIDENT_FIELDS:
+        return INCIDENT_FIELDS[incident_type]
+    return next((field for field in NUMERIC_FIELDS if incident_type.startswith(f'{field}_')), None)
+
+
+def windowed_correlations(values: np.ndarray, window: int) -> np.ndarray:
+    """Correlation matrices of consecutive ``window``-row blocks of ``values`` (n x k).
+
+    Returns an (n // window, k, k) array; constant columns correlate as 0.
+    """
+    blocks = len(values) // window
+    if blocks == 0:
+        return np.zeros((0, values.shape[1], values.shape[1]))
+    stacked = values[:blocks * window].reshape(blocks, window, values.shape[1])
+    centered = stacked - stacked.mean(axis=1, keepdims=True)
+    covariance = np.einsum('bwi,bwj->bij', centered, centered)
+    scale = np.sqrt(np.einsum('bii->bi', covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlations = covariance / (scale[:, :, None] * scale[:, None, :])
+    return np.nan_to_num(correlations)
+
+
+def lagged_correlations(values: np.ndarray, target: np.ndarray, max_lag: int) -> np.ndarray:
+    """corr(values[t - lag, j], target[t]) for lag 0..max_lag, as a (max_lag + 1, k) array."""
+    result = np.zeros((max_lag + 1, values.shape[1]))
+    for lag in range(min(max_lag, len(target) - 3) + 1):
+        x = values[:len(values) - lag]
+        y = target[lag:]
+        x = x - x.mean(axis=0)
+        y = y - y.mean()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[lag] = (x * y[:, None]).sum(axis=0) / np.sqrt((x * x).sum(axis=0) * (y * y).sum())
+    return np.nan_to_num(result)
+
+
+class CorrelationAnalyzer:
+    """Batch stage that explains incidents with leading indicators.
+
+    For each of the top ``max_incidents`` incidents, the samples from
+    ``window`` before its start to ``window`` after are taken from the
+    incident's host series, and every other numeric field is correlated
+    with the incident's metric at lags 1..``max_lag``. Fields whose best
+    lagged correlation reaches ``min_correlation`` and beats their
+    same-time correlation are attached to the incident as
+    ``leading_indicators``. Windowed correlation matrices over each whole
+    series give the strongest co-moving field pairs.
+    """
+
+    def __init__(self, fields: Sequence[str] = NUMERIC_FIELDS, window: int = 60, max_lag: int = 6,
+                 min_correlation: float = 0.5, top: int = 3, max_incidents: int = 20):
+        self.fields = list(fields)
+        self.window = window
+        self.max_lag = max_lag
+        self.min_correlation = min_correlation
+        self.top = top
+        self.max_incidents = max_incidents
+
+    def leading_indicators(self, values: np.ndarray, epochs: np.ndarray, target_field: str,
+                           start: float) -> List[Dict[str, Any]]:
+        first = max(0, int(np.searchsorted(epochs, start)) - self.window)
+        last = min(len(epochs), first + 2 * self.window)
+        if last - first < self.max_lag + 3:
+            return []
+
+        target_index = self.fields.index(target_field)
+        block = values[first:last]
+        correlations = lagged_correlations(block, block[:, target_index], self.max_lag)
+        step = float(np.median(np.diff(epochs[first:last])))
+
+        hints = []
+        for j, field in enumerate(self.fields):
+            if j == target_index:
+                continue
+            lag = 1 + int(np.argmax(np.abs(correlations[1:, j])))
+            correlation = correlations[lag, j]
+            if abs(correlation) >= self.min_correlation and abs(correlation) > abs(correlations[0, j]):
+                hints.append({
+                    'field': field,
+                    'lag_seconds': int(lag * step),
+                    'correlation': round(float(correlation), 2)
+                })
+
+        hints.sort(key=lambda hint: abs(hint['correlation']), reverse=True)
+        return hints[:self.top]
+
+    def annotate(self, incidents: List[Dict[str, Any]], host_columns: Dict[Optional[str], Dict[str, np.ndarray]],
+                 host_epochs: Dict[Optional[str], np.ndarray]):
+        """Add ``leading_indicators`` to incidents, in place."""
+        matrices = {host: np.column_stack([columns[field] for field in self.fields])
+                    for host, columns in host_columns.items()}
+
+        for incident in incidents[:self.max_incidents]:
+            target = incident_field(incident['type'])
+            host = incident.get('host')
+            if target not in self.fields or host not in matrices:
+                continue
+            hints = self.leading_indicators(matrices[host], host_epochs[host], target,
+                                            datetime.fromisoformat(incident['start']).timestamp())
+            if hints:
+                incident['leading_indicators'] = hints
+
+    def correlated_pairs(self, host_columns: Dict[Optional[str], Dict[str, np.ndarray]],
+                         limit: int = 10) -> List[Dict[str, Any]]:
+        """Field pairs with the strongest mean correlation across all windows and hosts."""
+        total = np.zeros((len(self.fields), len(self.fields)))
+        blocks = 0
+        for columns in host_columns.values():
+            correlations = windowed_correlations(np.column_stack([columns[field] for field in self.fields]), self.window)
+            total += correlations.sum(axis=0)
+            blocks += len(correlations)
+        if blocks == 0:
+            return []
+
+        mean = total / blocks
+        rows, cols = np.triu_indices(len(self.fields), k=1)
+        order = np.argsort(np.abs(mean[rows, cols]))[::-1][:limit]
+        return [
+            {'fields': [self.fields[rows[i]], self.fields[cols[i]]], 'mean_correlation': round(float(mean[rows[i], cols[i]]), 2)}
+            for i in order
+        ]
+
+
+def merge_correlated_pairs(host_pairs: Sequence[List[Dict[str, Any]]], weights: Sequence[int],
+                           limit: int = 10) -> List[Dict[str, Any]]:
+    """Combine per-host ``correlated_pairs`` lists into one, weighting each host by
+    its number of windows; a pair missing from a host's list counts as 0 there."""
+    total_weight = sum(weights)
+    if total_weight == 0:
+        return []
+
+    totals = defaultdict(float)
+    for pairs, weight in zip(host_pairs, weights):
+        for pair in pairs:
+            totals[tuple(pair['fields'])] += pair['mean_correlation'] * weight
+
+    ranked = sorted(totals.items(), key=lambda item: abs(item[1]), reverse=True)[:limit]
+    return [{'fields': list(fields), 'mean_correlation': round(total / total_weight, 2)} for fields, total in ranked]
@@ -0,0 +1,451 @@
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from collections import deque
+from math import sqrt
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .models import Metrics
+
+
+NUMERIC_FIELDS = [
+    'cpu_usage', 'memory_usage', 'latency_ms', 'disk_usage', 'network_in_kbps',
+    'network_out_kbps', 'io_wait', 'thread_count', 'active_connections', 'error_rate',
+    'uptime_seconds', 'temperature_celsius', 'power_consumption_watts'
+]
+
+MIN_SCALE = 1e-9
+
+
+def metric_columns(metrics: Sequence[Metrics], fields: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Float array per field, reading all fields of a sample with one ``attrgetter`` call."""
+    fields = list(fields)
+    if not fields:
+        return {}
+    rows = np.array(list(map(attrgetter(*fields), metrics)), dtype=float).reshape(len(metrics), len(fields))
+    matrix = np.ascontiguousarray(rows.T)
+    return {field: matrix[i] for i, field in enumerate(fields)}
+
+
+class RollingDetector(ABC):
+    """Base class for per-host statistical detectors.
+
+    A detector keeps a fixed amount of state per host and field, so
+    ``update`` costs O(1) per sample and can run inside the streaming
+    analyzer. ``detect_batch`` gives the same anomalies for a whole
+    time-ordered series, computed with NumPy.
+    """
+
+    name = 'rolling'
+    label = 'rolling'
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, threshold: float = 4.0):
+        self.fields = list(fields or NUMERIC_FIELDS)
+        self.threshold = threshold
+        self.states = {}
+
+    def reset(self):
+        self.states = {}
+
+    @abstractmethod
+    def update(self, metric: Metrics) -> List[Dict[str, Any]]:
+        """Anomalies raised by one sample, in time order per host."""
+
+    @abstractmethod
+    def detect_batch(self, series: Sequence[Metrics],
+                     columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+        """Score one host's time-ordered series; same output as feeding it to ``update``.
+
+        ``columns`` may hold precomputed field arrays shared between detectors.
+        """
+
+    def _anomaly(self, metric: Metrics, field: str, value: float, score: float, center: float) -> Dict[str, Any]:
+        anomaly = {
+            'timestamp': metric.timestamp.isoformat(),
+            'type': f'{field}_{self.name}',
+            'severity': 'high' if abs(score) >= 2 * self.threshold else 'medium',
+            'value': float(value),
+            'description': f'{field} of {value:g} deviates from its {self.label} baseline '
+                           f'({center:.4g}) by {score:+.1f} sigma'
+        }
+        if metric.host is not None:
+            anomaly['host'] = metric.host
+        return anomaly
+
+
+class ScoreDetector(RollingDetector):
+    """Detector scoring each field on its own from a small per-field state.
+
+    A sample is flagged when the absolute score, computed against the
+    state *before* the sample, reaches ``threshold``; twice the threshold
+    makes it high severity.
+    """
+
+    def update(self, metric: Metrics) -> List[Dict[str, Any]]:
+        state = self.states.get(metric.host)
+        if state is None:
+            state = self.states[metric.host] = {field: self._new_state() for field in self.fields}
+
+        anomalies = []
+        for field in self.fields:
+            value = float(getattr(metric, field))
+            score, center = self._update(state[field], value)
+            if score is not None and abs(score) >= self.threshold:
+                anomalies.append(self._anomaly(metric, field, value, score, center))
+        return anomalies
+
+    def detect_batch(self, series: Sequence[Metrics],
+                     columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+        if columns is None:
+            columns = metric_columns(series, self.fields)
+        flagged = []
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for position, field in enumerate(self.fields):
+                values = columns[field]
+                scores, centers = self._scores(values)
+                for i in np.flatnonzero(np.abs(scores) >= self.threshold):
+                    flagged.append((i, position, self._anomaly(series[i], field, values[i], scores[i], centers[i])))
+
+        flagged.sort(key=lambda item: (item[0], item[1]))
+        return [anomaly for _, _, anomaly in flagged]
+
+    @abstractmethod
+    def _new_state(self):
+        """Fresh state for one host and field."""
+
+    @abstractmethod
+    def _update(self, state, value: float):
+        """Score ``value`` against ``state`` and fold it in; returns (score or None, center)."""
+
+    @abstractmethod
+    def _scores(self, values: np.ndarray):
+        """Scores and centers of a whole column, as ``_update`` would give them one by one."""
+
+
+class EWMADetector(ScoreDetector):
+    """Exponentially weighted mean and variance (West/Finch recurrence)."""
+
+    name = 'ewma'
+    label = 'EWMA'
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, threshold: float = 4.0,
+                 alpha: float = 0.1, warmup: int = 20):
+        super().__init__(fields, threshold)
+        self.alpha = alpha
+        self.warmup = warmup
+
+    def _new_state(self):
+        return [0, 0.0, 0.0]
+
+    def _update(self, state, value):
+        count, mean, var = state
+        if count == 0:
+            state[:] = [1, value, 0.0]
+            return None, value
+
+        score = None
+        if count >= self.warmup:
+            score = (value - mean) / max(sqrt(var), MIN_SCALE)
+
+        diff = value - mean
+        increment = self.alpha * diff
+        state[:] = [count + 1, mean + increment, (1 - self.alpha) * (var + diff * increment)]
+        return score, mean
+
+    def _scores(self, values):
+        scores = np.full(len(values), np.nan)
+        if len(values) <= self.warmup:
+            return scores, scores
+
+        # mean_t and var_t both follow x_t = (1 - alpha) * x_{t-1} + alpha * y_t
+        means = pd.Series(values).ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+        diffs = np.empty_like(values)
+        diffs[0] = 0.0
+        diffs[1:] = values[1:] - means[:-1]
+        variances = pd.Series((1 - self.alpha) * diffs * diffs).ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+
+        centers = np.full(len(values), np.nan)
+        centers[1:] = means[:-1]
+        scores[self.warmup:] = diffs[self.warmup:] / np.maximum(np.sqrt(variances[self.warmup - 1:-1]), MIN_SCALE)
+        return scores, centers
+
+
+class ZScoreDetector(ScoreDetector):
+    """Rolling z-score against the previous ``window`` samples.
+
+    Running sums are kept relative to the series' first value to limit
+    cancellation on large, slowly changing fields such as ``uptime_seconds``.
+    """
+
+    name = 'zscore'
+    label = 'rolling mean'
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, threshold: float = 4.0, window: int = 30):
+        super().__init__(fields, threshold)
+        self.window = window
+
+    def _new_state(self):
+        return [deque(), 0.0, 0.0, None]
+
+    def _update(self, state, value):
+        values, total, squares, shift = state
+        if shift is None:
+            shift = state[3] = value
+        value -= shift
+
+        score = mean = None
+        if len(values) == self.window:
+            mean = total / self.window
+            std = sqrt(max(squares / self.window - mean * mean, 0.0))
+            score = (value - mean) / max(std, MIN_SCALE)
+            mean += shift
+            old = values.popleft()
+            total -= old
+            squares -= old * old
+
+        values.append(value)
+        state[1] = total + value
+        state[2] = squares + value * value
+        return score, mean
+
+    def _scores(self, values):
+        w = self.window
+        scores = np.full(len(values), np.nan)
+        centers = np.full(len(values), np.nan)
+        if len(values) <= w:
+            return scores, centers
+
+        shifted = values - values[0]
+        sums = np.concatenate(([0.0], np.cumsum(shifted)))
+        squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+        means = (sums[w:-1] - sums[:-w - 1]) / w
+        variances = np.maximum((squares[w:-1] - squares[:-w - 1]) / w - means * means, 0.0)
+
+        centers[w:] = means + values[0]
+        scores[w:] = (shifted[w:] - means) / np.maximum(np.sqrt(variances), MIN_SCALE)
+        return scores, centers
+
+
+class MADDetector(ScoreDetector):
+    """Robust z-score from the median and MAD of the previous ``window`` samples.
+
+    The window is small and fixed, so the sorted window and the MAD take a
+    bounded amount of work per sample. Quantized series often have a MAD of
+    zero; the mean absolute deviation is used as the spread then.
+    """
+
+    name = 'mad'
+    label = 'rolling median'
+
+    MAD_TO_SIGMA = 1.4826
+    MEAN_AD_TO_SIGMA = 1.2533
+    CHUNK_ROWS = 1 << 16
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, threshold: float = 5.0, window: int = 15):
+        super().__init__(fields, threshold)
+        self.window = window
+
+    def _new_state(self):
+        return [deque(), []]
+
+    def _update(self, state, value):
+        values, ordered = state
+        score = median = None
+        if len(values) == self.window:
+            median = self._median(ordered)
+            deviations = sorted(abs(v - median) for v in ordered)
+            spread = self.MAD_TO_SIGMA * self._median(deviations)
+            if spread == 0:
+                spread = self.MEAN_AD_TO_SIGMA * sum(deviations) / self.window
+            score = (value - median) / max(spread, MIN_SCALE)
+            del ordered[bisect_left(ordered, values.popleft())]
+
+        values.append(value)
+        insort(ordered, value)
+        return score, median
+
+    @staticmethod
+    def _median(ordered):
+        middle = len(ordered) // 2
+        if len(ordered) % 2:
+            return ordered[middle]
+        return (ordered[middle - 1] + ordered[middle]) / 2
+
+    def _scores(self, values):
+        w = self.window
+        scores = np.full(len(values), np.nan)
+        centers = np.full(len(values), np.nan)
+        if len(values) <= w:
+            return scores, centers
+
+        windows = sliding_window_view(values, w)[:-1]
+        for start in range(0, len(windows), self.CHUNK_ROWS):
+            chunk = windows[start:start + self.CHUNK_ROWS]
+            medians = np.median(chunk, axis=1)
+            deviations = np.abs(chunk - medians[:, None])
+            spreads = self.MAD_TO_SIGMA * np.median(deviations, axis=1)
+            spreads = np.where(spreads == 0, self.MEAN_AD_TO_SIGMA * deviations.mean(axis=1), spreads)
+            rows = slice(w + start, w + start + len(chunk))
+            centers[rows] = medians
+            scores[rows] = (values[rows] - medians) / np.maximum(spreads, MIN_SCALE)
+        return scores, centers
+
+
+class ChangepointDetector(RollingDetector):
+    """Two-sided CUSUM for sustained level shifts ("regime changes").
+
+    The first ``warmup`` samples of a segment fix a reference mean and
+    standard deviation. Each later sample is standardized, clipped to
+    +/-``clip`` so a single outlier cannot raise an alarm on its own, and
+    accumulated as ``C += z - drift``; the statistic is ``C - min(C)``
+    (and the same for ``-z``). Crossing ``threshold`` emits a
+    ``<field>_regime_change`` anomaly carrying the estimated change time
+    (the sample after the statistic last touched zero) and the magnitude
+    (mean since then minus the reference mean). The segment then restarts
+    with a new warmup. State per series is a handful of numbers.
+    """
+
+    name = 'regime_change'
+    label = 'CUSUM'
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, threshold: float = 8.0,
+                 drift: float = 0.5, clip: float = 3.0, warmup: int = 50, relative_floor: float = 0.01):
+        super().__init__(fields or ['latency_ms', 'error_rate', 'cpu_usage', 'memory_usage'], threshold)
+        self.drift = drift
+        self.clip = clip
+        self.warmup = warmup
+        self.relative_floor = relative_floor
+
+    def _reference(self, mean, std):
+        return mean, max(std, self.relative_floor * abs(mean), MIN_SCALE)
+
+    def _new_state(self):
+        return {'count': 0, 'total': 0.0, 'squares': 0.0, 'reference': None,
+                'sides': [self._new_side(), self._new_side()]}
+
+    @staticmethod
+    def _new_side():
+        return {'c': 0.0, 'low': 0.0, 'start': None, 'sum': 0.0, 'n': 0}
+
+    def update(self, metric: Metrics) -> List[Dict[str, Any]]:
+        state = self.states.get(metric.host)
+        if state is None:
+            state = self.states[metric.host] = {field: self._new_state() for field in self.fields}
+
+        anomalies = []
+        for field in self.fields:
+            series = state[field]
+            value = float(getattr(metric, field))
+
+            if series['reference'] is None:
+                series['count'] += 1
+                series['total'] += value
+                series['squares'] += value * value
+                if series['count'] == self.warmup:
+                    mean = series['total'] / self.warmup
+                    series['reference'] = self._reference(mean, sqrt(max(series['squares'] / self.warmup - mean * mean, 0.0)))
+                continue
+
+            mean, std = series['reference']
+            z = min(max((value - mean) / std, -self.clip), self.clip)
+            for sign, side in zip((1, -1), series['sides']):
+                side['c'] += sign * z - self.drift
+                if side['c'] <= side['low']:
+                    side['low'] = side['c']
+                    side['start'] = None
+                    side['sum'] = 0.0
+                    side['n'] = 0
+                    continue
+                if side['start'] is None:
+                    side['start'] = metric.timestamp
+                side['sum'] += value
+                side['n'] += 1
+                if side['c'] - side['low'] > self.threshold:
+                    anomalies.append(self._regime_anomaly(metric, field, mean, std, side['sum'] / side['n'], side['start']))
+                    state[field] = self._new_state()
+                    break
+        return anomalies
+
+    def detect_batch(self, series: Sequence[Metrics],
+                     columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+        if columns is None:
+            columns = metric_columns(series, self.fields)
+
+        flagged = []
+        for position, field in enumerate(self.fields):
+            values = columns[field]
+            start = 0
+            while start + self.warmup < len(values):
+                reference = values[start:start + self.warmup]
+                mean, std = self._reference(reference.mean(), reference.std())
+                segment = values[start + self.warmup:]
+                z = np.clip((segment - mean) / std, -self.clip, self.clip)
+
+                alarm = None
+                for sign in (1, -1):
+                    c = np.cumsum(sign * z - self.drift)
+                    low = np.minimum.accumulate(np.concatenate(([0.0], c)))[1:]
+                    crossed = np.flatnonzero(c - low > self.threshold)
+                    if len(crossed) and (alarm is None or crossed[0] < alarm[0]):
+                        touched = np.flatnonzero(c[:crossed[0]] <= low[:crossed[0]])
+                        alarm = (crossed[0], touched[-1] + 1 if len(touched) else 0)
+                if alarm is None:
+                    break
+
+                at, since = alarm
+                offset = start + self.warmup
+                level = segment[since:at + 1].mean()
+                flagged.append((offset + at, position, self._regime_anomaly(
+                    series[offset + at], field, mean, std, level, series[offset + since].timestamp)))
+                start = offset + at + 1
+
+        flagged.sort(key=lambda item: (item[0], item[1]))
+        return [anomaly for _, _, anomaly in flagged]
+
+    def _regime_anomaly(self, metric: Metrics, field: str, mean: float, std: float, level: float, change_time) -> Dict[str, Any]:
+        magnitude = float(level - mean)
+        anomaly = {
+            'timestamp': metric.timestamp.isoformat(),
+            'type': f'{field}_{self.name}',
+            'severity': 'high' if abs(magnitude) >= 3 * std else 'medium',
+            'value': float(level),
+            'description': f'{field} shifted from {mean:.4g} to {level:.4g} ({magnitude:+.4g}) '
+                           f'since {change_time.isoformat()}',
+            'change_time': change_time.isoformat(),
+            'magnitude': magnitude
+        }
+        if metric.host is not None:
+            anomaly['host'] = metric.host
+        return anomaly
+
+
+DETECTORS = {
+    'ewma': EWMADetector,
+    'zscore': ZScoreDetector,
+    'mad': MADDetector,
+    'cusum': ChangepointDetector
+}
+
+
+def build_detectors(names: str) -> List[RollingDetector]:
+    """Detectors from a comma-separated list of names (e.g. "ewma,mad")."""
+    from .baselines import SeasonalDetector  # these modules build on this one
+    from .forecast import CapacityForecaster
+    from .slo import SLOEngine
+
+    available = {**DETECTORS, 'slo': SLOEngine, 'seasonal': SeasonalDetector, 'forecast': CapacityForecaster}
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown detectors {unknown}; available: {', '.join(available)}")
+    return [available[name]() for name in names]
+
+
+def build_default_detectors() -> List[RollingDetector]:
+    """Statistical detectors enabled through ``ANALYZER_DETECTORS``."""
+    return build_detectors(os.getenv('ANALYZER_DETECTORS', ''))
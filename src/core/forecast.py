@@ -0,0 +1,188 @@
+import os
+from math import exp, inf, log, sqrt
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .detectors import RollingDetector
+from .models import Metrics
+
+
+def default_resources() -> Dict[str, tuple]:
+    """resource name -> (Metrics field, capacity)."""
+    return {
+        'disk': ('disk_usage', 100.0),
+        'memory': ('memory_usage', 100.0),
+        'connections': ('active_connections', float(os.getenv('CONNECTION_LIMIT', '1000')))
+    }
+
+
+def solve_trend(w, st, stt, sy, sty, syy):
+    """Weighted least-squares line from sufficient statistics.
+
+    Returns (level at t=0, slope per second, standard error of the slope),
+    or None when the points do not determine a line.
+    """
+    denom = w * stt - st * st
+    if w <= 2 or denom <= 1e-12 * max(w * stt, 1.0):
+        return None
+    slope = (w * sty - st * sy) / denom
+    level = (sy - slope * st) / w
+    residual = max(syy - level * sy - slope * sty, 0.0) / (w - 2)
+    return level, slope, sqrt(residual * w / denom)
+
+
+def time_to_exhaustion(level: float, slope: float, slope_se: float, capacity: float, z: float = 2.0):
+    """(eta, earliest, latest) in seconds; None for a flat or falling trend, inf for an open band."""
+    if level >= capacity:
+        return 0.0, 0.0, 0.0
+    if slope <= 0:
+        return None
+    headroom = capacity - level
+    slowest = slope - z * slope_se
+    return headroom / slope, headroom / (slope + z * slope_se), headroom / slowest if slowest > 0 else inf
+
+
+def fit_series(epochs: np.ndarray, values: np.ndarray, half_life_seconds: float):
+    """Vectorized equivalent of feeding a whole series to ``TrendState``."""
+    if len(epochs) < 3:
+        return None
+    t = epochs - epochs.max()
+    w = np.exp(t * log(2) / half_life_seconds)
+    return solve_trend(w.sum(), (w * t).sum(), (w * t * t).sum(), (w * values).sum(),
+                       (w * t * values).sum(), (w * values * values).sum())
+
+
+class TrendState:
+    """Exponentially weighted least-squares line, updated in O(1).
+
+    Sums are kept relative to the newest timestamp: advancing by ``dt``
+    shifts them to the new origin and decays them by ``2 ** (-dt / half_life)``,
+    so the numbers stay small however long the series runs.
+    """
+
+    def __init__(self, half_life_seconds: float):
+        self.rate = log(2) / half_life_seconds
+        self.last = None
+        self.count = 0
+        self.sums = [0.0] * 6
+
+    def add(self, epoch: float, value: float):
+        w, st, stt, sy, sty, syy = self.sums
+        t = 0.0
+        if self.last is None:
+            self.last = epoch
+        elif epoch >= self.last:
+            dt = epoch - self.last
+            decay = exp(-self.rate * dt)
+            w, st, stt, sy, sty, syy = (
+                w * decay, (st - dt * w) * decay, (stt - 2 * dt * st + dt * dt * w) * decay,
+                sy * decay, (sty - dt * sy) * decay, syy * decay
+            )
+            self.last = epoch
+        else:
+            t = epoch - self.last
+
+        weight = exp(self.rate * t)
+        self.sums = [w + weight, st + weight * t, stt + weight * t * t,
+                     sy + weight * value, sty + weight * t * value, syy + weight * value * value]
+        self.count += 1
+
+    def fit(self):
+        return solve_trend(*self.sums)
+
+
+class CapacityForecaster(RollingDetector):
+    """Forecasts when disk, memory and connections run out, per host.
+
+    Each resource keeps a ``TrendState``; every sample refits the line in
+    O(1) and projects when it reaches capacity, with a band from the
+    slope's standard error (``z`` standard errors). Once the trend is
+    significant (the band's slow edge still rises) and the estimate falls
+    under one of ``WARN_HOURS``, a ``<resource>_exhaustion`` anomaly is
+    emitted; further ones only when the severity escalates, until the
+    estimate recedes past the last horizon.
+    """
+
+    name = 'forecast'
+    label = 'capacity trend'
+
+    WARN_HOURS = [('critical', 6), ('high', 24), ('medium', 72)]
+    SEVERITY_RANK = {'medium': 1, 'high': 2, 'critical': 3}
+
+    def __init__(self, resources: Optional[Dict[str, tuple]] = None, half_life_seconds: float = 6 * 3600,
+                 min_samples: int = 20, z: float = 2.0):
+        self.resources = resources or default_resources()
+        super().__init__([field for field, _ in self.resources.values()])
+        self.half_life_seconds = half_life_seconds
+        self.min_samples = min_samples
+        self.z = z
+
+    def _new_state(self):
+        return {'trend': TrendState(self.half_life_seconds), 'severity': None}
+
+    def forecast(self, state: TrendState, capacity: float) -> Optional[Dict[str, Any]]:
+        fit = state.fit()
+        if fit is None:
+            return None
+        level, slope, slope_se = fit
+        eta = time_to_exhaustion(level, slope, slope_se, capacity, self.z)
+        return {
+            'level': level,
+            'slope_per_hour': slope * 3600,
+            'eta_hours': None if eta is None else eta[0] / 3600,
+            'band_hours': None if eta is None else (eta[1] / 3600, eta[2] / 3600)
+        }
+
+    def update(self, metric: Metrics) -> List[Dict[str, Any]]:
+        state = self.states.get(metric.host)
+        if state is None:
+            state = self.states[metric.host] = {resource: self._new_state() for resource in self.resources}
+
+        epoch = metric.timestamp.timestamp()
+        anomalies = []
+        for resource, (field, capacity) in self.resources.items():
+            series = state[resource]
+            series['trend'].add(epoch, float(getattr(metric, field)))
+            if series['trend'].count < self.min_samples:
+                continue
+
+            forecast = self.forecast(series['trend'], capacity)
+            if forecast is None or forecast['eta_hours'] is None:
+                series['severity'] = None
+                continue
+
+            severity = next((level for level, hours in self.WARN_HOURS if forecast['eta_hours'] <= hours), None)
+            if severity is None:
+                series['severity'] = None
+            elif forecast['band_hours'][1] == inf:
+                continue
+            elif series['severity'] is None or self.SEVERITY_RANK[severity] > self.SEVERITY_RANK[series['severity']]:
+                series['severity'] = severity
+                anomalies.append(self._forecast_anomaly(metric, resource, field, capacity, forecast, severity))
+        return anomalies
+
+    def detect_batch(self, series: Sequence[Metrics], columns=None) -> List[Dict[str, Any]]:
+        """Replays the series through fresh per-host state (the recurrence is sequential)."""
+        states, self.states = self.states, {}
+        try:
+            return [anomaly for metric in series for anomaly in self.update(metric)]
+        finally:
+            self.states = states
+
+    def _forecast_anomaly(self, metric: Metrics, resource: str, field: str, capacity: float,
+                          forecast: Dict[str, Any], severity: str) -> Dict[str, Any]:
+        earliest, latest = forecast['band_hours']
+        anomaly = {
+            'timestamp': metric.timestamp.isoformat(),
+            'type': f'{resource}_exhaustion',
+            'severity': severity,
+            'value': forecast['eta_hours'],
+            'description': f"{field} projected to reach {capacity:g} in {forecast['eta_hours']:.1f}h "
+                           f"(band {earliest:.1f}h-{latest:.1f}h) at {forecast['slope_per_hour']:+.2f}/h",
+            'eta_hours': forecast['eta_hours'],
+            'band_hours': [earliest, latest]
+        }
+        if metric.host is not None:
+            anomaly['host'] = metric.host
+        return anomaly
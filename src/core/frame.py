@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .models import Metrics, ProcessUsage, ServiceStatus
+
+
+# numeric Metrics fields and their Python type
+FIELD_TYPES = {name: info.annotation for name, info in Metrics.model_fields.items() if info.annotation in (float, int)}
+SERVICES = tuple(ServiceStatus.model_fields)
+
+# per-sample record with the Metrics attributes the rules and detectors read
+MetricsRow = namedtuple('MetricsRow', ['host', 'timestamp', *FIELD_TYPES, 'service_status', 'top_processes'])
+ServiceStatusRow = namedtuple('ServiceStatusRow', SERVICES)
+
+
+def _values(column) -> list:
+    # pandas and NumPy columns convert to a list in one call, much faster than iterating them
+    return column.tolist() if hasattr(column, 'tolist') else list(column)
+
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _numeric(values) -> np.ndarray:
+    # values that are not numbers become NaN, so the sample counts as invalid
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_float(value) for value in _values(values)], dtype=np.float64)
+
+
+def _datetime(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def _datetimes(values) -> List[Optional[datetime]]:
+    if hasattr(values, 'dt'):
+        return list(values.dt.to_pydatetime())
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[us]').tolist()
+    return [_datetime(value) for value in values.tolist()]
+
+
+def _epoch(timestamp) -> float:
+    # missing timestamps (None, NaT) become NaN, so the sample counts as invalid
+    try:
+        return timestamp.timestamp()
+    except (AttributeError, ValueError):
+        return float('nan')
+
+
+def _statuses(columns: Mapping[str, Any]) -> Optional[List[ServiceStatusRow]]:
+    if 'service_status' in columns:
+        return [ServiceStatusRow(*(status.get(name) if isinstance(status, dict) else getattr(status, name, None)
+                                   for name in SERVICES))
+                for status in _values(columns['service_status'])]
+    if all(f'{name}_status' in columns for name in SERVICES):
+        return list(map(ServiceStatusRow, *(_values(columns[f'{name}_status']) for name in SERVICES)))
+    return None
+
+
+def _processes(values) -> List[Optional[List[ProcessUsage]]]:
+    return [[p if isinstance(p, ProcessUsage) else ProcessUsage(**p) for p in processes]
+            if isinstance(processes, (list, tuple)) else None
+            for processes in _values(values)]
+
+
+class MetricsFrame:
+    """Metrics held as NumPy columns instead of one ``Metrics`` object per sample.
+
+    Built straight from a pandas DataFrame or a mapping of field -> array
+    (no dicts, JSON or per-sample validation on the way). Numeric columns
+    are kept as float64 arrays, used in place when they already have that
+    dtype. ``service_status`` may be a column of dicts or the flattened
+    ``<service>_status`` columns the dashboard shows. ``skipped`` counts
+    source records that were not objects and so have no row.
+    """
+
+    def __init__(self, columns: Mapping[str, Any]):
+        if 'timestamp' not in columns:
+            raise ValueError("Metrics columns need a 'timestamp' column")
+        self.timestamps = _datetimes(columns['timestamp'])
+        self.length = len(self.timestamps)
+        self.epochs = np.fromiter(map(_epoch, self.timestamps), dtype=float, count=self.length)
+        self.columns = {name: _numeric(columns[name]) for name in FIELD_TYPES if name in columns}
+        hosts = columns['host'] if 'host' in columns else None
+        self.hosts = ([host if isinstance(host, str) else None for host in _values(hosts)] if hosts is not None
+                      else [None] * self.length)
+        self.service_status = _statuses(columns)
+        self.top_processes = _processes(columns['top_processes']) if 'top_processes' in columns else None
+        self.skipped = 0
+
+        for name, values in self.columns.items():
+            if values.shape != (self.length,):
+                raise ValueError(f"Column {name} has {len(values)} values, expected {self.length}")
+
+    def __len__(self):
+        return self.length
+
+    def missing(self, fields: Sequence[str]) -> List[str]:
+        """Fields among ``fields`` the frame has no column for (``top_processes`` is optional)."""
+        present = set(self.columns)
+        if self.service_status is not None:
+            present.add('service_status')
+        return sorted(field for field in fields if field not in present and field != 'top_processes')
+
+    def complete(self, fields: Sequence[str]) -> np.ndarray:
+        """Mask of samples with a timestamp and a value in every column among ``fields``
+        (a whole number for the integer fields, which ``rows`` casts)."""
+        mask = ~np.isnan(self.epochs)
+        for field in fields:
+            if field not in self.columns:
+                continue
+            values = self.columns[field]
+            if FIELD_TYPES[field] is int:
+                mask &= np.isfinite(values) & (values == np.trunc(values))
+            else:
+                mask &= ~np.isnan(values)
+        if 'service_status' in fields and self.service_status is not None:
+            mask &= np.fromiter((None not in status for status in self.service_status), dtype=bool, count=self.length)
+        return mask
+
+    def take(self, indices: np.ndarray) -> 'MetricsFrame':
+        frame = object.__new__(MetricsFrame)
+        frame.timestamps = [self.timestamps[i] for i in indices]
+        frame.length = len(frame.timestamps)
+        frame.epochs = self.epochs[indices]
+        frame.columns = self.select(indices)
+        frame.hosts = [self.hosts[i] for i in indices]
+        frame.service_status = [self.service_status[i] for i in indices] if self.service_status is not None else None
+        frame.top_processes = [self.top_processes[i] for i in indices] if self.top_processes is not None else None
+        frame.skipped = 0
+        return frame
+
+    def rows(self) -> List[MetricsRow]:
+        missing = [None] * self.length
+        values = []
+        for name, kind in FIELD_TYPES.items():
+            column = self.columns.get(name)
+            if column is None:
+                values.append(missing)
+            else:
+                values.append(column.astype(np.int64).tolist() if kind is int else column.tolist())
+        return list(map(MetricsRow, self.hosts, self.timestamps, *values,
+                        self.service_status or missing, self.top_processes or missing))
+
+    def fingerprint(self) -> str:
+        """Digest of the frame's contents, hashing the column buffers directly."""
+        digest = hashlib.sha1(np.ascontiguousarray(self.epochs))
+        for name in sorted(self.columns):
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(self.columns[name]))
+        digest.update('\0'.join(host or '' for host in self.hosts).encode())
+        if self.service_status is not None:
+            digest.update('\0'.join(map(','.join, self.service_status)).encode())
+        if self.top_processes is not None:
+            digest.update(repr(self.top_processes).encode())
+        return digest.hexdigest()
+
+    def select(self, indices: np.ndarray) -> Dict[str, np.ndarray]:
+        """Numeric columns at ``indices`` (copies; ``columns`` is the in-place view)."""
+        return {name: values[indices] for name, values in self.columns.items()}
+
+
+_frame_cache = {}
+_frame_cache_lock = threading.Lock()
+
+
+def load_frame(filepath: str) -> MetricsFrame:
+    """``MetricsFrame`` of a JSON metrics file, cached until the file changes,
+    so tools reading the same file one after the other parse it once."""
+    stat = os.stat(filepath)
+    path = os.path.abspath(filepath)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _frame_cache_lock:
+        cached = _frame_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    with open(filepath, 'rb') as f:
+        payload = json.loads(f.read())
+    records = [record for record in payload if isinstance(record, dict)]
+    columns = {name: [record.get(name) for record in records] for name in set().union(*records)}
+    frame = MetricsFrame(columns if records else {'timestamp': []})
+    frame.skipped = len(payload) - len(records)
+
+    with _frame_cache_lock:
+        _frame_cache[path] = (version, frame)
+    return frame
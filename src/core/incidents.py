@@ -0,0 +1,186 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from typing import Any, Dict, Iterable, List, Optional
+
+
+SEVERITY_RANK = {'low': 0, 'warning': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+
+class IncidentAggregator:
+    """Merges anomalies into incidents as they are raised.
+
+    Anomalies of the same type and host at most ``max_gap`` apart (only
+    equal timestamps without a gap) extend one open incident, which keeps
+    its start, end, peak value, sample count and highest severity; each
+    severity increase is recorded in ``escalations``. An anomaly past the
+    gap closes the open incident and starts a new one, so only one open
+    incident per (type, host) is held besides the closed, compact events.
+    Input is expected in time order per (type, host); a sample up to
+    ``max_gap`` before an open incident's start still joins it.
+    """
+
+    def __init__(self, max_gap: Optional[timedelta] = None):
+        self.max_gap = max_gap
+        self.open = {}
+        self.closed = []
+        self.last_timestamp = (None, 0.0)
+
+    @property
+    def max_gap(self) -> Optional[timedelta]:
+        return self._max_gap
+
+    @max_gap.setter
+    def max_gap(self, value: Optional[timedelta]):
+        self._max_gap = value
+        self.gap_seconds = value.total_seconds() if value is not None else 0.0
+
+    def add(self, anomaly: Dict[str, Any]):
+        self.add_many((anomaly,))
+
+    def add_many(self, anomalies: Iterable[Dict[str, Any]]):
+        # times are compared as epoch seconds; anomalies from one sample
+        # share a timestamp, so it is parsed once
+        text, epoch = self.last_timestamp
+        gap = self.gap_seconds
+        open_incidents = self.open
+        closed = self.closed
+
+        for anomaly in anomalies:
+            stamp = anomaly['timestamp']
+            if stamp != text:
+                ts = datetime.fromisoformat(stamp)
+                epoch = (ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)).timestamp()
+                text = stamp
+
+            key = (anomaly['type'], anomaly.get('host'))
+            current = open_incidents.get(key)
+
+            if current is not None and current['_start'] - gap <= epoch <= current['_end'] + gap:
+                if epoch < current['_start']:
+                    current['_start'], current['_start_text'] = epoch, stamp
+                if epoch > current['_end']:
+                    current['_end'], current['_end_text'] = epoch, stamp
+                current['count'] += 1
+                severity = anomaly['severity']
+                if severity != current['severity'] and SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(current['severity'], 0):
+                    current['severity'] = severity
+                    if current['_escalations'] is None:
+                        current['_escalations'] = []
+                    current['_escalations'].append({'timestamp': stamp, 'severity': severity})
+                if anomaly['value'] > current['peak']:
+                    current['peak'] = anomaly['value']
+                    current['description'] = anomaly['description']
+                continue
+
+            incident = {
+                'type': key[0],
+                'host': key[1],
+                'severity': anomaly['severity'],
+                'peak': anomaly['value'],
+                'count': 1,
+                'description': anomaly['description'],
+                '_start': epoch,
+                '_end': epoch,
+                '_start_text': stamp,
+                '_end_text': stamp,
+                '_escalations': None
+            }
+            if current is not None and epoch < current['_start']:
+                closed.append(incident)
+                continue
+            if current is not None:
+                closed.append(current)
+            open_incidents[key] = incident
+
+        self.last_timestamp = (text, epoch)
+
+    def __len__(self):
+        return len(self.closed) + len(self.open)
+
+    def incidents(self) -> List[Dict[str, Any]]:
+        """All incidents so far, closed and open, ranked by ``rank_incidents``."""
+        result = []
+        for incident in [*self.closed, *self.open.values()]:
+            event = {
+                'type': incident['type'],
+                **({'host': incident['host']} if incident['host'] is not None else {}),
+                'severity': incident['severity'],
+                'start': incident['_start_text'],
+                'end': incident['_end_text'],
+                'peak': incident['peak'],
+                'count': incident['count'],
+                'description': incident['description'],
+                'duration_seconds': int(round(incident['_end'] - incident['_start'], 6))
+            }
+            if incident['_escalations']:
+                event['escalations'] = list(incident['_escalations'])
+            result.append(event)
+        return rank_incidents(result)
+
+
+class TopAnomalies:
+    """Keeps the ``k`` most severe (ties: most recent) or most recent anomalies.
+
+    A min-heap of at most ``k`` entries; each ``add`` is O(log k), so the
+    memory used does not depend on how many anomalies are raised.
+    """
+
+    ORDERS = ('severity', 'recent')
+
+    def __init__(self, k: int = 20, by: str = 'severity'):
+        if by not in self.ORDERS:
+            raise ValueError(f"Unknown anomaly order '{by}'; use one of: {', '.join(self.ORDERS)}")
+        self.k = k
+        self.by = by
+        self.heap = []
+        self.sequence = count()
+
+    def key(self, anomaly: Dict[str, Any]):
+        if self.by == 'recent':
+            return (anomaly['timestamp'],)
+        return SEVERITY_RANK.get(anomaly['severity'], 0), anomaly['timestamp']
+
+    def add(self, anomaly: Dict[str, Any]):
+        self.add_many((anomaly,))
+
+    def add_many(self, anomalies: Iterable[Dict[str, Any]]):
+        if self.k <= 0:
+            return
+        heap = self.heap
+        key_of = self.key
+        for anomaly in anomalies:
+            if len(heap) < self.k:
+                heapq.heappush(heap, (key_of(anomaly), next(self.sequence), anomaly))
+                continue
+            # most anomalies rank below the smallest kept one on the key's first part alone
+            lowest = heap[0][0]
+            if (anomaly['timestamp'] if self.by == 'recent' else SEVERITY_RANK.get(anomaly['severity'], 0)) < lowest[0]:
+                continue
+            key = key_of(anomaly)
+            if key > lowest:
+                heapq.heapreplace(heap, (key, next(self.sequence), anomaly))
+
+    def items(self) -> List[Dict[str, Any]]:
+        """Retained anomalies, highest ranked first."""
+        return [anomaly for _, _, anomaly in sorted(self.heap, key=lambda entry: (entry[0], -entry[1]), reverse=True)]
+
+
+def coalesce_incidents(anomalies: List[Dict[str, Any]], max_gap: Optional[timedelta] = None) -> List[Dict[str, Any]]:
+    """Merge consecutive anomalies of the same type into incidents.
+
+    Two anomalies belong to the same incident when they share a type and
+    host and are at most ``max_gap`` apart. Without ``max_gap`` only
+    anomalies raised at the same timestamp are merged.
+    """
+    aggregator = IncidentAggregator(max_gap)
+    aggregator.add_many(sorted(anomalies, key=lambda a: a['timestamp']))
+    return aggregator.incidents()
+
+
+def rank_incidents(incidents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(
+        incidents,
+        key=lambda i: (SEVERITY_RANK.get(i['severity'], 0), i['duration_seconds'], i['count']),
+        reverse=True
+    )
@@ -0,0 +1,103 @@
+import heapq
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+
+def iter_json_records(filepath: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield records from a JSON array or NDJSON file without loading it whole."""
+    decoder = json.JSONDecoder()
+
+    with open(filepath, 'r') as f:
+        buffer = ""
+        pos = 0
+        in_array = None
+
+        while True:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+            if in_array is None:
+                stripped = buffer.lstrip()
+                if not stripped:
+                    if eof:
+                        return
+                    continue
+                in_array = stripped[0] == '['
+                pos = buffer.index('[') + 1 if in_array else 0
+
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                if in_array and buffer[pos] == ']':
+                    return
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break
+                yield record
+                pos = end
+
+            if eof:
+                return
+
+
+def record_time(record: Dict[str, Any]) -> datetime:
+    timestamp = record['timestamp']
+    if not isinstance(timestamp, datetime):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+class MergeReader:
+    """Streams several time-sorted report files as one time-sorted sequence.
+
+    Sources are combined with a heap-based k-way merge, so memory holds one
+    pending record per source plus the last timestamp seen per host.
+    Records repeating a timestamp already emitted for the same host (file
+    rotations, re-exports) are dropped and counted in ``duplicates``.
+    """
+
+    def __init__(self, filepaths: List[str]):
+        self.filepaths = filepaths
+        self.records = 0
+        self.duplicates = 0
+        self.unsorted = 0
+
+    def _keyed(self, index: int, filepath: str):
+        last = None
+        for record in iter_json_records(filepath):
+            try:
+                timestamp = record_time(record)
+            except (KeyError, TypeError, ValueError):
+                timestamp = None
+            if timestamp is None:
+                # let validation report the broken record without breaking the merge order
+                yield (last or datetime.min.replace(tzinfo=timezone.utc), index, record, False)
+                continue
+            if last is not None and timestamp < last:
+                self.unsorted += 1
+            last = timestamp
+            yield (timestamp, index, record, True)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        streams = [self._keyed(i, path) for i, path in enumerate(self.filepaths)]
+        last_seen = {}
+
+        for timestamp, _, record, dedupe in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+            if dedupe:
+                host = record.get('host')
+                if last_seen.get(host) == timestamp:
+                    self.duplicates += 1
+                    continue
+                last_seen[host] = timestamp
+            self.records += 1
+            yield record
@@ -1,7 +1,8 @@
 # models.py
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from pydantic import BaseModel, Field, TypeAdapter, create_model
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, FrozenSet, List, Optional, Type
 
 
 class ServiceStatus(BaseModel):
@@ -10,7 +11,15 @@ class ServiceStatus(BaseModel):
     cache: str
 
 
+class ProcessUsage(BaseModel):
+    pid: int
+    name: str
+    cpu_percent: float
+    memory_mb: float
+
+
 class Metrics(BaseModel):
+    host: Optional[str] = None
     timestamp: datetime
     cpu_usage: float
     memory_usage: float
@@ -26,3 +35,30 @@ class Metrics(BaseModel):
     temperature_celsius: float
     power_consumption_watts: float
     service_status: ServiceStatus
+    io_read_kbps: Optional[float] = None
+    io_write_kbps: Optional[float] = None
+    # share of failed service probes over the monitor's recent probes, not the application error rate
+    probe_error_rate: Optional[float] = None
+    top_processes: Optional[List[ProcessUsage]] = None
+
+
+@lru_cache(maxsize=None)
+def projected_model(fields: FrozenSet[str]) -> Type[BaseModel]:
+    """Metrics restricted to ``fields`` plus host and timestamp, with the same
+    types and defaults. Other keys in the input are skipped without being
+    validated or stored. Returns ``Metrics`` itself when every required
+    field is included."""
+    names = [name for name in Metrics.model_fields if name in fields or name in ('host', 'timestamp')]
+    if all(name in names for name, info in Metrics.model_fields.items() if info.is_required()):
+        return Metrics
+    # registered under a stable module-level name so instances can be pickled to worker processes
+    model_name = 'MetricsProjection_%x' % sum(1 << i for i, name in enumerate(Metrics.model_fields) if name in names)
+    model = create_model(model_name, __module__=__name__,
+                         **{name: (Metrics.model_fields[name].annotation, Metrics.model_fields[name]) for name in names})
+    globals()[model_name] = model
+    return model
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
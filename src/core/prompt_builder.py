@@ -0,0 +1,118 @@
+import json
+from datetime import datetime
+from typing import Dict, Any
+
+from .incidents import coalesce_incidents
+
+
+DEFAULT_TOKEN_BUDGET = 2000
+
+RECOMMENDATION_TEMPLATE = """You are an expert infrastructure engineer analyzing system anomalies and providing actionable recommendations.
+
+Analyze the following infrastructure issues and provide specific, prioritized recommendations.
+
+ANOMALY SUMMARY:
+{anomaly_summary}
+
+TOP INCIDENTS (consecutive anomalies of the same type, ranked by severity and duration;
+leading_indicators lists metrics whose movements preceded the incident on the same host, with
+their lead time and lagged correlation - use them as root-cause hints):
+{incidents}
+
+SERVICE IMPACT:
+{service_impact}
+
+Based on this analysis, provide recommendations following these guidelines:
+
+1. IMMEDIATE ACTIONS (Priority 1-2): Address critical issues that need attention within hours
+2. HIGH PRIORITY (Priority 3-5): Important optimizations to prevent escalation
+3. MEDIUM PRIORITY (Priority 6+): Preventive measures and long-term improvements
+
+For each recommendation, provide:
+- Clear description of the issue
+- Specific action to take
+- Expected impact (quantified when possible)
+- Implementation steps (commands/configuration when applicable)
+- Affected services
+- Metrics to monitor after implementation
+
+Focus on:
+- Thermal management (high temperatures detected)
+- Service reliability (API Gateway issues)
+- Error rate reduction
+- Resource optimization
+- Scalability improvements
+
+Format your response as a structured list of recommendations, prioritized by urgency and impact.
+Be specific with technical details, commands, and configuration changes.
+
+IMPORTANT: Return your response as a valid JSON object with this exact structure:
+{{
+    "timestamp": "{timestamp}",
+    "severity": "high",
+    "anomalies_detected": {total_anomalies},
+    "recommendations": [
+        {{
+            "priority": 1,
+            "category": "immediate_action|optimization|scaling|monitoring|maintenance|configuration|infrastructure",
+            "issue": "description of the issue",
+            "action": "specific action to take",
+            "impact": "expected impact",
+            "implementation": "implementation steps",
+            "affected_services": ["service1", "service2"],
+            "metrics_to_monitor": ["metric1", "metric2"]
+        }}
+    ],
+    "metrics_summary": {{
+        "critical_metrics": ["list of critical metric types"],
+        "trending_concerns": ["list of trending issues"]
+    }}
+}}"""
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English/JSON with the GPT-4o tokenizers.
+    return len(text) // 4 + 1
+
+
+def build_recommendation_prompt(analysis_data: Dict[str, Any], token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Render the recommendation prompt, adding ranked incidents until the
+    estimated prompt size reaches ``token_budget``."""
+    anomaly_summary = {
+        "total_anomalies": analysis_data['total_anomalies'],
+        "critical_severity": analysis_data['critical_count'],
+        "type_distribution": analysis_data['anomaly_breakdown'],
+        "total_metrics_analyzed": analysis_data['total_metrics']
+    }
+    if analysis_data.get('correlated_metrics'):
+        anomaly_summary["correlated_metrics"] = analysis_data['correlated_metrics'][:5]
+
+    incidents = analysis_data.get('incidents')
+    if incidents is None:
+        incidents = coalesce_incidents(analysis_data['sample_anomalies'])
+
+    def render(incident_lines):
+        return RECOMMENDATION_TEMPLATE.format(
+            anomaly_summary=json.dumps(anomaly_summary, separators=(',', ':')),
+            incidents="\n".join(incident_lines) if incident_lines else "None",
+            service_impact=json.dumps(analysis_data['service_issues'], separators=(',', ':')),
+            timestamp=datetime.now().isoformat(),
+            total_anomalies=analysis_data['total_anomalies']
+        )
+
+    # the fixed template, and the note about omitted incidents, count against the budget first
+    used = estimate_tokens(render([])) + estimate_tokens(f"\n... {len(incidents)} lower-priority incidents omitted")
+    included = []
+    for incident in incidents:
+        line = json.dumps(incident, separators=(',', ':'), ensure_ascii=False)
+        cost = estimate_tokens(line + "\n")
+        if used + cost > token_budget:
+            break
+        included.append(line)
+        used += cost
+
+    omitted = len(incidents) - len(included)
+    if omitted:
+        included.append(f"... {omitted} lower-priority incidents omitted")
+
+    return render(included)
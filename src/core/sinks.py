@@ -0,0 +1,132 @@
+import csv
+import gzip
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class AnomalySink(ABC):
+    """Receives every anomaly as it is raised (see ``InfrastructureAnalyzer(sink=...)``).
+
+    Writes are buffered and go out ``buffer_size`` anomalies at a time;
+    call ``close`` (or use the sink as a context manager) to write the rest.
+    """
+
+    def __init__(self, buffer_size: int = 1000):
+        self.buffer_size = buffer_size
+        self.buffer: List[Dict[str, Any]] = []
+        self.written = 0
+
+    def write(self, anomaly: Dict[str, Any]):
+        self.buffer.append(anomaly)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self._write_batch(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    @abstractmethod
+    def _write_batch(self, anomalies: List[Dict[str, Any]]):
+        """Write out one batch of buffered anomalies."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _open_text(path: str, compress: Optional[bool]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if compress if compress is not None else path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+class NDJSONSink(AnomalySink):
+    """One JSON object per line; gzip-compressed when ``compress`` is set or the path ends in ``.gz``."""
+
+    def __init__(self, path: str, buffer_size: int = 1000, compress: Optional[bool] = None):
+        super().__init__(buffer_size)
+        self.path = path
+        self.file = _open_text(path, compress)
+
+    def _write_batch(self, anomalies: List[Dict[str, Any]]):
+        self.file.write(''.join(json.dumps(anomaly, separators=(',', ':'), default=str) + '\n'
+                                for anomaly in anomalies))
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class CSVSink(AnomalySink):
+    """One row per anomaly with fixed ``columns``; any other keys go to a JSON ``details`` column."""
+
+    COLUMNS = ('timestamp', 'host', 'type', 'severity', 'value', 'description')
+
+    def __init__(self, path: str, buffer_size: int = 1000, compress: Optional[bool] = None,
+                 columns: Sequence[str] = COLUMNS):
+        super().__init__(buffer_size)
+        self.path = path
+        self.columns = list(columns)
+        self.file = _open_text(path, compress)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns + ['details'])
+
+    def _write_batch(self, anomalies: List[Dict[str, Any]]):
+        rows = []
+        for anomaly in anomalies:
+            details = {key: value for key, value in anomaly.items() if key not in self.columns}
+            rows.append([anomaly.get(column, '') for column in self.columns] +
+                        [json.dumps(details, separators=(',', ':'), default=str) if details else ''])
+        self.writer.writerows(rows)
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class StoreSink(AnomalySink):
+    """Keeps the latest ``max_records`` anomalies and snapshots them as a JSON
+    array, the way ``MetricsStore`` does for samples, so the dashboard and
+    agent can read recent anomalies from ``output_file``."""
+
+    def __init__(self, output_file: str = "data/outputs/anomalies.json", max_records: int = 10000,
+                 buffer_size: int = 1000):
+        super().__init__(buffer_size)
+        self.output_file = output_file
+        self.records = deque(maxlen=max_records)
+
+    def _write_batch(self, anomalies: List[Dict[str, Any]]):
+        self.records.extend(anomalies)
+        directory = os.path.dirname(self.output_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.output_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(list(self.records), f, default=str)
+        os.replace(temp_file, self.output_file)
+
+
+def open_sink(target: str, buffer_size: int = 1000) -> AnomalySink:
+    """Sink for an export target: ``store:<file.json>``, or a ``.csv`` / ``.ndjson``
+    / ``.jsonl`` path, optionally ending in ``.gz``."""
+    if target.startswith('store:'):
+        return StoreSink(target[len('store:'):] or "data/outputs/anomalies.json", buffer_size=buffer_size)
+    name = target[:-3] if target.endswith('.gz') else target
+    if name.endswith('.csv'):
+        return CSVSink(target, buffer_size)
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return NDJSONSink(target, buffer_size)
+    raise ValueError(f"Unknown export format for {target}; use .ndjson, .jsonl or .csv (optionally .gz), or store:<file>")
@@ -0,0 +1,261 @@
+import math
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from .models import Metrics
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with logarithmic buckets (DDSketch style).
+
+    Values ``v >= min_value`` are counted in bucket ``ceil(log_gamma(v))``
+    with ``gamma = (1 + a) / (1 - a)``; smaller values (zero error rates)
+    share a zero bucket. For any quantile ``q`` the returned value ``x``
+    satisfies ``|x - v_q| <= a * v_q`` where ``v_q`` is the exact sample at
+    rank ``floor(q * (n - 1))``, with ``a = relative_accuracy``. Memory is
+    at most ``max_bins`` buckets; past that the lowest buckets are folded
+    together, which only affects accuracy at the low end. Merging two
+    sketches adds their bucket counts, so the error bound still holds for
+    merges across hosts and time windows.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048, min_value: float = 1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self.bins = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        if value >= self.min_value:
+            self.bins[math.ceil(math.log(value) / self.log_gamma)] += 1
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values: np.ndarray):
+        if not len(values):
+            return
+        positive = values[values >= self.min_value]
+        indexes, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.bins[index] += count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: 'QuantileSketch'):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] += count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self) -> 'QuantileSketch':
+        return QuantileSketch(self.relative_accuracy, self.max_bins, self.min_value).merge(self)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return max(self.min, 0.0)
+
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def _collapse(self):
+        folded = sorted(self.bins)[:len(self.bins) - self.max_bins + 1]
+        for index in folded[:-1]:
+            self.bins[folded[-1]] += self.bins.pop(index)
+
+    def describe(self, quantiles: Sequence[float]) -> Dict[str, Any]:
+        summary = {'count': self.count}
+        if self.count:
+            summary['mean'] = self.total / self.count
+        for q in quantiles:
+            summary[f'p{q * 100:g}'] = self.quantile(q)
+        return summary
+
+
+class PercentileTracker:
+    """Quantile sketches per field, host and time window.
+
+    Each (field, host) series keeps one sketch per ``window_seconds``
+    bucket for the most recent ``max_windows`` buckets; older buckets are
+    folded into one sketch per UTC day, so memory per series stays bounded.
+    Any combination of hosts, windows and days is answered by merging
+    sketches, without keeping raw samples.
+    """
+
+    def __init__(self, fields: Sequence[str] = ('latency_ms', 'error_rate'), window_seconds: int = 3600,
+                 max_windows: int = 168, quantiles: Sequence[float] = (0.5, 0.95, 0.99),
+                 relative_accuracy: float = 0.01):
+        self.fields = list(fields)
+        self.window_seconds = window_seconds
+        self.max_windows = max_windows
+        self.quantiles = list(quantiles)
+        self.relative_accuracy = relative_accuracy
+        self.windows = defaultdict(OrderedDict)
+        self.days = defaultdict(dict)
+
+    def _sketch(self, field: str, host: Optional[str], window: int) -> QuantileSketch:
+        windows = self.windows[(field, host)]
+        sketch = windows.get(window)
+        if sketch is None:
+            sketch = windows[window] = QuantileSketch(self.relative_accuracy)
+            if len(windows) > self.max_windows:
+                old_window, old_sketch = windows.popitem(last=False)
+                days = self.days[(field, host)]
+                day = self._day(old_window)
+                if day in days:
+                    days[day].merge(old_sketch)
+                else:
+                    days[day] = old_sketch
+        return sketch
+
+    def _day(self, window: int) -> str:
+        return datetime.fromtimestamp(window * self.window_seconds, timezone.utc).date().isoformat()
+
+    def add(self, metric: Metrics):
+        window = int(metric.timestamp.timestamp() // self.window_seconds)
+        for field in self.fields:
+            self._sketch(field, metric.host, window).add(float(getattr(metric, field)))
+
+    def add_batch(self, series: Sequence[Metrics], columns: Optional[Dict[str, np.ndarray]] = None):
+        """Add one host's series, reusing precomputed field arrays from ``columns``."""
+        if not series:
+            return
+        columns = columns or {}
+        epochs = np.fromiter((m.timestamp.timestamp() for m in series), dtype=float, count=len(series))
+        values = {
+            field: columns[field] if field in columns else
+            np.fromiter((getattr(m, field) for m in series), dtype=float, count=len(series))
+            for field in self.fields
+        }
+        self.add_columns(epochs, values, series[0].host)
+
+    def add_columns(self, epochs: np.ndarray, columns: Dict[str, np.ndarray], host: Optional[str] = None):
+        """Add one host's samples given as epoch seconds and per-field arrays,
+        with one vectorized sketch update per window."""
+        if not len(epochs):
+            return
+        window_ids = (epochs // self.window_seconds).astype(np.int64)
+        order = None
+        if np.any(np.diff(window_ids) < 0):
+            order = np.argsort(window_ids, kind='stable')
+            window_ids = window_ids[order]
+
+        boundaries = np.flatnonzero(np.diff(window_ids)) + 1
+        starts = np.concatenate(([0], boundaries)).tolist()
+        ends = np.concatenate((boundaries, [len(window_ids)])).tolist()
+
+        for field in self.fields:
+            values = columns[field] if order is None else columns[field][order]
+            for start, end in zip(starts, ends):
+                self._sketch(field, host, int(window_ids[start])).add_many(values[start:end])
+
+    def merge(self, other: 'PercentileTracker'):
+        for key, windows in other.windows.items():
+            for window, sketch in windows.items():
+                self._sketch(key[0], key[1], window).merge(sketch)
+        for key, days in other.days.items():
+            for day, sketch in days.items():
+                if day in self.days[key]:
+                    self.days[key][day].merge(sketch)
+                else:
+                    self.days[key][day] = sketch.copy()
+        return self
+
+    def _series(self, field: str, hosts: Optional[Iterable[Optional[str]]] = None):
+        for (series_field, host), windows in self.windows.items():
+            if series_field == field and (hosts is None or host in hosts):
+                yield host, windows, self.days.get((field, host), {})
+
+    def query(self, field: str, hosts: Optional[Iterable[Optional[str]]] = None,
+              start: Optional[datetime] = None, end: Optional[datetime] = None) -> QuantileSketch:
+        """Merged sketch for ``field`` over the given hosts and [start, end) range.
+
+        Time bounds are resolved to whole windows (whole days for folded data).
+        """
+        start_window = None if start is None else int(start.timestamp() // self.window_seconds)
+        end_window = None if end is None else int(math.ceil(end.timestamp() / self.window_seconds))
+        start_day = None if start is None else self._day(start_window)
+        end_day = None if end is None else self._day(end_window)
+
+        merged = QuantileSketch(self.relative_accuracy)
+        for _, windows, days in self._series(field, hosts):
+            for window, sketch in windows.items():
+                if (start_window is None or window >= start_window) and (end_window is None or window < end_window):
+                    merged.merge(sketch)
+            for day, sketch in days.items():
+                if (start_day is None or day >= start_day) and (end_day is None or day <= end_day):
+                    merged.merge(sketch)
+        return merged
+
+    def summary(self, recent_windows: int = 24) -> Dict[str, Any]:
+        result = {
+            'relative_accuracy': self.relative_accuracy,
+            'window_seconds': self.window_seconds
+        }
+
+        for field in self.fields:
+            overall = QuantileSketch(self.relative_accuracy)
+            by_host = {}
+            by_day = defaultdict(lambda: QuantileSketch(self.relative_accuracy))
+            by_window = defaultdict(lambda: QuantileSketch(self.relative_accuracy))
+
+            for host, windows, days in self._series(field):
+                host_sketch = QuantileSketch(self.relative_accuracy)
+                for window, sketch in windows.items():
+                    host_sketch.merge(sketch)
+                    by_day[self._day(window)].merge(sketch)
+                    by_window[window].merge(sketch)
+                for day, sketch in days.items():
+                    host_sketch.merge(sketch)
+                    by_day[day].merge(sketch)
+                by_host[host or 'unknown'] = host_sketch.describe(self.quantiles)
+                overall.merge(host_sketch)
+
+            recent = sorted(by_window)[-recent_windows:]
+            result[field] = {
+                'overall': overall.describe(self.quantiles),
+                'by_host': by_host,
+                'by_day': {day: by_day[day].describe(self.quantiles) for day in sorted(by_day)},
+                'by_window': [
+                    {'start': datetime.fromtimestamp(window * self.window_seconds, timezone.utc).isoformat(),
+                     **by_window[window].describe(self.quantiles)}
+                    for window in recent
+                ]
+            }
+        return result
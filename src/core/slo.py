@@ -0,0 +1,218 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .detectors import RollingDetector, metric_columns
+from .models import Metrics
+
+
+WINDOWS = {'5m': 300, '30m': 1800, '1h': 3600, '6h': 21600}
+
+# (severity, long window, short window, burn rate) - the multiwindow,
+# multi-burn-rate alerts from the SRE workbook: 2% of a 30-day budget in
+# one hour pages, 5% in six hours opens a ticket.
+ALERT_RULES = [
+    ('critical', '1h', '5m', 14.4),
+    ('high', '6h', '30m', 6.0)
+]
+
+
+class Objective:
+    """An SLO over samples: ``target`` is the good fraction to uphold.
+
+    Error objectives count each sample's ``error_rate`` as its bad
+    fraction; latency objectives count a sample as bad when ``latency_ms``
+    exceeds ``threshold_ms``.
+    """
+
+    def __init__(self, name: str, target: float, field: str, threshold_ms: Optional[float] = None):
+        self.name = name
+        self.target = target
+        self.budget = 1 - target
+        self.field = field
+        self.threshold_ms = threshold_ms
+
+    def bad(self, metric: Metrics) -> float:
+        if self.threshold_ms is None:
+            return getattr(metric, self.field)
+        return 1.0 if getattr(metric, self.field) > self.threshold_ms else 0.0
+
+    def bad_column(self, values: np.ndarray) -> np.ndarray:
+        if self.threshold_ms is None:
+            return values
+        return (values > self.threshold_ms).astype(float)
+
+
+def default_objectives() -> List[Objective]:
+    return [
+        Objective('error_rate', float(os.getenv('SLO_ERROR_TARGET', '0.99')), 'error_rate'),
+        Objective('latency', float(os.getenv('SLO_LATENCY_TARGET', '0.95')), 'latency_ms',
+                  threshold_ms=float(os.getenv('SLO_LATENCY_THRESHOLD_MS', '300')))
+    ]
+
+
+class BudgetRing:
+    """Ring buffer of per-bucket bad and total counts with running window sums.
+
+    ``closed`` holds, for every window, the sums over its buckets before the
+    current one. Adding a sample touches only the current bucket; moving to
+    a new bucket adds the closed bucket to each window and subtracts the
+    one that fell out, so evaluation is O(windows).
+    """
+
+    def __init__(self, window_buckets: Dict[str, int]):
+        self.window_buckets = window_buckets
+        self.size = max(window_buckets.values())
+        self.bad = [0.0] * self.size
+        self.total = [0.0] * self.size
+        self.current = None
+        self.closed = {name: [0.0, 0.0] for name in window_buckets}
+
+    def add(self, bucket: int, bad: float, total: float = 1.0) -> bool:
+        if self.current is None:
+            self.current = bucket
+        elif bucket > self.current:
+            self._advance(bucket)
+        elif bucket <= self.current - self.size:
+            return False
+
+        slot = bucket % self.size
+        self.bad[slot] += bad
+        self.total[slot] += total
+        if bucket < self.current:
+            for name, width in self.window_buckets.items():
+                if self.current - bucket < width:
+                    self.closed[name][0] += bad
+                    self.closed[name][1] += total
+        return True
+
+    def _advance(self, bucket: int):
+        if bucket - self.current >= self.size:
+            self.bad = [0.0] * self.size
+            self.total = [0.0] * self.size
+            self.closed = {name: [0.0, 0.0] for name in self.window_buckets}
+            self.current = bucket
+            return
+
+        for closing in range(self.current, bucket):
+            closing_slot = closing % self.size
+            for name, width in self.window_buckets.items():
+                sums = self.closed[name]
+                leaving_slot = (closing + 1 - width) % self.size
+                sums[0] += self.bad[closing_slot] - self.bad[leaving_slot]
+                sums[1] += self.total[closing_slot] - self.total[leaving_slot]
+            next_slot = (closing + 1) % self.size
+            self.bad[next_slot] = 0.0
+            self.total[next_slot] = 0.0
+        self.current = bucket
+
+    def window(self, name: str):
+        slot = self.current % self.size
+        bad, total = self.closed[name]
+        return bad + self.bad[slot], total + self.total[slot]
+
+
+class SLOEngine(RollingDetector):
+    """Multi-window burn-rate alerting for error-rate and latency SLOs.
+
+    Every sample is bucketed (``bucket_seconds``) into a per-host
+    ``BudgetRing`` for each objective. The burn rate of a window is its bad
+    fraction divided by the error budget. A rule fires when both its long
+    and short window burn faster than its threshold, and is reported once
+    per episode as a ``<objective>_burn_rate`` anomaly.
+    """
+
+    name = 'slo'
+    label = 'SLO'
+
+    def __init__(self, objectives: Optional[Sequence[Objective]] = None, bucket_seconds: int = 60,
+                 rules: Sequence = ALERT_RULES, windows: Dict[str, int] = WINDOWS):
+        self.objectives = list(objectives or default_objectives())
+        super().__init__(sorted({objective.field for objective in self.objectives}))
+        self.bucket_seconds = bucket_seconds
+        self.rules = list(rules)
+        self.windows = {name: windows[name] for rule in self.rules for name in rule[1:3]}
+        self.window_buckets = {name: max(1, seconds // bucket_seconds) for name, seconds in self.windows.items()}
+
+    def _new_state(self):
+        return {'ring': BudgetRing(self.window_buckets), 'active': [False] * len(self.rules)}
+
+    def burn_rates(self, objective: Objective, ring: BudgetRing) -> Dict[str, float]:
+        rates = {}
+        for name in self.windows:
+            bad, total = ring.window(name)
+            rates[name] = bad / total / objective.budget if total else 0.0
+        return rates
+
+    def update(self, metric: Metrics) -> List[Dict[str, Any]]:
+        state = self.states.get(metric.host)
+        if state is None:
+            state = self.states[metric.host] = {objective.name: self._new_state() for objective in self.objectives}
+
+        bucket = int(metric.timestamp.timestamp() // self.bucket_seconds)
+        anomalies = []
+        for objective in self.objectives:
+            series = state[objective.name]
+            if not series['ring'].add(bucket, objective.bad(metric)):
+                continue
+
+            rates = self.burn_rates(objective, series['ring'])
+            for i, (severity, long_window, short_window, factor) in enumerate(self.rules):
+                firing = rates[long_window] >= factor and rates[short_window] >= factor
+                if firing and not series['active'][i]:
+                    anomalies.append(self._burn_anomaly(metric, objective, self.rules[i], rates))
+                series['active'][i] = firing
+        return anomalies
+
+    def detect_batch(self, series: Sequence[Metrics],
+                     columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+        if not series:
+            return []
+        if columns is None:
+            columns = metric_columns(series, self.fields)
+
+        buckets = np.fromiter((m.timestamp.timestamp() for m in series), dtype=float, count=len(series))
+        buckets = (buckets // self.bucket_seconds).astype(np.int64)
+        rows = np.arange(len(series))
+
+        # first sample of each window ending at every sample's bucket
+        window_starts = {
+            name: np.searchsorted(buckets, buckets - width + 1, side='left')
+            for name, width in self.window_buckets.items()
+        }
+        total_sums = np.arange(len(series) + 1, dtype=float)
+
+        flagged = []
+        for position, objective in enumerate(self.objectives):
+            bad_sums = np.concatenate(([0.0], np.cumsum(objective.bad_column(columns[objective.field]))))
+            rates = {}
+            for name, starts in window_starts.items():
+                rates[name] = (bad_sums[rows + 1] - bad_sums[starts]) / (total_sums[rows + 1] - total_sums[starts]) / objective.budget
+
+            for rule in self.rules:
+                _, long_window, short_window, factor = rule
+                firing = (rates[long_window] >= factor) & (rates[short_window] >= factor)
+                onsets = firing & ~np.concatenate(([False], firing[:-1]))
+                for i in np.flatnonzero(onsets):
+                    flagged.append((i, position, self._burn_anomaly(
+                        series[i], objective, rule, {name: float(values[i]) for name, values in rates.items()})))
+
+        flagged.sort(key=lambda item: (item[0], item[1]))
+        return [anomaly for _, _, anomaly in flagged]
+
+    def _burn_anomaly(self, metric: Metrics, objective: Objective, rule, rates: Dict[str, float]) -> Dict[str, Any]:
+        severity, long_window, short_window, factor = rule
+        anomaly = {
+            'timestamp': metric.timestamp.isoformat(),
+            'type': f'{objective.name}_burn_rate',
+            'severity': severity,
+            'value': rates[long_window],
+            'description': f'{objective.name} SLO ({objective.target:.2%}) burning error budget '
+                           f'{rates[long_window]:.1f}x over {long_window} and {rates[short_window]:.1f}x '
+                           f'over {short_window} (threshold {factor}x)',
+            'burn_rates': {name: round(rate, 2) for name, rate in rates.items()}
+        }
+        if metric.host is not None:
+            anomaly['host'] = metric.host
+        return anomaly
@@ -0,0 +1,69 @@
+import heapq
+from datetime import timedelta
+from itertools import count
+from typing import Dict, Iterator, List, Optional
+
+from .models import Metrics
+
+
+class ReorderBuffer:
+    """Event-time reorder buffer with a per-host watermark.
+
+    Each host's watermark trails the newest timestamp seen for that host by
+    ``allowed_lateness``. Samples are held until the watermark passes them
+    and are then released in timestamp order, so window state downstream
+    sees late (but not too late) samples in their correct position. Samples
+    older than the watermark on arrival are dropped and counted in
+    ``dropped_late``. ``max_buffered`` bounds memory per host by releasing
+    the oldest samples early when a host falls too far behind.
+    """
+
+    def __init__(self, allowed_lateness: timedelta, max_buffered: int = 10000):
+        self.allowed_lateness = allowed_lateness
+        self.max_buffered = max_buffered
+        self.heaps: Dict[Optional[str], list] = {}
+        self.max_event_time = {}
+        self.watermarks = {}
+        self.sequence = count()
+        self.reordered = 0
+        self.dropped_late = 0
+        self.forced_releases = 0
+
+    def push(self, metric: Metrics) -> List[Metrics]:
+        host = metric.host
+        watermark = self.watermarks.get(host)
+        if watermark is not None and metric.timestamp < watermark:
+            self.dropped_late += 1
+            return []
+
+        newest = self.max_event_time.get(host)
+        if newest is not None and metric.timestamp < newest:
+            self.reordered += 1
+        if newest is None or metric.timestamp > newest:
+            newest = self.max_event_time[host] = metric.timestamp
+            self.watermarks[host] = newest - self.allowed_lateness
+
+        heap = self.heaps.setdefault(host, [])
+        heapq.heappush(heap, (metric.timestamp, next(self.sequence), metric))
+
+        released = []
+        watermark = self.watermarks[host]
+        while heap and (heap[0][0] <= watermark or len(heap) > self.max_buffered):
+            if heap[0][0] > watermark:
+                self.forced_releases += 1
+                self.watermarks[host] = heap[0][0]
+            released.append(heapq.heappop(heap)[2])
+        return released
+
+    def flush(self) -> Iterator[Metrics]:
+        for heap in self.heaps.values():
+            while heap:
+                yield heapq.heappop(heap)[2]
+
+    def stats(self):
+        return {
+            'allowed_lateness_seconds': self.allowed_lateness.total_seconds(),
+            'reordered_samples': self.reordered,
+            'late_samples_dropped': self.dropped_late,
+            'forced_releases': self.forced_releases
+        }
@@ -19,12 +19,10 @@ def analyze_realtime_data():
     print(f"Analyzing real-time infrastructure metrics from {metrics_file}...")
 
     analyzer = InfrastructureAnalyzer()
-    metrics = analyzer.load_data(metrics_file)
+    analysis = analyzer.analyze_file(metrics_file)
 
-    if len(metrics) < 5:
-        print(f"\nWarning: Only {len(metrics)} metrics found. Run the monitor longer for better analysis.")
-
-    analysis = analyzer.detect_anomalies(metrics)
+    if analysis['total_metrics'] < 5:
+        print(f"\nWarning: Only {analysis['total_metrics']} metrics found. Run the monitor longer for better analysis.")
 
     if analysis['total_anomalies'] > 0:
         print("\n=== Recommendation Generation Node ===")
@@ -0,0 +1,595 @@
+import asyncio
+import heapq
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import psutil
+
+
+def cpu_time_total(times):
+    # guest time is already accounted for in user/nice on Linux
+    return sum(times) - getattr(times, "guest", 0) - getattr(times, "guest_nice", 0)
+
+
+class Collector(ABC):
+    """Base class for metric collectors run by ``CollectorRunner``.
+
+    ``collect`` returns a partial metrics dict (``Metrics`` field names, plus
+    ``service_status`` / ``probe_latency_ms`` / ``probe_ok`` sub-dicts keyed
+    by service).
+    ``on_timeout`` is used instead when the collector exceeds its timeout.
+    A collector with an ``interval`` runs at most once per ``interval``
+    seconds; on the ticks in between its last result is reused.
+    """
+
+    name = "collector"
+
+    def __init__(self, timeout=1.0, interval=None):
+        self.timeout = timeout
+        self.interval = interval
+
+    @abstractmethod
+    async def collect(self):
+        ...
+
+    def on_timeout(self):
+        return {}
+
+
+class TcpProbe(Collector):
+    def __init__(self, service, host, port, timeout=1.0, degraded_ms=500):
+        super().__init__(timeout)
+        self.name = f"tcp:{service}"
+        self.service = service
+        self.host = host
+        self.port = port
+        self.degraded_ms = degraded_ms
+
+    async def collect(self):
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.open_connection(self.host, self.port)
+        except OSError:
+            return self._result("offline", None)
+        latency = (time.perf_counter() - start) * 1000
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return self._result("degraded" if latency > self.degraded_ms else "online", latency)
+
+    def on_timeout(self):
+        return self._result("offline", None)
+
+    def _result(self, status, latency):
+        return {
+            "service_status": {self.service: status},
+            "probe_latency_ms": {self.service: latency},
+            "probe_ok": {self.service: status != "offline"}
+        }
+
+
+class HttpProbe(TcpProbe):
+    def __init__(self, service, url, timeout=2.0, degraded_ms=500):
+        parsed = urlparse(url)
+        secure = parsed.scheme == "https"
+        super().__init__(service, parsed.hostname, parsed.port or (443 if secure else 80), timeout, degraded_ms)
+        self.name = f"http:{service}"
+        self.secure = secure
+        self.path = parsed.path or "/"
+        if parsed.query:
+            self.path += f"?{parsed.query}"
+
+    async def collect(self):
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.secure or None)
+        except OSError:
+            return self._result("offline", None)
+
+        try:
+            writer.write(f"GET {self.path} HTTP/1.1\r\nHost: {self.host}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            status_line = await reader.readline()
+        except OSError:
+            return self._result("offline", None)
+        finally:
+            writer.close()
+
+        latency = (time.perf_counter() - start) * 1000
+        try:
+            status_code = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            return self._result("offline", latency)
+
+        if status_code >= 500:
+            return self._result("offline", latency)
+        if status_code >= 400 or latency > self.degraded_ms:
+            return self._result("degraded", latency)
+        return self._result("online", latency)
+
+
+class ConnectionCounter(Collector):
+    name = "connections"
+
+    def __init__(self, timeout=1.0, interval=10.0):
+        super().__init__(timeout, interval)
+        self.last_count = 0
+
+    async def collect(self):
+        self.last_count = await asyncio.to_thread(self._count)
+        return {"active_connections": self.last_count}
+
+    def on_timeout(self):
+        return {"active_connections": self.last_count}
+
+    @staticmethod
+    def _count():
+        return sum(1 for conn in psutil.net_connections(kind="inet") if conn.status == psutil.CONN_ESTABLISHED)
+
+
+class CpuTimesReader(Collector):
+    """Host CPU usage and io_wait from one ``cpu_times`` delta per run."""
+
+    name = "cpu_times"
+
+    def __init__(self, timeout=0.5, interval=None):
+        super().__init__(timeout, interval)
+        self.last_times = psutil.cpu_times()
+
+    async def collect(self):
+        current = psutil.cpu_times()
+        last = self.last_times
+        self.last_times = current
+
+        total = cpu_time_total(current) - cpu_time_total(last)
+        if total <= 0:
+            return {"cpu_usage": 0.0, "io_wait": 0.0}
+        iowait = getattr(current, "iowait", 0) - getattr(last, "iowait", 0)
+        idle = (current.idle - last.idle) + iowait
+        return {
+            "cpu_usage": max(0.0, min(100.0, (total - idle) / total * 100)),
+            "io_wait": iowait / total * 100
+        }
+
+
+class MemoryReader(Collector):
+    name = "memory"
+
+    async def collect(self):
+        return {"memory_usage": psutil.virtual_memory().percent}
+
+
+class DiskUsageReader(Collector):
+    """Filesystem usage, which changes slowly, so it is read every ``interval`` seconds."""
+
+    name = "disk"
+
+    def __init__(self, path="/", timeout=0.5, interval=30.0):
+        super().__init__(timeout, interval)
+        self.path = path
+
+    async def collect(self):
+        return {"disk_usage": psutil.disk_usage(self.path).percent}
+
+
+class NetworkReader(Collector):
+    name = "network"
+
+    def __init__(self, timeout=0.5, interval=None):
+        super().__init__(timeout, interval)
+        self.last_io = psutil.net_io_counters()
+        self.last_time = time.monotonic()
+
+    async def collect(self):
+        current = psutil.net_io_counters()
+        now = time.monotonic()
+        elapsed = now - self.last_time
+        last = self.last_io
+        self.last_io = current
+        self.last_time = now
+
+        if elapsed <= 0:
+            return {"network_in_kbps": 0.0, "network_out_kbps": 0.0}
+        return {
+            "network_in_kbps": (current.bytes_recv - last.bytes_recv) * 8 / (1024 * elapsed),
+            "network_out_kbps": (current.bytes_sent - last.bytes_sent) * 8 / (1024 * elapsed)
+        }
+
+
+class ProcessCollector(Collector):
+    """Top CPU and memory consumers, tracked incrementally between ticks.
+
+    Process handles are cached by pid so each tick costs one ``oneshot()``
+    read per live process; CPU is derived from the cpu_times delta since the
+    previous tick and only the top ``top_n`` per resource are kept in bounded
+    heaps. Scans run at most every ``min_interval`` seconds, one at a time
+    on a dedicated thread: a scan that outlives the collector timeout keeps
+    running, no new scan starts meanwhile, and its result is published by
+    the first tick after it finishes.
+    """
+
+    name = "processes"
+
+    def __init__(self, top_n=5, min_interval=2.0, timeout=1.0):
+        super().__init__(timeout, min_interval)
+        self.top_n = top_n
+        self.min_interval = min_interval
+        self.processes = {}
+        self.last_cpu = {}
+        self.last_scan = None
+        self.last_result = []
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="process-scan")
+        self.scan = None
+
+    async def collect(self):
+        self._publish()
+        if self.scan is None:
+            self.scan = self.executor.submit(self._scan, time.monotonic())
+        # shielded so a timeout only stops waiting; the scan itself is never abandoned
+        await asyncio.shield(asyncio.wrap_future(self.scan))
+        self._publish()
+        return {"top_processes": self.last_result}
+
+    def on_timeout(self):
+        self._publish()
+        return {"top_processes": self.last_result}
+
+    def _publish(self):
+        if self.scan is None or not self.scan.done():
+            return
+        scan, self.scan = self.scan, None
+        try:
+            self.last_result = scan.result()
+        except Exception as e:
+            print(f"\nProcess scan failed: {e}")
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _scan(self, now):
+        elapsed = now - self.last_scan if self.last_scan is not None else None
+        self.last_scan = now
+
+        pids = set(psutil.pids())
+        for pid in list(self.processes):
+            if pid not in pids:
+                del self.processes[pid]
+                self.last_cpu.pop(pid, None)
+
+        top_cpu = []
+        top_memory = []
+        for pid in pids:
+            process = self.processes.get(pid)
+            if process is None:
+                try:
+                    process = self.processes[pid] = psutil.Process(pid)
+                except psutil.Error:
+                    continue
+
+            try:
+                with process.oneshot():
+                    times = process.cpu_times()
+                    rss = process.memory_info().rss
+            except psutil.Error:
+                self.processes.pop(pid, None)
+                self.last_cpu.pop(pid, None)
+                continue
+
+            cpu_seconds = times.user + times.system
+            last = self.last_cpu.get(pid)
+            self.last_cpu[pid] = cpu_seconds
+            cpu = (cpu_seconds - last) / elapsed * 100 if last is not None and elapsed else 0.0
+
+            self._push(top_cpu, (cpu, pid, rss))
+            self._push(top_memory, (rss, pid, cpu))
+
+        selected = {pid: (cpu, rss) for cpu, pid, rss in top_cpu}
+        selected.update({pid: (cpu, rss) for rss, pid, cpu in top_memory})
+
+        result = []
+        for pid, (cpu, rss) in selected.items():
+            try:
+                name = self.processes[pid].name()
+            except psutil.Error:
+                name = "?"
+            result.append({
+                "pid": pid,
+                "name": name,
+                "cpu_percent": round(cpu, 1),
+                "memory_mb": round(rss / (1024 * 1024), 1)
+            })
+
+        result.sort(key=lambda p: (p["cpu_percent"], p["memory_mb"]), reverse=True)
+        return result
+
+    def _push(self, heap, item):
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+
+class CgroupCollector(Collector):
+    """Container CPU, memory, IO and task counts read straight from cgroup v2.
+
+    Files are opened once and re-read with ``preadv`` into a preallocated
+    buffer, which costs a handful of syscalls per sample instead of the
+    /proc walks behind the equivalent psutil calls.
+    """
+
+    name = "cgroup"
+    FILES = ("cpu.stat", "memory.current", "io.stat", "pids.current")
+
+    def __init__(self, path=None, timeout=0.5, buffer_size=16384):
+        super().__init__(timeout)
+        self.path = path or self.default_path()
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.fds = {}
+        for filename in self.FILES:
+            try:
+                self.fds[filename] = os.open(os.path.join(self.path, filename), os.O_RDONLY)
+            except OSError:
+                pass
+
+        self.cpus = self._read_cpu_limit()
+        self.memory_limit = self._read_memory_limit()
+        self.last_time = time.monotonic()
+        self.last_cpu_usec = self._cpu_usec()
+        self.last_io = self._io_bytes()
+
+    @staticmethod
+    def default_path():
+        path = "/"
+        try:
+            with open("/proc/self/cgroup") as f:
+                for line in f:
+                    if line.startswith("0::"):
+                        path = line[3:].strip()
+        except OSError:
+            pass
+        return os.path.join("/sys/fs/cgroup", path.lstrip("/"))
+
+    @classmethod
+    def available(cls, path=None):
+        return os.path.exists(os.path.join(path or cls.default_path(), "cgroup.controllers"))
+
+    def _read(self, filename):
+        fd = self.fds.get(filename)
+        if fd is None:
+            return None
+        size = os.preadv(fd, [self.buffer], 0)
+        return self.view[:size].tobytes()
+
+    def _read_cpu_limit(self):
+        try:
+            with open(os.path.join(self.path, "cpu.max")) as f:
+                quota, period = f.read().split()
+            if quota != "max":
+                return int(quota) / int(period)
+        except (OSError, ValueError):
+            pass
+        return os.cpu_count() or 1
+
+    def _read_memory_limit(self):
+        try:
+            with open(os.path.join(self.path, "memory.max")) as f:
+                value = f.read().strip()
+            if value != "max":
+                return int(value)
+        except (OSError, ValueError):
+            pass
+        return psutil.virtual_memory().total
+
+    def _cpu_usec(self):
+        data = self._read("cpu.stat")
+        if data is None:
+            return None
+        # first line is always "usage_usec <n>"
+        return int(data.split(None, 2)[1])
+
+    def _io_bytes(self):
+        data = self._read("io.stat")
+        if data is None:
+            return None
+        read_bytes = write_bytes = 0
+        for field in data.split():
+            if field.startswith(b"rbytes="):
+                read_bytes += int(field[7:])
+            elif field.startswith(b"wbytes="):
+                write_bytes += int(field[7:])
+        return read_bytes, write_bytes
+
+    async def collect(self):
+        now = time.monotonic()
+        elapsed = now - self.last_time
+        self.last_time = now
+        result = {}
+
+        cpu_usec = self._cpu_usec()
+        if cpu_usec is not None and self.last_cpu_usec is not None and elapsed > 0:
+            cpu = (cpu_usec - self.last_cpu_usec) / (elapsed * 1e6 * self.cpus) * 100
+            result["cpu_usage"] = max(0.0, min(100.0, cpu))
+        self.last_cpu_usec = cpu_usec
+
+        memory = self._read("memory.current")
+        if memory is not None:
+            result["memory_usage"] = int(memory) / self.memory_limit * 100
+
+        io = self._io_bytes()
+        if io is not None and self.last_io is not None and elapsed > 0:
+            result["io_read_kbps"] = (io[0] - self.last_io[0]) * 8 / (1024 * elapsed)
+            result["io_write_kbps"] = (io[1] - self.last_io[1]) * 8 / (1024 * elapsed)
+        self.last_io = io
+
+        pids = self._read("pids.current")
+        if pids is not None:
+            result["thread_count"] = int(pids)
+
+        return result
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
+
+# tolerance for tick jitter when checking whether a collector's interval has elapsed
+PERIOD_SLACK = 0.05
+
+
+class CollectorRunner:
+    """Runs collectors concurrently on a private event loop thread.
+
+    Each collector is bounded by its own timeout and only runs when its own
+    ``interval`` has elapsed. A round waits at most ``deadline`` seconds:
+    collectors still running then keep running in the background and their
+    last result is reused until they finish, so a slow probe neither delays
+    the next sample nor is cut short and counted as failed. Probe failures
+    are tracked over the last ``error_window`` probes and reported as
+    ``probe_error_rate``, separately from the application ``error_rate``.
+    """
+
+    def __init__(self, collectors, deadline=None, error_window=50):
+        self.collectors = collectors
+        self.deadline = deadline
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="collectors", daemon=True)
+        self.thread.start()
+        self.probe_results = deque(maxlen=error_window)
+        self.last_run = {}
+        self.last_results = {}
+        self.running = {}
+
+    def collect(self):
+        fresh, results = asyncio.run_coroutine_threadsafe(self._collect_all(), self.loop).result()
+
+        merged = {"service_status": {}, "probe_latency_ms": {}, "probe_ok": {}}
+        for result in results:
+            for key, value in result.items():
+                if isinstance(value, dict):
+                    merged.setdefault(key, {}).update(value)
+                else:
+                    merged[key] = value
+
+        latencies = merged.pop("probe_latency_ms")
+        merged.pop("probe_ok")
+        # reused results of collectors that were not due are not counted twice
+        for result in fresh:
+            self.probe_results.extend(result.get("probe_ok", {}).values())
+
+        successful = [latency for latency in latencies.values() if latency is not None]
+        if successful:
+            merged["latency_ms"] = sum(successful) / len(successful)
+        if self.probe_results:
+            merged["probe_error_rate"] = self.probe_results.count(False) / len(self.probe_results)
+
+        return merged
+
+    def due(self, now):
+        return [collector for collector in self.collectors
+                if collector not in self.running and
+                (collector.interval is None or collector not in self.last_run
+                 or now - self.last_run[collector] >= collector.interval - PERIOD_SLACK)]
+
+    async def _collect_all(self):
+        now = time.monotonic()
+        for collector in self.due(now):
+            self.last_run[collector] = now
+            self.running[collector] = asyncio.ensure_future(self._run(collector))
+        if self.running:
+            await asyncio.wait(list(self.running.values()), timeout=self.deadline)
+
+        fresh = []
+        for collector, task in list(self.running.items()):
+            if task.done():
+                del self.running[collector]
+                self.last_results[collector] = task.result()
+                fresh.append(task.result())
+        return fresh, [self.last_results[collector] for collector in self.collectors if collector in self.last_results]
+
+    async def _run(self, collector):
+        try:
+            return await asyncio.wait_for(collector.collect(), collector.timeout)
+        except asyncio.TimeoutError:
+            return collector.on_timeout()
+        except Exception as e:
+            print(f"\nCollector {collector.name} failed: {e}")
+            return collector.on_timeout()
+
+    def close(self):
+        for collector in self.collectors:
+            if hasattr(collector, "close"):
+                collector.close()
+        asyncio.run_coroutine_threadsafe(self._cancel_running(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _cancel_running(self):
+        for task in self.running.values():
+            task.cancel()
+        await asyncio.gather(*self.running.values(), return_exceptions=True)
+        self.running = {}
+
+
+PROBE_SCHEMES = ("tcp", "http", "https")
+
+
+def build_probe(service, target, timeout):
+    parsed = urlparse(target)
+    if parsed.scheme not in PROBE_SCHEMES or not parsed.hostname:
+        raise ValueError(f"Invalid probe target for {service}: {target!r}; "
+                         f"use tcp://host:port, http://host:port/path or https://host:port/path")
+    if parsed.scheme in ("http", "https"):
+        return HttpProbe(service, target, timeout=timeout)
+    if parsed.port is None:
+        raise ValueError(f"Invalid probe target for {service}: {target!r}; tcp probes need a port")
+    return TcpProbe(service, parsed.hostname, parsed.port, timeout=timeout)
+
+
+def build_default_collectors():
+    """Collectors configured from the environment.
+
+    Host CPU, io_wait, memory and network are read every tick; disk usage
+    every DISK_INTERVAL seconds (30) and connections every
+    CONNECTIONS_INTERVAL seconds (10). Service probes are enabled by
+    DATABASE_PROBE, API_GATEWAY_PROBE and CACHE_PROBE, e.g.
+    ``tcp://db:5432`` or ``http://gateway:8080/health``. Container CPU and
+    memory come from cgroup v2 instead of the host figures when running in
+    Docker or when CGROUP_PATH points at the cgroup to monitor.
+    MONITOR_TOP_PROCESSES=N attaches the top N CPU and memory consumers to
+    each sample.
+    """
+    timeout = float(os.getenv("PROBE_TIMEOUT", "1.0"))
+    collectors = [
+        CpuTimesReader(),
+        NetworkReader(),
+        DiskUsageReader(interval=float(os.getenv("DISK_INTERVAL", "30"))),
+        ConnectionCounter(interval=float(os.getenv("CONNECTIONS_INTERVAL", "10")))
+    ]
+
+    top_processes = int(os.getenv("MONITOR_TOP_PROCESSES", "0"))
+    if top_processes > 0:
+        collectors.append(ProcessCollector(top_n=top_processes))
+
+    cgroup_path = os.getenv("CGROUP_PATH")
+    if (cgroup_path or os.path.exists("/.dockerenv")) and CgroupCollector.available(cgroup_path):
+        # merged after CpuTimesReader, so the container CPU usage replaces the host figure
+        collectors.append(CgroupCollector(cgroup_path))
+    else:
+        collectors.append(MemoryReader())
+
+    for service in ("database", "api_gateway", "cache"):
+        target = os.getenv(f"{service.upper()}_PROBE")
+        if target:
+            collectors.append(build_probe(service, target, timeout))
+
+    return collectors
@@ -0,0 +1,332 @@
+from src.services.metrics_store import MetricsStore, metrics_list_adapter
+from src.core.models import Metrics
+import asyncio
+import json
+import os
+import signal
+import struct
+import time
+import zlib
+
+from pydantic import ValidationError
+
+
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+ACK = b"\x06"
+
+
+class IngestStats:
+    def __init__(self):
+        self.received = 0
+        self.accepted = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.started_at = time.monotonic()
+
+    def as_dict(self):
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "received": self.received,
+            "accepted": self.accepted,
+            "invalid": self.invalid,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+            "samples_per_second": round(self.accepted / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        lines = [line for line in data.split(b"\n") if line.strip()]
+        if lines:
+            self.server.offer_nowait(lines, addr[0])
+
+
+class IngestServer:
+    """Receives batched samples from many SimpleMonitor instances.
+
+    TCP connections carry either NDJSON (one sample per line) or frames of
+    a 4-byte big-endian length followed by a JSON array or NDJSON payload,
+    optionally gzip-compressed (at most ``MAX_PAYLOAD_SIZE`` bytes once
+    decompressed); the first byte of a connection selects the mode. Each
+    frame is acknowledged with one ACK byte, in order, once its samples have
+    been written to the store's file. A frame whose ack never arrives is
+    resent by the client, so delivery is at-least-once. UDP datagrams carry
+    NDJSON. Batches are validated in bulk with one pydantic call and go
+    through a bounded queue: a full queue stops reading from TCP sockets
+    (backpressure via flow control) and drops UDP datagrams (counted).
+    Samples without a host label are labelled with the peer address.
+    """
+
+    def __init__(self, store, host="0.0.0.0", port=9100, udp_port=None, queue_size=256,
+                 max_batch_lines=5000, flush_interval=1.0):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.udp_port = udp_port
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.max_batch_lines = max_batch_lines
+        self.flush_interval = flush_interval
+        self.stats = IngestStats()
+        self.tcp_server = None
+        self.udp_transport = None
+        self.tasks = []
+        self.connections = set()
+        # frames waiting for the next store flush before they are acked
+        self.pending_acks = []
+        self.flush_requested = asyncio.Event()
+
+    async def start(self):
+        self.tcp_server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.tcp_server.sockets[0].getsockname()[1]
+
+        if self.udp_port is not None:
+            loop = asyncio.get_running_loop()
+            self.udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self), local_addr=(self.host, self.udp_port)
+            )
+            self.udp_port = self.udp_transport.get_extra_info("sockname")[1]
+
+        self.tasks = [
+            asyncio.create_task(self._consume()),
+            asyncio.create_task(self._flush_periodically())
+        ]
+        print(f"Ingestion server listening on tcp://{self.host}:{self.port}"
+              + (f" and udp://{self.host}:{self.udp_port}" if self.udp_port is not None else ""))
+
+    async def stop(self):
+        if self.tcp_server is not None:
+            self.tcp_server.close()
+            await self.tcp_server.wait_closed()
+        if self.udp_transport is not None:
+            self.udp_transport.close()
+        for connection in list(self.connections):
+            connection.cancel()
+
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await asyncio.to_thread(self.store.flush)
+
+    def offer_nowait(self, lines, peer):
+        try:
+            self.queue.put_nowait((b"[" + b",".join(lines) + b"]", lines, peer, None))
+        except asyncio.QueueFull:
+            self.stats.dropped += len(lines)
+
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")[0]
+        self.connections.add(asyncio.current_task())
+        try:
+            first = await reader.read(1)
+            if not first:
+                return
+            if first in b"{[ \r\n\t":
+                await self._read_ndjson(reader, first, peer)
+            else:
+                await self._read_frames(reader, writer, first, peer)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        except ValueError as e:
+            print(f"Closing connection from {peer}: {e}")
+        finally:
+            self.connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def _read_ndjson(self, reader, pending, peer):
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                break
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            lines = [line for line in lines if line.strip()]
+            for i in range(0, len(lines), self.max_batch_lines):
+                batch = lines[i:i + self.max_batch_lines]
+                await self.queue.put((b"[" + b",".join(batch) + b"]", batch, peer, None))
+
+        if pending.strip():
+            await self.queue.put((b"[" + pending + b"]", [pending], peer, None))
+
+    async def _read_frames(self, reader, writer, first, peer):
+        # acks are written by a separate task so the client can pipeline frames
+        acks = asyncio.Queue()
+        sender = asyncio.create_task(self._send_acks(writer, acks))
+        try:
+            header = first + await reader.readexactly(FRAME_HEADER.size - 1)
+            while True:
+                (size,) = FRAME_HEADER.unpack(header)
+                if size > MAX_FRAME_SIZE:
+                    raise ValueError(f"frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+
+                payload = await reader.readexactly(size)
+                if payload[:2] == GZIP_MAGIC:
+                    payload = self.decompress(payload)
+
+                done = asyncio.get_running_loop().create_future()
+                if payload.lstrip()[:1] == b"[":
+                    await self.queue.put((payload, None, peer, done))
+                else:
+                    lines = [line for line in payload.split(b"\n") if line.strip()]
+                    if lines:
+                        await self.queue.put((b"[" + b",".join(lines) + b"]", lines, peer, done))
+                    else:
+                        done.set_result(True)
+                acks.put_nowait(done)
+
+                header = await reader.read(FRAME_HEADER.size)
+                if not header:
+                    break
+                if len(header) < FRAME_HEADER.size:
+                    header += await reader.readexactly(FRAME_HEADER.size - len(header))
+
+            acks.put_nowait(None)
+            await sender
+        finally:
+            sender.cancel()
+
+    @staticmethod
+    async def _send_acks(writer, acks):
+        while True:
+            done = await acks.get()
+            if done is None:
+                return
+            if not await done:
+                # hang up without an ack: the client keeps the frame and sends it again
+                writer.close()
+                return
+            writer.write(ACK)
+
+    @staticmethod
+    def decompress(payload, limit=MAX_PAYLOAD_SIZE):
+        """Gunzip ``payload``, refusing to inflate it past ``limit`` bytes."""
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(payload, limit)
+        except zlib.error as e:
+            raise ValueError(f"corrupt gzip frame: {e}")
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"gzip frame inflates past the {limit} byte limit")
+        if not decompressor.eof:
+            raise ValueError("truncated gzip frame")
+        return data
+
+    async def _consume(self):
+        while True:
+            payload, lines, peer, done = await self.queue.get()
+            try:
+                metrics, invalid = self.validate_batch(payload, lines)
+                for metric in metrics:
+                    if metric.host is None:
+                        metric.host = peer
+                self.store.add(metrics)
+
+                self.stats.batches += 1
+                self.stats.accepted += len(metrics)
+                self.stats.invalid += invalid
+                self.stats.received += len(metrics) + invalid
+                if done is not None:
+                    self.pending_acks.append(done)
+                    if self.queue.empty():
+                        self.flush_requested.set()
+            except Exception as e:
+                # one bad batch must not stop ingestion for every other client
+                print(f"Error ingesting batch from {peer}: {e}")
+                self.stats.errors += 1
+                if done is not None and not done.done():
+                    done.set_result(False)
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def validate_batch(payload, lines=None):
+        try:
+            return metrics_list_adapter.validate_json(payload), 0
+        except ValidationError:
+            pass
+
+        # Fall back to per-record validation so one bad sample does not
+        # reject the rest of the batch.
+        if lines is None:
+            try:
+                lines = json.loads(payload)
+            except ValueError:
+                return [], 1
+            if not isinstance(lines, list):
+                return [], 1
+            validate = Metrics.model_validate
+        else:
+            validate = Metrics.model_validate_json
+
+        metrics = []
+        invalid = 0
+        for record in lines:
+            try:
+                metrics.append(validate(record))
+            except (ValidationError, ValueError):
+                invalid += 1
+        return metrics, invalid
+
+    async def _flush_periodically(self):
+        # flushes early once the queue drains with frames waiting for their
+        # ack, but rests at least as long as the last flush took so rewriting
+        # the file never takes more than half the time; frames stored while a
+        # flush runs are acked after the next one
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            acks, self.pending_acks = self.pending_acks, []
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(self.store.flush)
+                stored = True
+            except OSError as e:
+                print(f"Error writing {self.store.output_file}: {e}")
+                stored = False
+            for done in acks:
+                if not done.done():
+                    done.set_result(stored)
+            await asyncio.sleep(time.monotonic() - started)
+
+async def serve(server):
+    await server.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            print(f"Ingest stats: {server.stats.as_dict()}")
+
+    print("\nStopping ingestion server...")
+    await server.stop()
+    print(f"Ingest stats: {server.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    udp_port = os.getenv("INGEST_UDP_PORT")
+    server = IngestServer(
+        MetricsStore(os.getenv("INGEST_OUTPUT_FILE", "data/outputs/ingested_metrics.json"),
+                     max_records=int(os.getenv("INGEST_MAX_RECORDS", "10000"))),
+        host=os.getenv("INGEST_HOST", "0.0.0.0"),
+        port=int(os.getenv("INGEST_PORT", "9100")),
+        udp_port=int(udp_port) if udp_port else None
+    )
+    asyncio.run(serve(server))
@@ -0,0 +1,112 @@
+from scripts.main import generate_recommendations
+from src.core.analyzer import InfrastructureAnalyzer
+from src.core.frame import MetricsFrame
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class RecommendationJob:
+    def __init__(self, key, source):
+        self.key = key
+        self.source = source
+        self.status = "pending"
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.analysis = None
+        self.result = None
+        self.partial_recommendations = []
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("completed", "failed")
+
+    def add_recommendation(self, recommendation):
+        self.partial_recommendations.append(recommendation)
+        count = len(self.partial_recommendations)
+        self.progress = min(0.95, 0.5 + 0.05 * count)
+        self.message = f"Received {count} recommendation{'s' if count > 1 else ''}..."
+
+    def update(self, status, progress, message):
+        self.status = status
+        self.progress = progress
+        self.message = message
+
+
+class JobRunner:
+    """Runs analysis + recommendation jobs in a shared worker pool.
+
+    Identical datasets submitted while a job is still running are attached to
+    that job instead of starting a new one, so several sessions clicking the
+    same button only pay for one analysis and one LLM call. Records may be a
+    list of dicts or, as the dashboard passes them, a DataFrame, which is
+    analyzed from its columns without converting it back to dicts.
+    """
+
+    def __init__(self, max_workers=2, max_finished_jobs=50):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommendations")
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def job_key(records, source):
+        if isinstance(records, MetricsFrame):
+            return f"{source}-{records.fingerprint()}"
+        payload = json.dumps(records, sort_keys=True, default=str).encode()
+        return f"{source}-{hashlib.sha1(payload).hexdigest()}"
+
+    def submit(self, records, source="realtime"):
+        if not isinstance(records, list):
+            records = MetricsFrame(records)
+        key = self.job_key(records, source)
+
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and not job.done:
+                return job
+
+            job = RecommendationJob(key, source)
+            self.jobs[key] = job
+            self._prune_finished()
+
+        self.executor.submit(self._run, job, records)
+        return job
+
+    def get(self, key):
+        with self.lock:
+            return self.jobs.get(key)
+
+    def _prune_finished(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        if len(finished) <= self.max_finished_jobs:
+            return
+
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:len(finished) - self.max_finished_jobs]:
+            del self.jobs[job.key]
+
+    def _run(self, job, records):
+        try:
+            analyzer = InfrastructureAnalyzer()
+            if isinstance(records, MetricsFrame):
+                job.update("running", 0.1, f"Analyzing {len(records)} records...")
+                job.analysis = analyzer.analyze_frame(records)
+            else:
+                job.update("running", 0.1, f"Validating and analyzing {len(records)} records...")
+                job.analysis = analyzer.analyze_records(records)
+
+            job.update("running", 0.5, "Generating recommendations...")
+            job.result = generate_recommendations(job.analysis, on_recommendation=job.add_recommendation)
+
+            job.finished_at = datetime.now()
+            job.update("completed", 1.0, "Recommendations generated successfully!")
+        except Exception as e:
+            job.error = str(e)
+            job.finished_at = datetime.now()
+            job.update("failed", 1.0, f"Error generating recommendations: {e}")
@@ -0,0 +1,180 @@
+import gzip
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+
+FRAME_HEADER = struct.Struct("!I")
+ACK = b"\x06"
+
+
+class PushClient:
+    """Ships samples to an ``IngestServer`` without blocking the sampler.
+
+    ``push`` only appends to an in-memory buffer. A background thread turns
+    the buffer into gzip-compressed NDJSON frames every ``flush_interval``
+    seconds (or as soon as ``batch_size`` samples are waiting) and sends them
+    over one persistent TCP connection, waiting for the server's ack. When
+    the collector is unreachable, frames are spooled to ``spool_dir`` and
+    replayed oldest-first once a reconnect succeeds; reconnects back off
+    exponentially up to ``max_backoff`` seconds. The spool holds at most
+    ``max_spool_frames`` frames and ``max_spool_bytes`` bytes, evicting the
+    oldest frames first during a long outage.
+    """
+
+    def __init__(self, host, port, batch_size=500, flush_interval=2.0, spool_dir="data/spool",
+                 connect_timeout=2.0, ack_timeout=5.0, max_backoff=60.0,
+                 max_spool_frames=10000, max_spool_bytes=100 * 1024 * 1024):
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self.connect_timeout = connect_timeout
+        self.ack_timeout = ack_timeout
+        self.max_backoff = max_backoff
+        self.max_spool_frames = max_spool_frames
+        self.max_spool_bytes = max_spool_bytes
+
+        self.buffer = deque()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+        self.sock = None
+        self.backoff = 0.0
+        self.next_attempt = 0.0
+        self.spool_seq = 0
+
+        self.stats = {"pushed_samples": 0, "sent_frames": 0, "spooled_frames": 0, "evicted_frames": 0,
+                      "reconnects": 0}
+
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="push-client", daemon=True)
+        self.thread.start()
+        return self
+
+    def push(self, sample):
+        with self.lock:
+            self.buffer.append(sample)
+            self.stats["pushed_samples"] += 1
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    def close(self, timeout=10.0):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self._disconnect()
+
+    def _run(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self._flush()
+        self._flush()
+
+    def _take_batches(self):
+        with self.lock:
+            samples = list(self.buffer)
+            self.buffer.clear()
+        return [samples[i:i + self.batch_size] for i in range(0, len(samples), self.batch_size)]
+
+    def _flush(self):
+        for batch in self._take_batches():
+            payload = gzip.compress(b"\n".join(json.dumps(sample).encode() for sample in batch), compresslevel=5)
+            if not self._replay_spool() or not self._send(payload):
+                self._spool(payload)
+
+        self._replay_spool()
+
+    def _connect(self):
+        if self.sock is not None:
+            return True
+        if time.monotonic() < self.next_attempt:
+            return False
+
+        try:
+            self.sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            self.sock.settimeout(self.ack_timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            self.backoff = min(self.max_backoff, max(1.0, self.backoff * 2))
+            self.next_attempt = time.monotonic() + self.backoff * random.uniform(0.5, 1.0)
+            print(f"\nPush client: cannot reach {self.host}:{self.port} ({e}), retrying in ~{self.backoff:.0f}s")
+            return False
+
+        if self.backoff:
+            self.stats["reconnects"] += 1
+        self.backoff = 0.0
+        return True
+
+    def _disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def _send(self, payload):
+        if not self._connect():
+            return False
+        try:
+            self.sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+            if self.sock.recv(1) != ACK:
+                raise ConnectionError("missing ack from collector")
+        except OSError:
+            self._disconnect()
+            self.next_attempt = 0.0
+            return False
+
+        self.stats["sent_frames"] += 1
+        return True
+
+    def _spool(self, payload):
+        self.spool_seq += 1
+        path = os.path.join(self.spool_dir, f"{time.time_ns()}-{self.spool_seq:06d}.ndjson.gz")
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(payload)
+        os.replace(f"{path}.tmp", path)
+        self.stats["spooled_frames"] += 1
+        self._trim_spool()
+
+    def _spool_files(self):
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith(".ndjson.gz"))
+
+    def _trim_spool(self):
+        files = self._spool_files()
+        sizes = [os.path.getsize(os.path.join(self.spool_dir, name)) for name in files]
+        total = sum(sizes)
+        evicted = 0
+        while files[evicted:] and (len(files) - evicted > self.max_spool_frames or total > self.max_spool_bytes):
+            os.remove(os.path.join(self.spool_dir, files[evicted]))
+            total -= sizes[evicted]
+            evicted += 1
+        if evicted:
+            self.stats["evicted_frames"] += evicted
+            print(f"\nPush client: spool full, dropped {evicted} oldest frame(s)")
+
+    def _replay_spool(self):
+        """Send spooled frames oldest-first; True once the spool is empty."""
+        for name in self._spool_files():
+            path = os.path.join(self.spool_dir, name)
+            with open(path, "rb") as f:
+                payload = f.read()
+            if not self._send(payload):
+                return False
+            os.remove(path)
+        return True
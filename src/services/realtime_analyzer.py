@@ -1,4 +1,8 @@
 from src.core.models import Metrics, ServiceStatus
+from src.core.detectors import build_detectors
+from src.services.sampling import FixedRateScheduler
+from src.services.collectors import CollectorRunner, build_default_collectors
+from src.services.push_client import PushClient
 import psutil
 import json
 import time
@@ -7,6 +11,7 @@ from datetime import datetime, timezone, timedelta
 from collections import deque
 import os
 import signal
+import socket
 import sys
 import threading
 import shutil
@@ -15,12 +20,24 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 class SimpleMonitor:
-    def __init__(self, output_file="data/outputs/realtime_metrics.json"):
+    def __init__(self, output_file="data/outputs/realtime_metrics.json", interval=5.0, save_interval=5.0, collectors=None, push_client=None,
+                 detectors=None):
         self.output_file = output_file
         self.metrics = deque(maxlen=100)
         self.running = True
-        self.last_net_io = psutil.net_io_counters()
-        self.last_net_time = time.time()
+        self.scheduler = FixedRateScheduler(interval)
+        # samples go out within 80% of the interval; slower probes finish in the background
+        self.collectors = CollectorRunner(
+            collectors if collectors is not None else build_default_collectors(),
+            deadline=interval * 0.8
+        )
+        self.save_interval = save_interval
+        self.last_save_time = 0.0
+        self.boot_time = psutil.boot_time()
+        self.host = os.getenv("MONITOR_HOST") or socket.gethostname()
+        self.push_client = push_client
+        self.detectors = detectors if detectors is not None else build_detectors(os.getenv("MONITOR_DETECTORS", "cusum,slo,forecast"))
+        self.alerts = deque(maxlen=100)
 
         if os.path.exists(output_file):
             try:
@@ -42,26 +59,14 @@ class SimpleMonitor:
             print(f"Created new empty file: {output_file}")
 
     def get_metrics(self):
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory_percent = psutil.virtual_memory().percent
-        disk_percent = psutil.disk_usage('/').percent
+        # host and container figures all come from collectors, each on its own period
+        collected = self.collectors.collect()
 
-        current_net_io = psutil.net_io_counters()
-        current_time = time.time()
-        time_delta = current_time - self.last_net_time
-
-        if time_delta > 0:
-            bytes_sent = current_net_io.bytes_sent - self.last_net_io.bytes_sent
-            bytes_recv = current_net_io.bytes_recv - self.last_net_io.bytes_recv
-
-            network_out_kbps = (bytes_sent * 8) / (1024 * time_delta)
-            network_in_kbps = (bytes_recv * 8) / (1024 * time_delta)
-        else:
-            network_out_kbps = 0
-            network_in_kbps = 0
-
-        self.last_net_io = current_net_io
-        self.last_net_time = current_time
+        cpu_percent = collected.get("cpu_usage", 0.0)
+        memory_percent = collected.get("memory_usage", 0.0)
+        disk_percent = collected.get("disk_usage", 0.0)
+        network_in_kbps = collected.get("network_in_kbps", 0.0)
+        network_out_kbps = collected.get("network_out_kbps", 0.0)
 
         base_temp = 45
         temp = base_temp + (cpu_percent * 0.4)
@@ -69,21 +74,20 @@ class SimpleMonitor:
         base_power = 50
         power = base_power + (cpu_percent * 1.5)
 
-        latency = 0
-        io_wait = 5.0
-        error_rate = 0.0
-        connections = 45
+        latency = collected.get("latency_ms", 0)
+        io_wait = collected.get("io_wait", 0.0)
+        error_rate = collected.get("error_rate", 0.0)
+        probe_error_rate = collected.get("probe_error_rate")
+        connections = collected.get("active_connections", 0)
 
-        service_status = {
-            "database": "online",
-            "api_gateway": "online",
-            "cache": "online"
-        }
+        service_status = {"database": "unknown", "api_gateway": "unknown", "cache": "unknown"}
+        service_status.update(collected.get("service_status", {}))
 
         paris_tz = timezone(timedelta(hours=2))
         current_time = datetime.now(paris_tz)
 
         metrics = {
+            "host": self.host,
             "timestamp": current_time.isoformat(),
             "cpu_usage": round(cpu_percent, 1),
             "memory_usage": round(memory_percent, 1),
@@ -92,15 +96,25 @@ class SimpleMonitor:
             "network_in_kbps": round(network_in_kbps, 1),
             "network_out_kbps": round(network_out_kbps, 1),
             "io_wait": round(io_wait, 1),
-            "thread_count": threading.active_count(),
+            "thread_count": collected.get("thread_count", threading.active_count()),
             "active_connections": connections,
-            "error_rate": error_rate,
-            "uptime_seconds": int(time.time() - psutil.boot_time()),
+            "error_rate": round(error_rate, 4),
+            "uptime_seconds": int(time.time() - self.boot_time),
             "temperature_celsius": round(temp, 1),
             "power_consumption_watts": round(power, 1),
             "service_status": service_status
         }
 
+        for field in ("io_read_kbps", "io_write_kbps"):
+            if field in collected:
+                metrics[field] = round(collected[field], 1)
+
+        if probe_error_rate is not None:
+            metrics["probe_error_rate"] = round(probe_error_rate, 4)
+
+        if collected.get("top_processes"):
+            metrics["top_processes"] = collected["top_processes"]
+
         return metrics
 
     def run(self):
@@ -111,6 +125,10 @@ class SimpleMonitor:
 
         def signal_handler(sig, frame):
             print("\n\nStopping monitor...")
+            print(f"Sampling stats: {self.scheduler.stats()}")
+            if self.push_client is not None:
+                self.push_client.close()
+                print(f"Push stats: {self.push_client.stats}")
             self.running = False
             self.save_metrics()
             sys.exit(0)
@@ -119,8 +137,14 @@ class SimpleMonitor:
 
         while self.running:
             try:
+                self.scheduler.wait()
+                collect_start = time.monotonic()
+
                 metric = self.get_metrics()
                 self.metrics.append(metric)
+                if self.push_client is not None:
+                    self.push_client.push(metric)
+                self.check_detectors(metric)
 
                 timestamp = datetime.fromisoformat(metric['timestamp'].replace('Z', '+00:00'))
 
@@ -130,18 +154,28 @@ class SimpleMonitor:
                       f"Temp: {metric['temperature_celsius']}°C | "
                       f"Disk: {metric['disk_usage']}% | "
                       f"Net: ↓{metric['network_in_kbps']:.0f} ↑{metric['network_out_kbps']:.0f} kbps | "
-                      f"Records: {len(self.metrics)}/100",
+                      f"Records: {len(self.metrics)}/100 | "
+                      f"Rate: {self.scheduler.achieved_rate:.2f}/{self.scheduler.target_rate:.2f} Hz",
                       end='', flush=True)
 
-                self.save_metrics()
+                if collect_start - self.last_save_time >= self.save_interval:
+                    self.save_metrics()
+                    self.last_save_time = collect_start
 
-                time.sleep(1)
-
-                time.sleep(5)
+                self.scheduler.record_work(time.monotonic() - collect_start)
 
             except Exception as e:
                 print(f"\nError: {e}")
-                time.sleep(5)
+
+    def check_detectors(self, metric):
+        if not self.detectors:
+            return
+
+        sample = Metrics.model_validate(metric)
+        for detector in self.detectors:
+            for anomaly in detector.update(sample):
+                self.alerts.append(anomaly)
+                print(f"\n[{anomaly['severity'].upper()}] {anomaly['description']}")
 
     def save_metrics(self):
         try:
@@ -159,5 +193,20 @@ class SimpleMonitor:
 
 
 if __name__ == "__main__":
-    monitor = SimpleMonitor()
+    push_client = None
+    push_target = os.getenv("PUSH_TARGET")
+    if push_target:
+        push_host, push_port = push_target.rsplit(":", 1)
+        push_client = PushClient(
+            push_host, int(push_port),
+            spool_dir=os.getenv("PUSH_SPOOL_DIR", "data/spool"),
+            max_spool_frames=int(os.getenv("PUSH_SPOOL_MAX_FRAMES", "10000")),
+            max_spool_bytes=int(float(os.getenv("PUSH_SPOOL_MAX_MB", "100")) * 1024 * 1024)
+        ).start()
+
+    monitor = SimpleMonitor(
+        interval=float(os.getenv("MONITOR_INTERVAL", "5")),
+        save_interval=float(os.getenv("MONITOR_SAVE_INTERVAL", "5")),
+        push_client=push_client
+    )
     monitor.run()
@@ -0,0 +1,73 @@
+import time
+from collections import deque
+
+
+MIN_INTERVAL = 0.1
+
+
+class FixedRateScheduler:
+    """Fires ticks on a fixed cadence anchored to the start time.
+
+    Deadlines are computed as ``start + n * interval`` rather than "sleep
+    after each sample", so collection time is compensated for and the cadence
+    does not drift. Ticks that are overrun are skipped and counted as missed
+    instead of being fired late in a burst.
+    """
+
+    def __init__(self, interval, stats_window=50):
+        if interval < MIN_INTERVAL:
+            raise ValueError(f"Sampling interval must be at least {MIN_INTERVAL}s, got {interval}s")
+
+        self.interval = interval
+        self.start = None
+        self.tick = 0
+        self.missed_ticks = 0
+        self.tick_times = deque(maxlen=stats_window)
+        self.work_times = deque(maxlen=stats_window)
+
+    def wait(self):
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+            self.tick_times.append(now)
+            return
+
+        self.tick += 1
+        deadline = self.start + self.tick * self.interval
+
+        if now > deadline:
+            behind = int((now - deadline) // self.interval)
+            if behind:
+                self.missed_ticks += behind
+                self.tick += behind
+                deadline += behind * self.interval
+
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        self.tick_times.append(time.monotonic())
+
+    def record_work(self, seconds):
+        self.work_times.append(seconds)
+
+    @property
+    def target_rate(self):
+        return 1.0 / self.interval
+
+    @property
+    def achieved_rate(self):
+        if len(self.tick_times) < 2:
+            return 0.0
+        elapsed = self.tick_times[-1] - self.tick_times[0]
+        return (len(self.tick_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        avg_work = sum(self.work_times) / len(self.work_times) if self.work_times else 0.0
+        return {
+            "target_hz": round(self.target_rate, 3),
+            "achieved_hz": round(self.achieved_rate, 3),
+            "missed_ticks": self.missed_ticks,
+            "avg_collection_ms": round(avg_work * 1000, 2),
+            "duty_cycle": round(avg_work / self.interval, 4)
+        }
@@ -0,0 +1,69 @@
+import json
+
+
+class JSONArrayStreamParser:
+    """Incrementally extracts the objects of one top-level array from a JSON
+    document that arrives in chunks (e.g. a streamed LLM completion).
+
+    ``feed`` returns the objects of ``array_key`` that became complete with
+    the given chunk, so callers can render them before the document ends.
+    """
+
+    def __init__(self, array_key):
+        self.marker = f'"{array_key}"'
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        items = []
+
+        if not self.in_array and not self.done:
+            key_index = self.buffer.find(self.marker, self.pos)
+            if key_index == -1:
+                return items
+            bracket_index = self.buffer.find("[", key_index + len(self.marker))
+            if bracket_index == -1:
+                return items
+            self.in_array = True
+            self.pos = bracket_index + 1
+
+        while self.in_array and self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                if self.depth == 0:
+                    self.item_start = self.pos
+                self.depth += 1
+            elif char in "}]":
+                if self.depth == 0:
+                    self.in_array = False
+                    self.done = True
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        items.append(json.loads(self.buffer[self.item_start:self.pos + 1]))
+                        self.item_start = None
+
+            self.pos += 1
+
+        return items
+
+    @property
+    def text(self):
+        return self.buffer
@@ -1,4 +1,7 @@
 from src.core.models import Metrics, ServiceStatus
+from src.core.sketches import PercentileTracker
+from src.core.forecast import default_resources, fit_series, time_to_exhaustion
+from src.services.job_runner import JobRunner
 import streamlit as st
 import os
 import json
@@ -6,6 +9,7 @@ import subprocess
 import atexit
 import time
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime
 import sys
@@ -20,13 +24,6 @@ st.set_page_config(
 )
 
 
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
-
-
 if 'metrics_initialized' not in st.session_state:
     st.session_state.metrics_initialized = False
 
@@ -77,6 +74,11 @@ def is_realtime_analyzer_running():
         return False
 
 
+@st.cache_resource
+def get_job_runner():
+    return JobRunner()
+
+
 @st.cache_data(ttl=2)
 def load_metrics_data(file_path):
     try:
@@ -206,9 +208,13 @@ def show_metrics_dashboard(data_source="realtime"):
             latest_temp = df['temperature_celsius'].iloc[-1]
             st.metric("Temperature", f"{latest_temp:.1f}°C")
 
+    show_capacity_forecast(df)
+
     if len(df) > 0:
         st.info(f"Showing {len(df)} data points from {df['timestamp'].min().strftime('%H:%M:%S')} to {df['timestamp'].max().strftime('%H:%M:%S')}")
 
+    show_percentiles(df)
+
     st.subheader("Metrics Visualization")
 
     available_metrics = [col for col in df.columns if col != 'timestamp' and df[col].dtype in ['float64', 'int64']]
@@ -241,76 +247,110 @@ def show_metrics_dashboard(data_source="realtime"):
     st.subheader("Generate AI Recommendations")
     st.write("Use our AI to analyze your data and generate recommendations for infrastructure improvements.")
 
+    job_state_key = f"rec_job_{data_source}"
+    runner = get_job_runner()
+
     if st.button("Generate Recommendations", key=f"gen_rec_{data_source}"):
-        with st.spinner("Analyzing data and generating recommendations..."):
-            try:
-                temp_file = f"temp_{data_source}_metrics.json"
-
-                serializable_data = []
-                for item in data:
-                    serializable_item = item.copy()
-
-                    if isinstance(serializable_item.get('timestamp'), datetime):
-                        serializable_item['timestamp'] = serializable_item['timestamp'].isoformat()
-
-                    serializable_data.append(serializable_item)
-
-                with open(temp_file, 'w') as f:
-                    json.dump(serializable_data, f, cls=DateTimeEncoder)
-
-                result = subprocess.run(
-                    ["python", "scripts/main.py", temp_file],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-
-                if "Recommendations saved to" in result.stdout:
-                    output_file = None
-                    for line in result.stdout.split("\n"):
-                        if "Recommendations saved to" in line:
-                            output_file = line.split("Recommendations saved to ")[1].strip()
-                            break
-
-                    if output_file and os.path.exists(output_file):
-                        with open(output_file, "r") as f:
-                            recommendations = json.load(f)
-
-                        st.success(f"Recommendations generated successfully!")
-
-                        st.subheader("AI-Generated Recommendations")
-
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Severity", recommendations.get('severity', 'N/A').upper())
-                        with col2:
-                            st.metric("Anomalies Detected", recommendations.get('anomalies_detected', 0))
-                        with col3:
-                            st.metric("Total Recommendations", len(recommendations.get('recommendations', [])))
-
-                        for i, rec in enumerate(recommendations.get('recommendations', []), 1):
-                            with st.expander(f"{i}. Priority {rec.get('priority', 'N/A')} - {rec.get('action', 'No action')}"):
-                                st.markdown(f"**Category:** {rec.get('category', 'N/A').replace('_', ' ').title()}")
-                                st.markdown(f"**Issue:** {rec.get('issue', 'N/A')}")
-                                st.markdown(f"**Action:** {rec.get('action', 'N/A')}")
-                                st.markdown(f"**Impact:** {rec.get('impact', 'N/A')}")
-                                st.markdown(f"**Implementation:**")
-                                st.code(rec.get('implementation', 'N/A'))
-                                st.markdown(f"**Affected Services:** {', '.join(rec.get('affected_services', ['None']))}")
-                                st.markdown(f"**Metrics to Monitor:** {', '.join(rec.get('metrics_to_monitor', ['None']))}")
-
-                        if os.path.exists(temp_file):
-                            os.remove(temp_file)
-                    else:
-                        st.error("Recommendations file not found. Check the console output for errors.")
-                else:
-                    st.error("Failed to generate recommendations. Check the console output for errors.")
-                    st.code(result.stdout)
-                    st.code(result.stderr)
-            except Exception as e:
-                st.error(f"Error generating recommendations: {str(e)}")
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
+        # the DataFrame goes to the analyzer as columns, without a round trip through dicts
+        job = runner.submit(df, source=data_source)
+        st.session_state[job_state_key] = job.key
+
+    if job_state_key in st.session_state:
+        job = runner.get(st.session_state[job_state_key])
+
+        if job is None:
+            del st.session_state[job_state_key]
+        elif not job.done:
+            st.progress(job.progress, text=job.message)
+            show_recommendation_items(list(job.partial_recommendations))
+            time.sleep(0.5)
+            st.rerun()
+        elif job.status == "failed":
+            st.error(job.message)
+        else:
+            st.success(job.message)
+            show_recommendations(job.result)
+
+
+def show_capacity_forecast(df, half_life_seconds=6 * 3600):
+    if len(df) < 20:
+        return
+
+    if 'host' in df.columns:
+        # the latest sample's host; samples without one (the local monitor) form their own series
+        host = df['host'].iloc[-1]
+        df = df[df['host'].isna()] if pd.isna(host) else df[df['host'] == host]
+        if len(df) < 20:
+            return
+    epochs = np.array([t.timestamp() for t in df['timestamp']])
+
+    columns = st.columns(len(default_resources()))
+    for column, (resource, (field, capacity)) in zip(columns, default_resources().items()):
+        if field not in df.columns:
+            continue
+        fit = fit_series(epochs, df[field].to_numpy(dtype=float), half_life_seconds)
+        eta = time_to_exhaustion(*fit, capacity) if fit is not None else None
+        with column:
+            if eta is None:
+                st.metric(f"{resource.capitalize()} exhaustion", "no upward trend")
+            else:
+                earliest, latest = eta[1] / 3600, eta[2] / 3600
+                band = f"{earliest:.1f}h-{latest:.1f}h" if latest != float('inf') else f">{earliest:.1f}h"
+                st.metric(f"{resource.capitalize()} exhaustion", f"~{eta[0] / 3600:.1f}h",
+                          f"{fit[1] * 3600:+.2f}/h, band {band}", delta_color="inverse")
+
+
+def show_percentiles(df):
+    fields = [field for field in ('latency_ms', 'error_rate') if field in df.columns]
+    if not fields or len(df) == 0:
+        return
+
+    tracker = PercentileTracker(fields=fields)
+    epochs = np.array([t.timestamp() for t in df['timestamp']])
+    values = {field: df[field].to_numpy(dtype=float) for field in fields}
+    hosts = df['host'].fillna('') if 'host' in df.columns else pd.Series('', index=df.index)
+    for host, rows in df.groupby(hosts, sort=False).indices.items():
+        tracker.add_columns(epochs[rows], {field: values[field][rows] for field in fields}, host or None)
+    summary = tracker.summary()
+
+    st.subheader("Latency & Error Rate Percentiles")
+    st.caption(f"Estimated with mergeable quantile sketches: each percentile is within "
+               f"±{tracker.relative_accuracy:.0%} of the exact value.")
+
+    rows = []
+    for field in fields:
+        rows.append({'metric': field, 'scope': 'all hosts', **summary[field]['overall']})
+        if len(summary[field]['by_host']) > 1:
+            rows.extend({'metric': field, 'scope': f"host {host}", **stats} for host, stats in summary[field]['by_host'].items())
+        rows.extend({'metric': field, 'scope': f"day {day}", **stats} for day, stats in summary[field]['by_day'].items())
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+
+def show_recommendations(recommendations):
+    st.subheader("AI-Generated Recommendations")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Severity", recommendations.get('severity', 'N/A').upper())
+    with col2:
+        st.metric("Anomalies Detected", recommendations.get('anomalies_detected', 0))
+    with col3:
+        st.metric("Total Recommendations", len(recommendations.get('recommendations', [])))
+
+    show_recommendation_items(recommendations.get('recommendations', []))
+
+
+def show_recommendation_items(items, start=1):
+    for i, rec in enumerate(items, start):
+        with st.expander(f"{i}. Priority {rec.get('priority', 'N/A')} - {rec.get('action', 'No action')}"):
+            st.markdown(f"**Category:** {rec.get('category', 'N/A').replace('_', ' ').title()}")
+            st.markdown(f"**Issue:** {rec.get('issue', 'N/A')}")
+            st.markdown(f"**Action:** {rec.get('action', 'N/A')}")
+            st.markdown(f"**Impact:** {rec.get('impact', 'N/A')}")
+            st.markdown(f"**Implementation:**")
+            st.code(rec.get('implementation', 'N/A'))
+            st.markdown(f"**Affected Services:** {', '.join(rec.get('affected_services', ['None']))}")
+            st.markdown(f"**Metrics to Monitor:** {', '.join(rec.get('metrics_to_monitor', ['None']))}")
 
 
 def show_import_data():
@@ -355,7 +395,7 @@ def show_import_data():
 
 
 def show_agent_chat():
-    from src.agents.analyzer_agent import compiled_graph, HumanMessage
+    from src.agents.analyzer_agent import compiled_graph, HumanMessage, STREAMING_NODES
 
     st.title("AI Infrastructure Assistant")
 
@@ -407,10 +447,33 @@ def show_agent_chat():
             st.write(prompt)
 
         with st.chat_message("assistant"):
+            placeholder = st.empty()
+            recommendations_container = st.container()
             with st.spinner("Thinking..."):
                 initial_state = {"messages": [HumanMessage(content=prompt)]}
-                result = compiled_graph.invoke(initial_state)
+                result = None
+                streamed = ""
+
+                recommendation_count = 0
+
+                for mode, payload in compiled_graph.stream(initial_state, stream_mode=["messages", "values", "custom"]):
+                    if mode == "values":
+                        result = payload
+                        continue
+
+                    if mode == "custom":
+                        if "recommendation" in payload:
+                            recommendation_count += 1
+                            with recommendations_container:
+                                show_recommendation_items([payload["recommendation"]], start=recommendation_count)
+                        continue
+
+                    chunk, metadata = payload
+                    if metadata.get("langgraph_node") in STREAMING_NODES and chunk.content:
+                        streamed += chunk.content
+                        placeholder.markdown(streamed + "▌")
 
+                placeholder.empty()
                 response_content = result["messages"][-1].content
 
                 if "base64 encoded image:" in response_content:
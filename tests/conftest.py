@@ -0,0 +1,18 @@
+import contextlib
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def records():
+    """The sample report: 500 time-sorted records from one host (copy before changing it)."""
+    with open('data/raw/rapport.json') as f:
+        return json.load(f)
+
+
+def quietly(call):
+    """``call()`` with the analyzer's progress output silenced."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return call()
@@ -0,0 +1,117 @@
+import json
+import random
+
+import pytest
+
+from src.core import analyzer as analyzer_module
+from src.core.analyzer import DetectionState, InfrastructureAnalyzer
+from src.core.detectors import build_detectors
+from src.core.models import Metrics
+from src.core.sinks import NDJSONSink
+
+from conftest import quietly
+
+ALL_DETECTORS = 'ewma,zscore,mad,cusum,slo,forecast'
+
+
+def datasets(records):
+    shuffled = list(records)
+    random.Random(1).shuffle(shuffled)
+    mixed = list(records)
+    for i, bad in ((3, {'timestamp': 'soon'}), (50, dict(records[50], cpu_usage='high')), (400, {})):
+        mixed.insert(i, bad)
+    fleet = [dict(record, host=f'web-{i % 3}') for i, record in enumerate(records)]
+    fleet += [dict(record, host='db-1') for record in records[::2]]
+    return {'sorted': records, 'shuffled': shuffled, 'mixed': mixed, 'fleet': fleet}
+
+
+def run(path, detectors, fused):
+    analyzer = InfrastructureAnalyzer(detectors=None if detectors is None else build_detectors(detectors))
+    if fused:
+        results = quietly(lambda: analyzer.analyze_file(path, verbose=False))
+    else:
+        results = quietly(lambda: analyzer.detect_anomalies(analyzer.load_data(path), verbose=False))
+    counts = (analyzer.valid_records, analyzer.invalid_records, analyzer.critical_metrics_count,
+              analyzer.start_time, analyzer.end_time)
+    return json.loads(json.dumps(results, default=str)), counts
+
+
+@pytest.mark.parametrize('name', ['sorted', 'shuffled', 'mixed', 'fleet'])
+@pytest.mark.parametrize('detectors', [None, ALL_DETECTORS])
+def test_analyze_file_matches_load_then_detect(name, detectors, records, tmp_path):
+    path = tmp_path / f'{name}.json'
+    path.write_text(json.dumps(datasets(records)[name]))
+
+    fused, fused_counts = run(str(path), detectors, fused=True)
+    batch, batch_counts = run(str(path), detectors, fused=False)
+    assert fused_counts == batch_counts
+    assert fused == batch
+    assert fused['total_anomalies'] > 0
+
+
+def test_held_anomalies_are_bounded_by_the_chunk(records, monkeypatch):
+    held = []
+    flush = DetectionState.flush
+
+    def tracking_flush(self, in_order=False):
+        held.append(len(self.anomalies) - self.flushed)
+        flush(self, in_order)
+
+    monkeypatch.setattr(DetectionState, 'flush', tracking_flush)
+
+    def analyze(chunk_size):
+        monkeypatch.setattr(analyzer_module, 'CHUNK_SIZE', chunk_size)
+        return quietly(lambda: InfrastructureAnalyzer().analyze_records(list(records), verbose=False))
+
+    whole = analyze(len(records))
+    held.clear()
+    chunked = analyze(25)
+
+    # a handful of rules per sample, plus the windows and detectors ending in the chunk
+    assert 0 < max(held) <= 25 * 10
+    assert max(held) < whole['total_anomalies'] / 4
+    assert chunked == whole
+
+
+@pytest.mark.parametrize('fused', [True, False])
+def test_records_that_are_not_objects_count_as_invalid(fused, records, tmp_path):
+    path = tmp_path / 'odd.json'
+    path.write_text(json.dumps([None, *records[:50], 5, 'x', [1, 2], *records[50:100]]))
+
+    analyzer = InfrastructureAnalyzer.for_detectors(build_detectors('ewma,mad'))
+    if fused:
+        results = quietly(lambda: analyzer.analyze_file(str(path), verbose=False))
+    else:
+        results = quietly(lambda: analyzer.detect_anomalies(analyzer.load_data(str(path)), verbose=False))
+    assert (analyzer.valid_records, analyzer.invalid_records) == (100, 4)
+    assert results['total_metrics'] == 100
+
+
+def test_fleet_run_matches_separate_host_runs(records, tmp_path):
+    metrics = [Metrics.model_validate(dict(record, host=('web-1', 'db-1')[i % 2])) for i, record in enumerate(records)]
+    by_host = {host: [m for m in metrics if m.host == host] for host in ('web-1', 'db-1')}
+    path = tmp_path / 'fleet.ndjson'
+
+    analyzer = InfrastructureAnalyzer(sink=NDJSONSink(str(path)))
+    with analyzer.sink:
+        fleet = quietly(lambda: analyzer.detect_anomalies_by_host(metrics, max_workers=2))
+    fleet = json.loads(json.dumps(fleet, default=str))
+
+    separate = {}
+    for host, series in by_host.items():
+        single = InfrastructureAnalyzer(keep_anomalies=True)
+        separate[host] = json.loads(json.dumps(quietly(lambda: single.detect_anomalies(series, verbose=False)),
+                                               default=str))
+    written = [json.loads(line) for line in path.read_text().splitlines()]
+
+    # the workers hand their anomalies back for the sink instead of keeping them in the results
+    assert written == [anomaly for host in fleet['hosts'] for anomaly in separate[host].pop('anomalies')]
+    assert fleet['hosts'] == separate
+    assert fleet['total_metrics'] == len(metrics)
+    assert fleet['total_anomalies'] == sum(result['total_anomalies'] for result in separate.values()) == len(written)
+    assert fleet['critical_count'] == sum(result['critical_count'] for result in separate.values())
+    for atype in fleet['anomaly_breakdown']:
+        assert fleet['anomaly_breakdown'][atype] == sum(result['anomaly_breakdown'].get(atype, 0)
+                                                        for result in separate.values())
+    assert fleet['anomaly_heatmap'] == {host: result['anomaly_breakdown'] for host, result in separate.items()}
+    assert {entry['host'] for entry in fleet['top_offending_hosts']} == {'web-1', 'db-1'}
@@ -0,0 +1,129 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from src.core.baselines import BaselineBuilder, SeasonalBaseline, SeasonalDetector, describe_hour, hour_of_week
+from src.core.models import Metrics
+
+MONDAY = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def profile(how):
+    # busy weekday afternoons, quiet nights and weekends
+    return 20.0 + 50.0 * (how < 120) * max(0.0, math.sin(math.pi * ((how % 24) - 6) / 12))
+
+
+def history(weeks=4, host=None):
+    # one sample every 20 minutes; each week is offset by -1.5, -0.5, +0.5, ...
+    series = []
+    for i in range(weeks * 168 * 3):
+        timestamp = MONDAY + timedelta(minutes=20 * i)
+        how = (i // 3) % 168
+        offset = (i // (168 * 3)) - (weeks - 1) / 2
+        series.append(Metrics.model_construct(host=host, timestamp=timestamp,
+                                              cpu_usage=profile(how) + offset + (i % 3 - 1) * 0.1))
+    return series
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    builder = BaselineBuilder(fields=["cpu_usage"])
+    builder.add_metrics(history())
+    return builder.build()
+
+
+def test_hour_of_week_starts_on_monday():
+    epochs = np.array([0.0, MONDAY.timestamp(), (MONDAY + timedelta(days=6, hours=23, minutes=59)).timestamp()])
+    assert hour_of_week(epochs).tolist() == [72, 0, 167]
+    assert describe_hour(72) == "Thu 00:00 UTC"
+    assert describe_hour(167) == "Sun 23:00 UTC"
+
+
+def test_builder_buckets_by_hour_of_week(baseline):
+    assert baseline.samples == 4 * 168 * 3
+    assert (baseline.count == 12).all()
+    expected = np.array([profile(how) for how in range(168)])
+    np.testing.assert_allclose(baseline.mean[0], expected, atol=1e-9)
+    # four weekly offsets of ±0.5 and ±1.5, three samples each at -0.1, 0, +0.1
+    assert baseline.std[0] == pytest.approx(np.full(168, math.sqrt(1.25 + 0.02 / 3)))
+    assert baseline.quantiles[0.5][0] == pytest.approx(expected, rel=0.03)
+    assert baseline.start == MONDAY.isoformat()
+    assert baseline.end == (MONDAY + timedelta(weeks=4) - timedelta(minutes=20)).isoformat()
+
+
+def test_chunks_and_records_build_the_same_profile(baseline):
+    series = history()
+    chunked = BaselineBuilder(fields=["cpu_usage"])
+    for start in range(0, len(series), 1000):
+        chunked.add_metrics(series[start:start + 1000])
+    from_records = BaselineBuilder(fields=["cpu_usage"])
+    from_records.add_records(({"timestamp": m.timestamp.isoformat().replace("+00:00", "Z"), "cpu_usage": m.cpu_usage}
+                              for m in series), chunk_size=777)
+
+    for built in (chunked.build(), from_records.build()):
+        np.testing.assert_array_equal(built.count, baseline.count)
+        np.testing.assert_allclose(built.mean, baseline.mean)
+        np.testing.assert_allclose(built.std, baseline.std, atol=1e-6)
+        assert (built.start, built.end) == (baseline.start, baseline.end)
+
+
+def test_save_and_load_round_trip(baseline, tmp_path):
+    path = str(tmp_path / "profiles" / "baseline.npz")
+    baseline.save(path)
+    loaded = SeasonalBaseline.load(path)
+
+    assert loaded.fields == ["cpu_usage"]
+    assert (loaded.samples, loaded.start, loaded.end) == (baseline.samples, baseline.start, baseline.end)
+    np.testing.assert_array_equal(loaded.count, baseline.count)
+    np.testing.assert_allclose(loaded.mean, baseline.mean, rtol=1e-6)
+    np.testing.assert_allclose(loaded.std, baseline.std, rtol=1e-6)
+    assert sorted(loaded.quantiles) == [0.05, 0.5, 0.95]
+    for q in baseline.quantiles:
+        np.testing.assert_allclose(loaded.quantiles[q], baseline.quantiles[q], rtol=1e-6)
+
+
+def test_missing_baseline_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEASONAL_BASELINE", str(tmp_path / "none.npz"))
+    with pytest.raises(ValueError, match="No seasonal baseline"):
+        SeasonalDetector()
+
+
+def next_week(host=None):
+    week = [Metrics.model_construct(host=host, timestamp=metric.timestamp + timedelta(weeks=4), cpu_usage=metric.cpu_usage)
+            for metric in history(weeks=1, host=host)]
+    # a weekday-afternoon level at Sunday 03:00: normal on its own, off-profile for that hour
+    week[(144 + 3) * 3] = week[(144 + 3) * 3].model_copy(update={"cpu_usage": 70.0})
+    return week
+
+
+def test_off_profile_value_is_flagged(baseline):
+    detector = SeasonalDetector(baseline)
+    anomalies = detector.detect_batch(next_week())
+
+    assert len(anomalies) == 1
+    anomaly = anomalies[0]
+    assert anomaly["timestamp"] == (MONDAY + timedelta(weeks=4, days=6, hours=3)).isoformat()
+    assert (anomaly["type"], anomaly["severity"], anomaly["value"]) == ("cpu_usage_seasonal", "high", 70.0)
+    assert "Sun 03:00 UTC" in anomaly["description"]
+
+
+def test_streaming_matches_batch(baseline):
+    detector = SeasonalDetector(baseline, threshold=1.0)
+    # every other sample 1.5 above its usual level: just over one sigma
+    week = [metric.model_copy(update={"cpu_usage": metric.cpu_usage + 1.5 * (i % 2)})
+            for i, metric in enumerate(next_week(host="web-1"))]
+    batch = detector.detect_batch(week)
+    assert len(batch) > 168
+    assert all(anomaly["host"] == "web-1" for anomaly in batch)
+    assert [anomaly for metric in week for anomaly in detector.update(metric)] == batch
+
+
+def test_sparse_hours_are_not_scored(baseline):
+    sparse = SeasonalBaseline(baseline.fields, np.where(np.arange(168) == 147, 2, baseline.count), baseline.mean,
+                              baseline.std, baseline.quantiles)
+    detector = SeasonalDetector(sparse)
+    week = next_week()
+    assert detector.detect_batch(week) == []
+    assert [anomaly for metric in week for anomaly in detector.update(metric)] == []
@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.core.detectors import ChangepointDetector
+from src.core.models import Metrics
+
+START = datetime(2024, 1, 1)
+
+
+def series(values, host=None):
+    return [Metrics.model_construct(host=host, timestamp=START + timedelta(minutes=i), latency_ms=value)
+            for i, value in enumerate(values)]
+
+
+def noise(n, level, seed=1):
+    rng = random.Random(seed)
+    return [rng.gauss(level, 5.0) for _ in range(n)]
+
+
+def streamed(detector, metrics):
+    detector.reset()
+    return [anomaly for metric in metrics for anomaly in detector.update(metric)]
+
+
+def assert_same(batch, stream):
+    # running sums and NumPy means differ in the last bits only
+    assert [(a["timestamp"], a["type"], a["change_time"]) for a in batch] == \
+        [(a["timestamp"], a["type"], a["change_time"]) for a in stream]
+    for a, b in zip(batch, stream):
+        assert a["magnitude"] == pytest.approx(b["magnitude"])
+        assert a["value"] == pytest.approx(b["value"])
+
+
+def test_flags_a_sustained_shift_with_its_change_time():
+    metrics = series(noise(200, 100.0) + noise(200, 130.0, seed=2))
+    detector = ChangepointDetector(fields=["latency_ms"])
+
+    anomalies = detector.detect_batch(metrics)
+    assert_same(anomalies, streamed(detector, metrics))
+    first = anomalies[0]
+    assert first["type"] == "latency_ms_regime_change"
+    assert first["severity"] == "high"
+    # estimated from the few samples since the change, so only roughly the 30 ms shift
+    assert 10 < first["magnitude"] < 40
+    change = datetime.fromisoformat(first["change_time"])
+    assert abs(change - metrics[200].timestamp) <= timedelta(minutes=5)
+    assert datetime.fromisoformat(first["timestamp"]) < metrics[215].timestamp
+
+
+def test_single_outliers_and_steady_noise_raise_nothing():
+    values = noise(500, 100.0)
+    for i in (120, 260, 400):
+        values[i] = 1000.0
+    metrics = series(values)
+    detector = ChangepointDetector(fields=["latency_ms"])
+
+    assert detector.detect_batch(metrics) == []
+    assert streamed(detector, metrics) == []
+
+
+def test_restarts_after_an_alarm_and_catches_the_way_back():
+    metrics = series(noise(150, 100.0) + noise(150, 140.0, seed=2) + noise(150, 100.0, seed=3))
+    detector = ChangepointDetector(fields=["latency_ms"])
+
+    anomalies = detector.detect_batch(metrics)
+    assert_same(anomalies, streamed(detector, metrics))
+    shifts = [anomaly["magnitude"] for anomaly in anomalies if abs(anomaly["magnitude"]) > 10]
+    assert len(shifts) == 2
+    assert shifts[0] > 0 > shifts[1]
+
+
+def test_too_short_for_a_reference_raises_nothing():
+    metrics = series(noise(49, 100.0) + [500.0] * 10)
+    assert ChangepointDetector(fields=["latency_ms"], warmup=60).detect_batch(metrics) == []
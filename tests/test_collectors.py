@@ -0,0 +1,244 @@
+import pytest
+
+from src.services.collectors import Collector, CollectorRunner, HttpProbe, TcpProbe, build_probe
+
+
+class FakeProbe(Collector):
+    def __init__(self, service, outcomes):
+        super().__init__(timeout=1.0)
+        self.name = f"fake:{service}"
+        self.service = service
+        self.outcomes = iter(outcomes)
+
+    async def collect(self):
+        ok = next(self.outcomes)
+        return {
+            "service_status": {self.service: "online" if ok else "offline"},
+            "probe_latency_ms": {self.service: 10.0 if ok else None},
+            "probe_ok": {self.service: ok}
+        }
+
+
+def test_collector_requires_collect():
+    class Incomplete(Collector):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_build_probe_by_scheme():
+    assert isinstance(build_probe("database", "tcp://db:5432", 1.0), TcpProbe)
+    probe = build_probe("api_gateway", "https://gateway/health?full=1", 1.0)
+    assert isinstance(probe, HttpProbe)
+    assert (probe.port, probe.path, probe.secure) == (443, "/health?full=1", True)
+
+
+@pytest.mark.parametrize("target", ["db:5432", "localhost", "udp://db:53", "tcp://db", "http://"])
+def test_build_probe_rejects_ambiguous_targets(target):
+    with pytest.raises(ValueError):
+        build_probe("database", target, 1.0)
+
+
+def test_probe_failures_are_reported_separately_from_error_rate():
+    runner = CollectorRunner([FakeProbe("database", [True, False]), FakeProbe("cache", [True, True])])
+    try:
+        first = runner.collect()
+        second = runner.collect()
+    finally:
+        runner.close()
+
+    assert "error_rate" not in first and "error_rate" not in second
+    assert first["probe_error_rate"] == 0.0
+    assert second["probe_error_rate"] == 0.25
+    assert second["service_status"] == {"database": "offline", "cache": "online"}
+    assert second["latency_ms"] == 10.0
+
+
+class CountingCollector(Collector):
+    name = "counting"
+
+    def __init__(self, interval):
+        super().__init__(timeout=1.0, interval=interval)
+        self.calls = 0
+
+    async def collect(self):
+        self.calls += 1
+        return {"thread_count": self.calls}
+
+
+def test_collectors_run_on_their_own_interval():
+    every_tick = CountingCollector(None)
+    slow = CountingCollector(60.0)
+    runner = CollectorRunner([every_tick, slow])
+    try:
+        results = [runner.collect() for _ in range(5)]
+    finally:
+        runner.close()
+
+    assert every_tick.calls == 5
+    assert slow.calls == 1
+    # the slow collector's last result is reused between its runs; later collectors win on conflicts
+    assert [result["thread_count"] for result in results] == [1, 1, 1, 1, 1]
+
+
+def test_slow_probe_results_are_not_counted_twice():
+    probe = FakeProbe("database", [False])
+    probe.interval = 60.0
+    runner = CollectorRunner([probe])
+    try:
+        for _ in range(3):
+            collected = runner.collect()
+    finally:
+        runner.close()
+    assert list(runner.probe_results) == [False]
+    assert collected["service_status"] == {"database": "offline"}
+
+
+def test_slow_process_scan_is_published_and_never_overlaps():
+    import threading
+    import time
+
+    from src.services.collectors import ProcessCollector
+
+    class SlowScan(ProcessCollector):
+        def __init__(self):
+            super().__init__(min_interval=0.0, timeout=0.05)
+            self.running = 0
+            self.max_running = 0
+            self.scans = 0
+            self.lock = threading.Lock()
+
+        def _scan(self, now):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.2)
+            with self.lock:
+                self.running -= 1
+                self.scans += 1
+            return [{"pid": 1, "name": "busy", "cpu_percent": 99.0, "memory_mb": 1.0, "scan": self.scans}]
+
+    collector = SlowScan()
+    runner = CollectorRunner([collector])
+    try:
+        first = runner.collect()
+        assert first["top_processes"] == []
+        results = []
+        for _ in range(12):
+            time.sleep(0.05)
+            results.append(runner.collect()["top_processes"])
+    finally:
+        runner.close()
+
+    assert collector.max_running == 1
+    published = [result[0]["scan"] for result in results if result]
+    assert published and published == sorted(published)
+
+
+def test_slow_probe_is_not_cut_short_by_the_round_deadline():
+    import asyncio
+    import time
+
+    class SlowProbe(FakeProbe):
+        async def collect(self):
+            await asyncio.sleep(0.3)
+            return await super().collect()
+
+    probe = SlowProbe("database", [True, True])
+    runner = CollectorRunner([probe], deadline=0.05)
+    try:
+        started = time.monotonic()
+        first = runner.collect()
+        assert time.monotonic() - started < 0.25
+        time.sleep(0.4)
+        second = runner.collect()
+    finally:
+        runner.close()
+
+    # nothing to report until the probe answers, then it counts once, as a success
+    assert first["service_status"] == {} and "probe_error_rate" not in first
+    assert second["service_status"] == {"database": "online"}
+    assert second["probe_error_rate"] == 0.0
+    assert list(runner.probe_results) == [True]
+
+
+def fake_cgroup(path, usage_usec=1_000_000, memory=512 * 1024 * 1024, cpu_max="200000 100000",
+                memory_max=str(2 * 1024 ** 3), rbytes=0, wbytes=0, pids=42):
+    (path / "cgroup.controllers").write_text("cpu memory io pids\n")
+    (path / "cpu.stat").write_text(f"usage_usec {usage_usec}\nuser_usec {usage_usec // 2}\nsystem_usec 0\n")
+    (path / "memory.current").write_text(f"{memory}\n")
+    (path / "io.stat").write_text(f"8:0 rbytes={rbytes} wbytes={wbytes} rios=1 wios=1\n"
+                                  f"8:16 rbytes={rbytes} wbytes=0 rios=0 wios=0\n")
+    (path / "pids.current").write_text(f"{pids}\n")
+    if cpu_max is not None:
+        (path / "cpu.max").write_text(f"{cpu_max}\n")
+    if memory_max is not None:
+        (path / "memory.max").write_text(f"{memory_max}\n")
+    return str(path)
+
+
+def test_cgroup_limits_and_usage(tmp_path):
+    import asyncio
+    import time
+
+    from src.services.collectors import CgroupCollector
+
+    path = fake_cgroup(tmp_path)
+    assert CgroupCollector.available(path)
+    collector = CgroupCollector(path)
+    try:
+        assert (collector.cpus, collector.memory_limit) == (2.0, 2 * 1024 ** 3)
+        collector.last_time = time.monotonic() - 2.0
+
+        # 1.6 CPU-seconds over 2 seconds on a 2-CPU quota; the files are re-read in place
+        fake_cgroup(tmp_path, usage_usec=2_600_000, memory=1024 ** 3, rbytes=1024 * 1024, wbytes=512 * 1024, pids=57)
+        result = asyncio.run(collector.collect())
+    finally:
+        collector.close()
+
+    assert result["cpu_usage"] == pytest.approx(40.0, rel=0.01)
+    assert result["memory_usage"] == pytest.approx(50.0)
+    # both devices' reads are summed: 2 MiB over 2 seconds
+    assert result["io_read_kbps"] == pytest.approx(2 * 1024 * 8 / 2, rel=0.01)
+    assert result["io_write_kbps"] == pytest.approx(512 * 8 / 2, rel=0.01)
+    assert result["thread_count"] == 57
+
+
+def test_cgroup_without_limits_falls_back_to_the_host(tmp_path):
+    import os
+
+    import psutil
+
+    from src.services.collectors import CgroupCollector
+
+    for cpu_max, memory_max in (("max 100000", "max"), (None, None)):
+        path = tmp_path / str(cpu_max)
+        path.mkdir()
+        collector = CgroupCollector(fake_cgroup(path, cpu_max=cpu_max, memory_max=memory_max))
+        collector.close()
+        assert collector.cpus == (os.cpu_count() or 1)
+        assert collector.memory_limit == psutil.virtual_memory().total
+
+
+def test_cgroup_clamps_cpu_and_skips_missing_files(tmp_path):
+    import asyncio
+    import time
+
+    from src.services.collectors import CgroupCollector
+
+    path = fake_cgroup(tmp_path, cpu_max="100000 100000")
+    (tmp_path / "io.stat").unlink()
+    (tmp_path / "pids.current").unlink()
+    collector = CgroupCollector(path)
+    try:
+        collector.last_time = time.monotonic() - 1.0
+        # more CPU time than a 1-CPU quota allows in a second is clamped to 100%
+        fake_cgroup(tmp_path, usage_usec=3_000_000, cpu_max="100000 100000")
+        result = asyncio.run(collector.collect())
+    finally:
+        collector.close()
+
+    assert result["cpu_usage"] == 100.0
+    assert "io_read_kbps" not in result and "thread_count" not in result
+    assert not CgroupCollector.available(str(tmp_path / "missing"))
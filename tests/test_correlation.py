@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from src.core.analyzer import InfrastructureAnalyzer
+from src.core.correlation import (CorrelationAnalyzer, incident_field, lagged_correlations, merge_correlated_pairs,
+                                  windowed_correlations)
+from src.core.models import Metrics
+
+from conftest import quietly
+
+FIELDS = ['cpu_usage', 'latency_ms', 'memory_usage']
+STEP = 10.0
+LAG = 3
+
+
+def lagged_pair(n=300, seed=7):
+    # latency follows cpu LAG samples later; memory is unrelated noise
+    rng = np.random.default_rng(seed)
+    cpu = rng.normal(50.0, 10.0, n + LAG)
+    latency = 100.0 + 4.0 * cpu[:n] + rng.normal(0.0, 2.0, n)
+    memory = rng.normal(60.0, 5.0, n)
+    values = np.column_stack([cpu[LAG:], latency, memory])
+    epochs = 1_700_000_000.0 + STEP * np.arange(n)
+    return values, epochs
+
+
+def test_windowed_correlations_per_block():
+    x = np.arange(10.0)
+    values = np.column_stack([x, -2.0 * x + 1.0, np.full(10, 5.0)])
+    correlations = windowed_correlations(values, 4)
+
+    assert correlations.shape == (2, 3, 3)
+    assert correlations[:, 0, 1] == pytest.approx([-1.0, -1.0])
+    assert correlations[:, 0, 0] == pytest.approx([1.0, 1.0])
+    # constant columns correlate as 0, not NaN
+    assert np.all(correlations[:, 2, :] == 0.0)
+    assert windowed_correlations(values, 20).shape == (0, 3, 3)
+
+
+def test_lagged_correlations_peak_at_the_known_lag():
+    values, _ = lagged_pair()
+    correlations = lagged_correlations(values, values[:, 1], 6)
+
+    assert correlations.shape == (7, 3)
+    assert int(np.argmax(correlations[1:, 0])) + 1 == LAG
+    assert correlations[LAG, 0] > 0.95
+    assert abs(correlations[0, 0]) < 0.3
+    assert np.all(np.abs(correlations[1:, 2]) < 0.3)
+
+
+def test_lagged_correlations_skip_lags_longer_than_the_series():
+    values = np.column_stack([np.arange(5.0), np.arange(5.0)])
+    correlations = lagged_correlations(values, values[:, 1], 6)
+
+    assert correlations[:3, 0] == pytest.approx([1.0, 1.0, 1.0])
+    assert np.all(correlations[3:] == 0.0)
+
+
+def test_leading_indicator_is_the_lagged_field():
+    values, epochs = lagged_pair()
+    analyzer = CorrelationAnalyzer(fields=FIELDS, window=60, max_lag=6)
+
+    hints = analyzer.leading_indicators(values, epochs, 'latency_ms', epochs[150])
+
+    assert [hint['field'] for hint in hints] == ['cpu_usage']
+    assert hints[0]['lag_seconds'] == LAG * STEP
+    assert hints[0]['correlation'] > 0.95
+
+
+def test_leading_indicators_need_enough_samples():
+    values, epochs = lagged_pair(n=8)
+    analyzer = CorrelationAnalyzer(fields=FIELDS, window=60, max_lag=6)
+
+    assert analyzer.leading_indicators(values, epochs, 'latency_ms', epochs[4]) == []
+
+
+def test_annotate_attaches_hints_to_the_incident_host():
+    values, epochs = lagged_pair()
+    analyzer = CorrelationAnalyzer(fields=FIELDS, window=60, max_lag=6)
+    columns = {field: values[:, j] for j, field in enumerate(FIELDS)}
+    start = datetime.fromtimestamp(epochs[150], tz=timezone.utc).isoformat()
+    incidents = [{'type': 'latency_high', 'host': 'web-1', 'start': start},
+                 {'type': 'latency_high', 'host': 'web-2', 'start': start},
+                 {'type': 'unknown_type', 'host': 'web-1', 'start': start}]
+
+    analyzer.annotate(incidents, {'web-1': columns}, {'web-1': epochs})
+
+    assert incident_field('latency_high') == 'latency_ms'
+    assert incidents[0]['leading_indicators'][0]['field'] == 'cpu_usage'
+    assert 'leading_indicators' not in incidents[1]
+    assert 'leading_indicators' not in incidents[2]
+
+
+def test_correlated_pairs_rank_the_strongest_pair_first():
+    values, _ = lagged_pair()
+    analyzer = CorrelationAnalyzer(fields=FIELDS, window=60)
+    # shift cpu back into line with latency: now they move together
+    aligned = {'cpu_usage': values[:-LAG, 0], 'latency_ms': values[LAG:, 1], 'memory_usage': values[LAG:, 2]}
+
+    pairs = analyzer.correlated_pairs({'web-1': aligned}, limit=2)
+
+    assert pairs[0]['fields'] == ['cpu_usage', 'latency_ms']
+    assert pairs[0]['mean_correlation'] > 0.95
+    assert len(pairs) == 2
+
+
+def test_merge_correlated_pairs_weights_hosts_by_windows():
+    a = [{'fields': ['cpu_usage', 'latency_ms'], 'mean_correlation': 0.9},
+         {'fields': ['cpu_usage', 'memory_usage'], 'mean_correlation': 0.5}]
+    b = [{'fields': ['cpu_usage', 'memory_usage'], 'mean_correlation': -0.7}]
+
+    merged = merge_correlated_pairs([a, b], [3, 1])
+
+    assert merged == [{'fields': ['cpu_usage', 'latency_ms'], 'mean_correlation': 0.68},
+                      {'fields': ['cpu_usage', 'memory_usage'], 'mean_correlation': 0.2}]
+    assert merge_correlated_pairs([a], [0]) == []
+
+
+def test_fleet_results_have_the_single_run_keys(records):
+    metrics = [Metrics.model_validate(dict(record, host=f'web-{i % 2}')) for i, record in enumerate(records)]
+
+    single = quietly(lambda: InfrastructureAnalyzer().detect_anomalies(metrics, verbose=False))
+    fleet = quietly(lambda: InfrastructureAnalyzer().detect_anomalies_by_host(metrics, max_workers=1))
+
+    assert set(single) <= set(fleet)
+    assert fleet['correlated_metrics']
+    assert all(result['correlated_metrics'] for result in fleet['hosts'].values())
+    assert 'correlated_metrics' not in quietly(
+        lambda: InfrastructureAnalyzer(correlation=False).detect_anomalies_by_host(metrics, max_workers=1))
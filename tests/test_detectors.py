@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from src.core.analyzer import InfrastructureAnalyzer
+from src.core.detectors import (EWMADetector, MADDetector, RollingDetector, ScoreDetector, ZScoreDetector,
+                                build_detectors)
+
+
+@pytest.fixture(scope="module")
+def metrics():
+    with open("data/raw/rapport.json") as f:
+        series = list(InfrastructureAnalyzer().validate_stream(json.load(f)))
+    # one obvious latency spike in the middle of the report
+    series[300] = series[300].model_copy(update={"latency_ms": series[300].latency_ms * 20})
+    return series
+
+
+def streamed(detector, metrics):
+    detector.reset()
+    return [anomaly for metric in metrics for anomaly in detector.update(metric)]
+
+
+def test_bases_are_abstract():
+    with pytest.raises(TypeError):
+        RollingDetector()
+
+    class NoScores(ScoreDetector):
+        def _new_state(self):
+            return []
+
+        def _update(self, state, value):
+            return None, value
+
+    with pytest.raises(TypeError):
+        NoScores()
+
+
+@pytest.mark.parametrize("detector", [EWMADetector(), ZScoreDetector(), MADDetector()], ids=lambda d: d.name)
+def test_batch_scores_match_streaming(detector, metrics):
+    batch = detector.detect_batch(metrics)
+    assert batch == streamed(detector, metrics)
+
+    spike = [anomaly for anomaly in batch if anomaly["type"] == f"latency_ms_{detector.name}"
+             and anomaly["timestamp"] == metrics[300].timestamp.isoformat()]
+    assert len(spike) == 1
+    assert spike[0]["severity"] == "high"
+    assert spike[0]["value"] == metrics[300].latency_ms
+
+
+def test_state_is_kept_per_host(metrics):
+    detector = EWMADetector(fields=["latency_ms"])
+    web1 = [metric.model_copy(update={"host": "web-1"}) for metric in metrics]
+    web2 = [metric.model_copy(update={"host": "web-2", "latency_ms": metric.latency_ms * 100}) for metric in metrics]
+    interleaved = [metric for pair in zip(web1, web2) for metric in pair]
+
+    anomalies = streamed(detector, interleaved)
+    assert [a for a in anomalies if a["host"] == "web-1"] == detector.detect_batch(web1)
+    assert [a for a in anomalies if a["host"] == "web-2"] == detector.detect_batch(web2)
+
+
+def test_build_detectors_by_name():
+    assert [type(d) for d in build_detectors("ewma, mad")] == [EWMADetector, MADDetector]
+    assert build_detectors("") == []
+    with pytest.raises(ValueError):
+        build_detectors("ewma,nope")
@@ -0,0 +1,67 @@
+import random
+from datetime import datetime, timedelta
+from math import inf
+
+import numpy as np
+import pytest
+
+from src.core.forecast import CapacityForecaster, TrendState, fit_series, time_to_exhaustion
+from src.core.models import Metrics
+
+START = datetime(2024, 1, 1)
+
+
+def samples(hours, disk, host=None, every_minutes=5, seed=1):
+    rng = random.Random(seed)
+    return [Metrics.model_construct(host=host, timestamp=START + timedelta(minutes=i * every_minutes),
+                                    disk_usage=disk(i * every_minutes / 60) + rng.gauss(0, 0.2),
+                                    memory_usage=40.0 + rng.gauss(0, 1.0), active_connections=100)
+            for i in range(int(hours * 60 / every_minutes))]
+
+
+def test_trend_state_matches_the_vectorized_fit():
+    rng = np.random.default_rng(1)
+    epochs = np.cumsum(rng.uniform(30, 90, 500))
+    values = 20 + 0.001 * epochs + rng.normal(0, 0.5, 500)
+
+    state = TrendState(half_life_seconds=3600)
+    for epoch, value in zip(epochs, values):
+        state.add(float(epoch), float(value))
+    assert state.fit() == pytest.approx(fit_series(epochs, values, 3600), rel=1e-6)
+
+
+def test_time_to_exhaustion():
+    assert time_to_exhaustion(50.0, 0.0, 0.0, 100.0) is None
+    assert time_to_exhaustion(100.0, 1.0, 0.0, 100.0) == (0.0, 0.0, 0.0)
+    assert time_to_exhaustion(50.0, 1.0, 0.0, 100.0) == (50.0, 50.0, 50.0)
+    eta, earliest, latest = time_to_exhaustion(50.0, 1.0, 1.0, 100.0)
+    assert (eta, earliest, latest) == (50.0, 50.0 / 3, inf)
+
+
+def test_filling_disk_escalates_once_per_severity():
+    # 1% an hour from 30%: full after 70 hours
+    metrics = samples(66, lambda hour: 30.0 + hour)
+    forecaster = CapacityForecaster()
+
+    anomalies = forecaster.detect_batch(metrics)
+    assert [(a['type'], a['severity']) for a in anomalies] == [
+        ('disk_exhaustion', 'medium'), ('disk_exhaustion', 'high'), ('disk_exhaustion', 'critical')]
+    for anomaly in anomalies:
+        hours_left = 70 - (datetime.fromisoformat(anomaly['timestamp']) - START).total_seconds() / 3600
+        assert anomaly['eta_hours'] == pytest.approx(hours_left, rel=0.1)
+        assert anomaly['band_hours'][0] <= anomaly['eta_hours'] <= anomaly['band_hours'][1]
+
+
+def test_flat_usage_raises_nothing():
+    assert CapacityForecaster().detect_batch(samples(48, lambda hour: 60.0)) == []
+
+
+def test_hosts_are_forecast_separately():
+    filling = samples(66, lambda hour: 30.0 + hour, host='web-1')
+    flat = samples(66, lambda hour: 60.0, host='web-2', seed=2)
+    interleaved = sorted(filling + flat, key=lambda m: (m.timestamp, m.host))
+
+    forecaster = CapacityForecaster()
+    streamed = [anomaly for metric in interleaved for anomaly in forecaster.update(metric)]
+    assert {anomaly['host'] for anomaly in streamed} == {'web-1'}
+    assert streamed == forecaster.detect_batch(filling)
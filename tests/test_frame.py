@@ -0,0 +1,102 @@
+import json
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core.analyzer import InfrastructureAnalyzer
+from src.core.detectors import build_detectors
+from src.core.frame import MetricsFrame, load_frame
+
+from conftest import quietly
+
+
+def compare(records, frame, detectors=None):
+    build = lambda: InfrastructureAnalyzer(detectors=None if detectors is None else build_detectors(detectors))
+    fused, columnar = build(), build()
+    expected = quietly(lambda: fused.analyze_records(json.loads(json.dumps(records)), verbose=False))
+    results = quietly(lambda: columnar.analyze_frame(frame, verbose=False))
+    assert (columnar.valid_records, columnar.invalid_records, columnar.critical_metrics_count) == \
+        (fused.valid_records, fused.invalid_records, fused.critical_metrics_count)
+    assert (columnar.start_time, columnar.end_time) == (fused.start_time, fused.end_time)
+    assert results == expected
+    return columnar
+
+
+@pytest.mark.parametrize('detectors', [None, 'ewma,zscore,mad,cusum,slo,forecast'])
+def test_dataframe_matches_records(records, detectors):
+    compare(records, pd.DataFrame(records), detectors)
+
+
+def test_flattened_status_columns_and_parsed_timestamps(records):
+    df = pd.DataFrame(records)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    for service in ('database', 'api_gateway', 'cache'):
+        df[f'{service}_status'] = df['service_status'].map(lambda status: status[service])
+    compare(records, df.drop(columns=['service_status']))
+
+
+def test_shuffled_fleet_matches_records(records):
+    fleet = [dict(record, host=f'web-{i % 3}') for i, record in enumerate(records)]
+    fleet += [dict(record, host='db-1') for record in records[::3]]
+    random.Random(3).shuffle(fleet)
+    compare(fleet, pd.DataFrame(fleet))
+
+
+def test_missing_and_fractional_values_are_invalid(records):
+    broken = [dict(record) for record in records]
+    broken[1]['cpu_usage'] = None
+    broken[2]['thread_count'] = 12.5
+    broken[3]['active_connections'] = float('inf')
+    broken[4]['uptime_seconds'] = 3600.75
+    broken[5]['thread_count'] = 40.0
+    analyzer = compare(broken, pd.DataFrame(broken))
+    assert analyzer.invalid_records == 4
+
+
+def test_a_needed_column_must_be_present(records):
+    with pytest.raises(ValueError, match='cpu_usage'):
+        quietly(lambda: InfrastructureAnalyzer().analyze_frame(pd.DataFrame(records).drop(columns=['cpu_usage'])))
+
+
+def test_mapping_of_arrays():
+    frame = MetricsFrame({'timestamp': np.array(['2024-01-01T00:00', 'NaT', '2024-01-01T00:02'], dtype='datetime64[s]'),
+                          'cpu_usage': [10, 'n/a', 30], 'thread_count': np.array([4.0, 5.0, 6.5])})
+    assert len(frame) == 3 and frame.hosts == [None] * 3
+    assert frame.complete(['cpu_usage']).tolist() == [True, False, True]
+    assert frame.complete(['thread_count']).tolist() == [True, False, False]
+    assert frame.missing(['cpu_usage', 'memory_usage', 'service_status', 'top_processes']) == \
+        ['memory_usage', 'service_status']
+
+    with pytest.raises(ValueError):
+        MetricsFrame({'timestamp': ['2024-01-01T00:00'], 'cpu_usage': [1, 2]})
+    with pytest.raises(ValueError):
+        MetricsFrame({'cpu_usage': [1]})
+
+
+def test_load_frame_is_cached_until_the_file_changes(records, tmp_path):
+    path = tmp_path / 'metrics.json'
+    path.write_text(json.dumps(records[:20]))
+    frame = load_frame(str(path))
+    assert load_frame(str(path)) is frame
+    assert frame.fingerprint() == MetricsFrame(pd.DataFrame(records[:20])).fingerprint()
+
+    path.write_text(json.dumps([*records[:30], None]))
+    reloaded = load_frame(str(path))
+    assert reloaded is not frame and (len(reloaded), reloaded.skipped) == (30, 1)
+
+
+@pytest.mark.parametrize('detectors', [None, 'ewma,mad'])
+def test_loaded_frame_counts_records_that_are_not_objects(records, detectors, tmp_path):
+    path = tmp_path / 'odd.json'
+    path.write_text(json.dumps([None, *records[:200], 5, 'x', *records[200:]]))
+    build = lambda: (InfrastructureAnalyzer() if detectors is None
+                     else InfrastructureAnalyzer.for_detectors(build_detectors(detectors)))
+
+    fused, columnar = build(), build()
+    expected = quietly(lambda: fused.analyze_file(str(path), verbose=False))
+    results = quietly(lambda: columnar.analyze_frame(load_frame(str(path)), verbose=False))
+    assert (columnar.valid_records, columnar.invalid_records) == (fused.valid_records, fused.invalid_records) == \
+        (len(records), 3)
+    assert results == expected
@@ -0,0 +1,95 @@
+import random
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from src.core.analyzer import InfrastructureAnalyzer
+from src.core.incidents import IncidentAggregator, TopAnomalies, coalesce_incidents
+
+from conftest import quietly
+
+
+def anomaly(minute, severity='high', value=1.0, type='cpu_high', host=None):
+    event = {'timestamp': f'2024-01-01T00:{minute:02d}:00+00:00', 'type': type, 'severity': severity,
+             'value': value, 'description': f'{type} at {value}'}
+    if host is not None:
+        event['host'] = host
+    return event
+
+
+def test_anomalies_within_the_gap_extend_one_incident():
+    aggregator = IncidentAggregator(timedelta(minutes=5))
+    aggregator.add_many([anomaly(0, 'warning', 80), anomaly(3, 'critical', 95), anomaly(6, 'high', 90),
+                         anomaly(20, 'warning', 81)])
+
+    first, second = sorted(aggregator.incidents(), key=lambda i: i['start'])
+    assert (first['count'], first['severity'], first['peak'], first['duration_seconds']) == (3, 'critical', 95, 360)
+    assert first['description'] == 'cpu_high at 95'
+    assert first['escalations'] == [{'timestamp': '2024-01-01T00:03:00+00:00', 'severity': 'critical'}]
+    assert (second['start'], second['count']) == ('2024-01-01T00:20:00+00:00', 1)
+
+
+def test_types_and_hosts_are_kept_apart():
+    aggregator = IncidentAggregator(timedelta(minutes=5))
+    aggregator.add_many([anomaly(0, host='web-1'), anomaly(0, host='web-2'), anomaly(1, type='memory_high', host='web-1'),
+                         anomaly(2, host='web-1')])
+    keys = sorted((i['type'], i.get('host'), i['count']) for i in aggregator.incidents())
+    assert keys == [('cpu_high', 'web-1', 2), ('cpu_high', 'web-2', 1), ('memory_high', 'web-1', 1)]
+
+
+def test_without_a_gap_only_equal_timestamps_merge():
+    incidents = coalesce_incidents([anomaly(1), anomaly(0), anomaly(1)])
+    assert sorted(i['count'] for i in incidents) == [1, 2]
+
+
+def test_ranked_by_severity_then_duration():
+    aggregator = IncidentAggregator(timedelta(minutes=5))
+    aggregator.add_many([anomaly(0, 'high'), anomaly(4, 'high'), anomaly(30, 'critical'), anomaly(50, 'high')])
+    ranked = aggregator.incidents()
+    assert [(i['severity'], i['duration_seconds']) for i in ranked] == [('critical', 0), ('high', 240), ('high', 0)]
+
+
+def test_top_anomalies_keeps_the_most_severe_then_most_recent():
+    top = TopAnomalies(k=3)
+    top.add_many([anomaly(0, 'critical'), anomaly(1, 'warning'), anomaly(2, 'high'), anomaly(3, 'critical'),
+                  anomaly(4, 'medium')])
+    assert [(a['severity'], a['timestamp'][14:16]) for a in top.items()] == [
+        ('critical', '03'), ('critical', '00'), ('high', '02')]
+
+    recent = TopAnomalies(k=2, by='recent')
+    recent.add_many([anomaly(5), anomaly(9), anomaly(7)])
+    assert [a['timestamp'][14:16] for a in recent.items()] == ['09', '07']
+
+    with pytest.raises(ValueError):
+        TopAnomalies(by='loudest')
+
+
+def run(mode, records):
+    analyzer = InfrastructureAnalyzer()
+    if mode == 'batch':
+        return quietly(lambda: analyzer.detect_anomalies(analyzer.load_records(records), verbose=False))
+    if mode == 'fused':
+        return quietly(lambda: analyzer.analyze_records(records, verbose=False))
+    return quietly(lambda: analyzer.analyze_frame(pd.DataFrame(records), verbose=False))
+
+
+@pytest.mark.parametrize('mode', ['batch', 'fused', 'frame'])
+def test_shuffled_input_gives_the_same_incidents(mode, records):
+    shuffled = list(records)
+    random.Random(1).shuffle(shuffled)
+
+    expected = run(mode, records)
+    assert len(expected['incidents']) == 516
+    assert run(mode, shuffled)['incidents'] == expected['incidents']
+
+
+@pytest.mark.parametrize('mode', ['batch', 'fused', 'frame'])
+def test_shuffled_fleet_gives_the_same_incidents(mode, records):
+    fleet = [dict(record, host=f'web-{i}') for i in range(3) for record in records]
+    shuffled = list(fleet)
+    random.Random(2).shuffle(shuffled)
+
+    expected = run(mode, fleet)
+    assert run(mode, shuffled)['incidents'] == expected['incidents']
+    assert len(expected['incidents']) == 3 * 516
@@ -0,0 +1,211 @@
+import asyncio
+import gzip
+import json
+import time
+
+import pytest
+
+from src.core.models import Metrics
+from src.services.ingest_server import ACK, FRAME_HEADER, IngestServer
+from src.services.metrics_store import MetricsStore
+
+
+def sample(i, host="web-1"):
+    return {
+        "host": host, "timestamp": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}",
+        "cpu_usage": 50.0, "memory_usage": 60.0, "latency_ms": 100.0, "disk_usage": 40.0,
+        "network_in_kbps": 1000.0, "network_out_kbps": 800.0, "io_wait": 1.0,
+        "thread_count": 100, "active_connections": 20, "error_rate": 0.01,
+        "uptime_seconds": 3600 + i, "temperature_celsius": 50.0, "power_consumption_watts": 200.0,
+        "service_status": {"database": "online", "api_gateway": "online", "cache": "online"}
+    }
+
+
+async def until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def run_server(store, client, flush_interval=0.05):
+    async def main():
+        server = IngestServer(store, host="127.0.0.1", port=0, flush_interval=flush_interval)
+        await server.start()
+        try:
+            await client(server)
+        finally:
+            await server.stop()
+        return server
+    return asyncio.run(main())
+
+
+def test_frames_are_acked_and_invalid_samples_counted(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.json"))
+
+    async def client(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        records = [sample(0), {"host": "web-1", "cpu_usage": "bad"}, sample(1, host=None)]
+        payload = b"\n".join(json.dumps(record).encode() for record in records)
+        writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        assert await reader.readexactly(1) == ACK
+        writer.close()
+        await until(lambda: server.stats.received == 3)
+
+    server = run_server(store, client)
+    assert (server.stats.accepted, server.stats.invalid) == (2, 1)
+    assert [metric.host for metric in store.snapshot()] == ["web-1", "127.0.0.1"]
+
+
+def test_frame_is_acked_only_once_its_samples_are_on_disk(tmp_path):
+    path = tmp_path / "metrics.json"
+    store = MetricsStore(str(path))
+
+    async def client(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        for i in range(3):
+            payload = gzip.compress(json.dumps(sample(i)).encode())
+            writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+            assert await reader.readexactly(1) == ACK
+            assert len(json.loads(path.read_text())) == i + 1
+        writer.close()
+
+    # a long flush interval: acks must not wait for the periodic flush
+    run_server(store, client, flush_interval=30)
+
+
+def test_frame_is_not_acked_when_it_cannot_be_stored(tmp_path):
+    class BrokenStore(MetricsStore):
+        def add(self, metrics):
+            raise RuntimeError("store unavailable")
+
+    async def client(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        payload = json.dumps(sample(0)).encode()
+        writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        assert await reader.read(1) == b""
+        writer.close()
+
+    run_server(BrokenStore(str(tmp_path / "metrics.json")), client)
+
+
+def test_decompress_is_bounded():
+    payload = gzip.compress(b"0" * 1000)
+    assert IngestServer.decompress(payload, limit=1000) == b"0" * 1000
+    with pytest.raises(ValueError):
+        IngestServer.decompress(payload, limit=999)
+    with pytest.raises(ValueError):
+        IngestServer.decompress(payload[:-10])
+    with pytest.raises(ValueError):
+        IngestServer.decompress(b"\x1f\x8bnot gzip")
+
+
+def test_corrupt_gzip_frame_closes_the_connection(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.json"))
+
+    async def client(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        payload = b"\x1f\x8b" + b"\x00" * 64
+        writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        assert await reader.read(1) == b""
+        writer.close()
+
+    server = run_server(store, client)
+    assert server.stats.received == 0
+
+
+def test_store_reloads_its_file_on_start(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    store = MetricsStore(path)
+    store.add([Metrics(**sample(i)) for i in range(3)])
+    store.flush()
+
+    restarted = MetricsStore(path)
+    assert [metric.uptime_seconds for metric in restarted.snapshot()] == [3600, 3601, 3602]
+
+    restarted.add([Metrics(**sample(3))])
+    restarted.flush()
+    with open(path) as f:
+        assert len(json.load(f)) == 4
+
+
+def test_failed_flush_is_retried(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.json"
+    store = MetricsStore(str(path))
+    store.add([Metrics(**sample(i)) for i in range(3)])
+
+    def broken_replace(source, target):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("src.services.metrics_store.os.replace", broken_replace)
+        with pytest.raises(OSError):
+            store.flush()
+    assert not path.exists()
+
+    assert store.flush() is True
+    assert len(json.loads(path.read_text())) == 3
+    assert store.flush() is False
+
+
+def test_store_keeps_the_latest_records(tmp_path):
+    path = tmp_path / "metrics.json"
+    store = MetricsStore(str(path), max_records=5)
+    store.add([Metrics(**sample(i)) for i in range(8)])
+    store.flush()
+    assert [record["uptime_seconds"] for record in json.loads(path.read_text())] == [3603, 3604, 3605, 3606, 3607]
+
+
+def test_store_starts_empty_on_unreadable_file(tmp_path):
+    path = tmp_path / "metrics.json"
+    path.write_text("[{not json")
+    assert MetricsStore(str(path)).snapshot() == []
+
+
+def test_failing_batch_does_not_stop_ingestion(tmp_path):
+    class FlakyStore(MetricsStore):
+        def add(self, metrics):
+            if any(metric.host == "broken" for metric in metrics):
+                raise RuntimeError("store unavailable")
+            super().add(metrics)
+
+    store = FlakyStore(str(tmp_path / "metrics.json"))
+
+    async def client(server):
+        for host in ("broken", "web-1"):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(json.dumps(sample(0, host=host)).encode() + b"\n")
+            await writer.drain()
+            writer.close()
+            await until(lambda: server.stats.batches + server.stats.errors == (1 if host == "broken" else 2))
+
+    server = run_server(store, client)
+    assert server.stats.errors == 1
+    assert [metric.host for metric in store.snapshot()] == ["web-1"]
+
+
+def test_ingest_rate_over_local_tcp(tmp_path):
+    # the server is sized for ~50k samples/s on one core, counted until every
+    # frame is acked (stored and written to disk); assert a floor with
+    # headroom for slow CI machines and the client sharing the core
+    total = 50000
+    store = MetricsStore(str(tmp_path / "metrics.json"))
+    lines = [json.dumps(sample(i, host=f"web-{i % 20}")).encode() for i in range(total)]
+    frames = [b"\n".join(lines[i:i + 500]) for i in range(0, total, 500)]
+    elapsed = {}
+
+    async def client(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        started = time.perf_counter()
+        for payload in frames:
+            writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        assert await reader.readexactly(len(frames)) == ACK * len(frames)
+        elapsed["seconds"] = time.perf_counter() - started
+        writer.close()
+        assert server.stats.accepted == total
+
+    run_server(store, client)
+    rate = total / elapsed["seconds"]
+    print(f"ingested {total} samples at {rate:,.0f} samples/s")
+    assert len(json.loads((tmp_path / "metrics.json").read_text())) == store.records.maxlen
+    assert rate > 10000
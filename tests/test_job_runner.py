@@ -0,0 +1,41 @@
+import threading
+
+import src.services.job_runner as job_runner
+from src.services.job_runner import JobRunner
+
+
+def test_identical_submissions_share_one_job(monkeypatch, records):
+    release = threading.Event()
+    calls = []
+
+    def fake_recommendations(analysis, on_recommendation=None):
+        calls.append(analysis)
+        release.wait(5)
+        on_recommendation({'priority': 1})
+        return {'recommendations': [{'priority': 1}]}
+
+    monkeypatch.setattr(job_runner, 'generate_recommendations', fake_recommendations)
+
+    runner = JobRunner(max_workers=1)
+    first = runner.submit(records)
+    second = runner.submit(list(records))
+    release.set()
+    runner.executor.shutdown(wait=True)
+
+    assert first is second
+    assert first.status == 'completed'
+    assert first.partial_recommendations == [{'priority': 1}]
+    assert first.analysis['total_metrics'] == len(records)
+    assert len(calls) == 1
+
+
+def test_failed_job_reports_error(monkeypatch):
+    def failing(analysis, on_recommendation=None):
+        raise RuntimeError('no model')
+
+    monkeypatch.setattr(job_runner, 'generate_recommendations', failing)
+    runner = JobRunner(max_workers=1)
+    job = runner.submit([])
+    runner.executor.shutdown(wait=True)
+    assert job.status == 'failed'
+    assert 'no model' in job.message
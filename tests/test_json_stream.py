@@ -0,0 +1,44 @@
+import json
+
+from src.utils.json_stream import JSONArrayStreamParser
+
+
+DOCUMENT = json.dumps({
+    "timestamp": "2024-01-01T00:00:00",
+    "recommendations": [
+        {"priority": 1, "issue": "brace } and bracket ] in a string", "steps": ["a", "b"]},
+        {"priority": 2, "issue": "escaped \"quote\" and \\ backslash", "nested": {"k": [1, 2]}},
+        {"priority": 3, "issue": "last"}
+    ],
+    "metrics_summary": {"critical_metrics": ["cpu"]}
+})
+
+
+def feed_in_chunks(size):
+    parser = JSONArrayStreamParser("recommendations")
+    items = []
+    for start in range(0, len(DOCUMENT), size):
+        items.extend(parser.feed(DOCUMENT[start:start + size]))
+    return parser, items
+
+
+def test_items_match_full_parse_for_any_chunking():
+    expected = json.loads(DOCUMENT)["recommendations"]
+    for size in (1, 2, 3, 7, 64, len(DOCUMENT)):
+        parser, items = feed_in_chunks(size)
+        assert items == expected
+        assert json.loads(parser.text) == json.loads(DOCUMENT)
+
+
+def test_items_are_returned_as_soon_as_complete():
+    parser = JSONArrayStreamParser("recommendations")
+    cut = DOCUMENT.index('{"priority": 2')
+    first = parser.feed(DOCUMENT[:cut])
+    assert [item["priority"] for item in first] == [1]
+    rest = parser.feed(DOCUMENT[cut:])
+    assert [item["priority"] for item in rest] == [2, 3]
+
+
+def test_missing_array_yields_nothing():
+    parser = JSONArrayStreamParser("recommendations")
+    assert parser.feed('{"other": [1, 2, 3]}') == []
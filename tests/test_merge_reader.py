@@ -0,0 +1,75 @@
+import json
+
+from src.core.merge_reader import MergeReader, iter_json_records
+
+
+def write_array(path, records):
+    path.write_text(json.dumps(records, indent=2))
+    return str(path)
+
+
+def write_ndjson(path, records):
+    path.write_text("\n".join(json.dumps(record) for record in records) + "\n")
+    return str(path)
+
+
+def at(second, host="web-1", **fields):
+    return {"host": host, "timestamp": f"2024-01-01T00:00:{second:02d}", **fields}
+
+
+def test_reads_arrays_and_ndjson_across_chunk_boundaries(tmp_path):
+    records = [at(i, note="x" * i) for i in range(40)]
+    for path in (write_array(tmp_path / "a.json", records), write_ndjson(tmp_path / "a.ndjson", records)):
+        assert list(iter_json_records(path, chunk_size=7)) == records
+
+
+def test_empty_files_yield_nothing(tmp_path):
+    (tmp_path / "blank.json").write_text("  \n")
+    assert list(iter_json_records(str(tmp_path / "blank.json"))) == []
+    assert list(iter_json_records(write_array(tmp_path / "empty.json", []))) == []
+
+
+def test_merges_sources_in_time_order(tmp_path):
+    first = write_array(tmp_path / "a.json", [at(0), at(2), at(4)])
+    second = write_ndjson(tmp_path / "b.ndjson", [at(1, host="web-2"), at(3, host="web-2"), at(5, host="web-2")])
+
+    reader = MergeReader([first, second])
+    assert [record["timestamp"][-2:] for record in reader] == ["00", "01", "02", "03", "04", "05"]
+    assert (reader.records, reader.duplicates, reader.unsorted) == (6, 0, 0)
+
+
+def test_drops_repeated_host_timestamps(tmp_path):
+    # a rotated file overlapping the previous one
+    first = write_array(tmp_path / "a.json", [at(0), at(1), at(2)])
+    second = write_array(tmp_path / "b.json", [at(2), at(3), at(2, host="web-2")])
+
+    reader = MergeReader([first, second])
+    merged = [(record["host"], record["timestamp"][-2:]) for record in reader]
+    assert merged == [("web-1", "00"), ("web-1", "01"), ("web-1", "02"), ("web-1", "03"), ("web-2", "02")]
+    assert reader.duplicates == 1
+
+
+def test_counts_unsorted_records_and_passes_broken_ones_through(tmp_path):
+    path = write_array(tmp_path / "a.json", [at(1), {"host": "web-1", "timestamp": "garbage"}, at(0), at(2)])
+
+    reader = MergeReader([path])
+    merged = list(reader)
+    assert len(merged) == 4
+    assert {"host": "web-1", "timestamp": "garbage"} in merged
+    assert reader.unsorted == 1
+
+
+def test_merged_report_analyzes_like_the_original(records, tmp_path):
+    from src.core.analyzer import InfrastructureAnalyzer
+
+    # two rotated files overlapping by 100 samples, one of them NDJSON
+    first = write_array(tmp_path / "a.json", records[:300])
+    second = write_ndjson(tmp_path / "b.ndjson", records[200:])
+
+    analyzer = InfrastructureAnalyzer()
+    merged = analyzer.detect_anomalies_stream(analyzer.load_stream([first, second]), verbose=False)
+    expected = InfrastructureAnalyzer().detect_anomalies_stream(
+        InfrastructureAnalyzer().validate_stream(records), verbose=False)
+
+    assert analyzer.valid_records == len(records)
+    assert merged == expected
@@ -0,0 +1,39 @@
+from src.core.prompt_builder import build_recommendation_prompt, estimate_tokens
+
+
+def make_analysis(incident_count):
+    incidents = [
+        {
+            'type': 'cpu_high',
+            'host': f'host-{i}',
+            'severity': 'critical',
+            'start': '2024-01-01T00:00:00',
+            'end': '2024-01-01T01:00:00',
+            'peak': 97.5,
+            'count': 12,
+            'description': 'CPU usage critically high at 97.5%',
+            'duration_seconds': 3600
+        }
+        for i in range(incident_count)
+    ]
+    return {
+        'total_anomalies': 12 * incident_count,
+        'critical_count': 12 * incident_count,
+        'anomaly_breakdown': {'cpu_high': 12 * incident_count},
+        'total_metrics': 1000,
+        'service_issues': {'api_gateway': 3},
+        'incidents': incidents
+    }
+
+
+def test_prompt_stays_within_budget():
+    for budget in range(1100, 2500, 7):
+        prompt = build_recommendation_prompt(make_analysis(200), token_budget=budget)
+        assert estimate_tokens(prompt) <= budget
+        assert 'lower-priority incidents omitted' in prompt
+
+
+def test_all_incidents_included_when_they_fit():
+    prompt = build_recommendation_prompt(make_analysis(3), token_budget=10000)
+    assert prompt.count('"type":"cpu_high"') == 3
+    assert 'omitted' not in prompt
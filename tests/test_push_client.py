@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+import socket
+
+from src.services.ingest_server import IngestServer
+from src.services.metrics_store import MetricsStore
+from src.services.push_client import PushClient
+
+
+SAMPLE = {
+    "host": "web-1", "cpu_usage": 50.0, "memory_usage": 60.0, "latency_ms": 100.0, "disk_usage": 40.0,
+    "network_in_kbps": 1000.0, "network_out_kbps": 800.0, "io_wait": 1.0, "thread_count": 100,
+    "active_connections": 20, "error_rate": 0.01, "uptime_seconds": 3600, "temperature_celsius": 50.0,
+    "power_consumption_watts": 200.0,
+    "service_status": {"database": "online", "api_gateway": "online", "cache": "online"}
+}
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_spool_evicts_oldest_frames_past_the_frame_cap(tmp_path):
+    client = PushClient("127.0.0.1", unused_port(), spool_dir=str(tmp_path), max_spool_frames=3)
+    for i in range(5):
+        client._spool(f"frame-{i}".encode())
+
+    kept = [open(os.path.join(tmp_path, name), "rb").read() for name in client._spool_files()]
+    assert kept == [b"frame-2", b"frame-3", b"frame-4"]
+    assert client.stats["evicted_frames"] == 2
+
+
+def test_spool_evicts_oldest_frames_past_the_byte_cap(tmp_path):
+    client = PushClient("127.0.0.1", unused_port(), spool_dir=str(tmp_path), max_spool_bytes=250)
+    for i in range(5):
+        client._spool(bytes([i]) * 100)
+
+    kept = [open(os.path.join(tmp_path, name), "rb").read()[:1] for name in client._spool_files()]
+    assert kept == [b"\x03", b"\x04"]
+    assert client.stats["evicted_frames"] == 3
+
+
+def test_spooled_frames_are_replayed_to_the_server(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.json"))
+    samples = [dict(SAMPLE, timestamp=f"2024-01-01T00:00:{i:02d}") for i in range(4)]
+
+    async def main():
+        server = IngestServer(store, host="127.0.0.1", port=0, flush_interval=30)
+        await server.start()
+        # reachable but nothing listens on this port yet: the first batch is spooled
+        client = PushClient("127.0.0.1", unused_port(), spool_dir=str(tmp_path / "spool"))
+        client.push(samples[0])
+        await asyncio.to_thread(client._flush)
+        assert client.stats["spooled_frames"] == 1
+
+        client.port = server.port
+        client.next_attempt = 0.0
+        for sample in samples[1:]:
+            client.push(sample)
+        await asyncio.to_thread(client._flush)
+        client.close()
+        await server.stop()
+        return client, server
+
+    client, server = asyncio.run(main())
+    assert client.stats["sent_frames"] == 2
+    assert client._spool_files() == []
+    assert server.stats.accepted == 4
+    stored = json.loads((tmp_path / "metrics.json").read_text())
+    assert [record["timestamp"] for record in stored] == [sample["timestamp"] for sample in samples]
@@ -0,0 +1,75 @@
+import pytest
+
+from src.services import sampling
+from src.services.sampling import FixedRateScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sampling, "time", clock)
+    return clock
+
+
+def run(scheduler, clock, work_times):
+    ticks = []
+    for work in work_times:
+        scheduler.wait()
+        ticks.append(round(clock.now - 1000.0, 6))
+        clock.now += work
+        scheduler.record_work(work)
+    return ticks
+
+
+def test_rejects_intervals_below_the_minimum():
+    with pytest.raises(ValueError):
+        FixedRateScheduler(0.05)
+
+
+def test_collection_time_is_compensated(clock):
+    scheduler = FixedRateScheduler(0.5)
+    ticks = run(scheduler, clock, [0.1, 0.3, 0.05, 0.49, 0.2])
+
+    # anchored to the start: no drift however long each collection took
+    assert ticks == [0.0, 0.5, 1.0, 1.5, 2.0]
+    assert scheduler.missed_ticks == 0
+    assert scheduler.achieved_rate == pytest.approx(2.0)
+    stats = scheduler.stats()
+    assert stats["avg_collection_ms"] == pytest.approx(228.0)
+    assert stats["duty_cycle"] == pytest.approx(0.456)
+
+
+def test_overrun_ticks_are_skipped_not_burst(clock):
+    scheduler = FixedRateScheduler(0.1)
+    ticks = run(scheduler, clock, [0.01, 0.35, 0.01, 0.01])
+
+    # the 0.35s collection overran the ticks at 0.2 and 0.3, which are dropped;
+    # the 0.4 tick fires as soon as the collection ends and the cadence resumes
+    assert ticks == [0.0, 0.1, 0.45, 0.5]
+    assert scheduler.missed_ticks == 2
+    assert all(seconds > 0 for seconds in clock.sleeps)
+
+
+def test_achieved_rate_falls_to_what_collection_allows(clock):
+    scheduler = FixedRateScheduler(0.1)
+    ticks = run(scheduler, clock, [0.01] * 10 + [0.25] * 10)
+
+    # 0.25s collections: one tick as each ends, the ones in between dropped
+    assert ticks[10:] == [1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5, 2.75, 3.0, 3.25]
+    assert scheduler.missed_ticks == 13
+    assert scheduler.target_rate == pytest.approx(10.0)
+    assert scheduler.achieved_rate == pytest.approx(19 / 3.25)
+    assert scheduler.stats()["achieved_hz"] == pytest.approx(5.846)
@@ -0,0 +1,104 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from src.core.analyzer import InfrastructureAnalyzer
+from src.core.sinks import AnomalySink, CSVSink, NDJSONSink, StoreSink, open_sink
+
+from conftest import quietly
+
+
+def anomaly(i, **extra):
+    return {'timestamp': f'2024-01-01T00:00:{i:02d}+00:00', 'type': 'cpu_high', 'severity': 'high',
+            'value': 90.0 + i, 'description': f'CPU at {90 + i}%', **extra}
+
+
+def test_a_sink_must_implement_write_batch():
+    with pytest.raises(TypeError):
+        AnomalySink()
+
+    class Partial(AnomalySink):
+        pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_ndjson_is_buffered_until_the_batch_fills(tmp_path):
+    path = tmp_path / 'out' / 'anomalies.ndjson'
+    sink = NDJSONSink(str(path), buffer_size=3)
+    for i in range(4):
+        sink.write(anomaly(i))
+    assert sink.written == 3 and len(sink.buffer) == 1
+
+    sink.close()
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [anomaly(i) for i in range(4)]
+    assert sink.written == 4
+
+
+def test_gzip_follows_the_path_or_the_flag(tmp_path):
+    with NDJSONSink(str(tmp_path / 'a.ndjson.gz')) as sink:
+        sink.write(anomaly(1))
+    with gzip.open(tmp_path / 'a.ndjson.gz', 'rt') as f:
+        assert json.loads(f.read()) == anomaly(1)
+
+    with NDJSONSink(str(tmp_path / 'b.ndjson'), compress=True) as sink:
+        sink.write(anomaly(2))
+    with gzip.open(tmp_path / 'b.ndjson', 'rt') as f:
+        assert json.loads(f.read()) == anomaly(2)
+
+
+def test_csv_puts_extra_keys_in_details(tmp_path):
+    path = tmp_path / 'anomalies.csv'
+    with CSVSink(str(path)) as sink:
+        sink.write(anomaly(1, host='web-1', detector='ewma', score=4.2))
+        sink.write(anomaly(2))
+
+    header, first, second = list(csv.reader(path.open()))
+    assert header == list(CSVSink.COLUMNS) + ['details']
+    assert first[:3] == ['2024-01-01T00:00:01+00:00', 'web-1', 'cpu_high']
+    assert json.loads(first[-1]) == {'detector': 'ewma', 'score': 4.2}
+    assert second[1] == '' and second[-1] == ''
+
+
+def test_store_keeps_the_latest_records(tmp_path):
+    path = tmp_path / 'anomalies.json'
+    with StoreSink(str(path), max_records=3, buffer_size=2) as sink:
+        for i in range(5):
+            sink.write(anomaly(i))
+            if i == 1:
+                assert json.loads(path.read_text()) == [anomaly(0), anomaly(1)]
+    assert json.loads(path.read_text()) == [anomaly(i) for i in (2, 3, 4)]
+    assert not (tmp_path / 'anomalies.json.tmp').exists()
+
+
+def test_open_sink_picks_the_format(tmp_path):
+    kinds = {'a.csv': CSVSink, 'a.csv.gz': CSVSink, 'a.ndjson': NDJSONSink, 'a.jsonl.gz': NDJSONSink}
+    for name, kind in kinds.items():
+        sink = open_sink(str(tmp_path / name))
+        assert isinstance(sink, kind)
+        sink.close()
+
+    store = open_sink(f"store:{tmp_path / 'recent.json'}")
+    assert isinstance(store, StoreSink) and store.output_file == str(tmp_path / 'recent.json')
+
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / 'a.parquet'))
+
+
+@pytest.mark.parametrize('mode', ['batch', 'fused'])
+def test_analyzer_sends_every_anomaly_to_the_sink(mode, tmp_path):
+    path = tmp_path / 'anomalies.ndjson'
+    sink = NDJSONSink(str(path), buffer_size=64)
+    analyzer = InfrastructureAnalyzer(sink=sink, keep_anomalies=True)
+    if mode == 'batch':
+        results = quietly(lambda: analyzer.detect_anomalies(analyzer.load_data('data/raw/rapport.json'), verbose=False))
+    else:
+        results = quietly(lambda: analyzer.analyze_file('data/raw/rapport.json', verbose=False))
+    sink.close()
+
+    exported = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(exported) == results['total_anomalies'] > 0
+    assert exported == json.loads(json.dumps(results['anomalies'], default=str))
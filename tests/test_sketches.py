@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from src.core.models import Metrics
+from src.core.sketches import PercentileTracker, QuantileSketch
+
+QUANTILES = (0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 0.999)
+
+
+def exact(values, q):
+    return np.sort(values)[int(q * (len(values) - 1))]
+
+
+@pytest.fixture(scope="module")
+def latencies():
+    return np.random.default_rng(1).lognormal(mean=5.0, sigma=1.0, size=20000)
+
+
+def test_quantiles_are_within_the_relative_error(latencies):
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    sketch.add_many(latencies)
+    for q in QUANTILES:
+        assert sketch.quantile(q) == pytest.approx(exact(latencies, q), rel=0.01)
+    assert sketch.quantile(0.0) == pytest.approx(latencies.min(), rel=0.01)
+    assert sketch.quantile(1.0) == pytest.approx(latencies.max(), rel=0.01)
+
+
+def test_add_many_matches_add(latencies):
+    one_by_one = QuantileSketch()
+    for value in latencies[:2000]:
+        one_by_one.add(float(value))
+    vectorized = QuantileSketch()
+    vectorized.add_many(latencies[:2000])
+
+    assert dict(one_by_one.bins) == dict(vectorized.bins)
+    assert (one_by_one.count, one_by_one.min, one_by_one.max) == (vectorized.count, vectorized.min, vectorized.max)
+    assert one_by_one.total == pytest.approx(vectorized.total)
+
+
+def test_merged_halves_answer_like_the_whole(latencies):
+    whole = QuantileSketch()
+    whole.add_many(latencies)
+    first, second = QuantileSketch(), QuantileSketch()
+    first.add_many(latencies[:7000])
+    second.add_many(latencies[7000:])
+
+    merged = first.merge(second)
+    assert [merged.quantile(q) for q in QUANTILES] == [whole.quantile(q) for q in QUANTILES]
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(relative_accuracy=0.05))
+
+
+def test_zero_values_share_one_bucket():
+    sketch = QuantileSketch()
+    sketch.add_many(np.array([0.0] * 90 + [0.5] * 10))
+    assert len(sketch.bins) == 1
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(0.95) == pytest.approx(0.5, rel=0.01)
+
+
+def test_bins_are_bounded_and_the_high_end_stays_accurate():
+    # most values spread over many decades, the top 10% within a factor of 3
+    rng = np.random.default_rng(2)
+    values = np.concatenate((np.exp(rng.uniform(-14, 0, 18000)), rng.uniform(100, 300, 2000)))
+    sketch = QuantileSketch(max_bins=64)
+    sketch.add_many(values)
+    assert len(sketch.bins) <= 64
+    for q in (0.9, 0.99):
+        assert sketch.quantile(q) == pytest.approx(exact(values, q), rel=0.01)
+
+
+def test_empty_sketch():
+    assert QuantileSketch().quantile(0.5) is None
+    assert QuantileSketch().describe([0.5]) == {'count': 0, 'p50': None}
+
+
+def metric(hour, host, latency):
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=hour)
+    return Metrics.model_construct(host=host, timestamp=timestamp, latency_ms=latency, error_rate=0.0)
+
+
+@pytest.fixture(scope="module")
+def samples():
+    rng = np.random.default_rng(3)
+    return [metric(i / 10, f"web-{i % 3}", float(rng.lognormal(5.0, 0.5))) for i in range(720)]
+
+
+def test_tracker_columns_match_single_samples(samples):
+    one_by_one = PercentileTracker()
+    for sample in samples:
+        one_by_one.add(sample)
+
+    batched = PercentileTracker()
+    for host in ("web-0", "web-1", "web-2"):
+        series = [sample for sample in samples if sample.host == host]
+        batched.add_batch(series)
+
+    assert batched.summary() == one_by_one.summary()
+
+
+def test_old_windows_fold_into_days_without_losing_samples(samples):
+    tracker = PercentileTracker(max_windows=6)
+    for sample in samples:
+        tracker.add(sample)
+
+    assert all(len(windows) <= 6 for windows in tracker.windows.values())
+    summary = tracker.summary()['latency_ms']
+    assert summary['overall']['count'] == len(samples)
+    assert sum(day['count'] for day in summary['by_day'].values()) == len(samples)
+    assert list(summary['by_day']) == ['2024-01-01', '2024-01-02', '2024-01-03']
+
+
+def test_query_by_host_and_time_range(samples):
+    tracker = PercentileTracker()
+    for sample in samples:
+        tracker.add(sample)
+
+    start = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 20, tzinfo=timezone.utc)
+    picked = [s.latency_ms for s in samples if s.host == "web-1" and start <= s.timestamp < end]
+    sketch = tracker.query('latency_ms', hosts={"web-1"}, start=start, end=end)
+
+    assert sketch.count == len(picked)
+    assert sketch.quantile(0.5) == pytest.approx(exact(np.array(picked), 0.5), rel=0.01)
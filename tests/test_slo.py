@@ -0,0 +1,95 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.core.models import Metrics
+from src.core.slo import BudgetRing, Objective, SLOEngine
+
+START = datetime(2024, 1, 1)
+
+
+def minutes(error_rates, latencies=None, host=None):
+    latencies = latencies or [100.0] * len(error_rates)
+    return [Metrics.model_construct(host=host, timestamp=START + timedelta(minutes=i), error_rate=error_rate,
+                                    latency_ms=latency)
+            for i, (error_rate, latency) in enumerate(zip(error_rates, latencies))]
+
+
+def engine():
+    return SLOEngine([Objective('error_rate', 0.99, 'error_rate'),
+                      Objective('latency', 0.95, 'latency_ms', threshold_ms=300)])
+
+
+def streamed(detector, metrics):
+    detector.reset()
+    return [anomaly for metric in metrics for anomaly in detector.update(metric)]
+
+
+def assert_same(batch, stream):
+    # cumulative sums and running window sums differ in the last bits only
+    assert [(a['timestamp'], a['type'], a['severity'], a['burn_rates']) for a in batch] == \
+        [(a['timestamp'], a['type'], a['severity'], a['burn_rates']) for a in stream]
+    assert [a['value'] for a in batch] == pytest.approx([a['value'] for a in stream])
+
+
+def test_ring_windows_match_brute_force_sums():
+    widths = {'short': 5, 'long': 60}
+    ring = BudgetRing(widths)
+    rng = random.Random(1)
+    added = []
+    bucket = 0
+    for _ in range(3000):
+        bucket += rng.choice([0, 0, 1, 1, 2, 7])
+        # occasionally a late sample for an earlier bucket still in the ring
+        target = bucket - rng.randrange(10) if rng.random() < 0.1 else bucket
+        bad = rng.random()
+        if ring.add(target, bad):
+            added.append((target, bad))
+        for name, width in widths.items():
+            # windows end at the newest bucket added so far
+            inside = [(b, value) for b, value in added if ring.current - width < b <= ring.current]
+            expected_bad = sum(value for _, value in inside)
+            assert ring.window(name) == pytest.approx((expected_bad, float(len(inside))))
+
+
+def test_ring_rejects_samples_older_than_the_longest_window():
+    ring = BudgetRing({'short': 5, 'long': 60})
+    assert ring.add(100, 1.0)
+    assert not ring.add(40, 1.0)
+    assert ring.window('long') == (1.0, 1.0)
+
+
+def test_error_burst_pages_once_per_episode():
+    rates = [0.001] * 360 + [0.5] * 60 + [0.001] * 360
+    metrics = minutes(rates, host='web-1')
+    slo = engine()
+
+    anomalies = slo.detect_batch(metrics)
+    assert_same(anomalies, streamed(slo, metrics))
+    assert [(a['type'], a['severity']) for a in anomalies] == [('error_rate_burn_rate', 'critical'),
+                                                              ('error_rate_burn_rate', 'high')]
+    # 14.4x over an hour needs 18 bad minutes at a 50% error rate; 6x over six hours needs 43
+    assert anomalies[0]['timestamp'] == metrics[360 + 17].timestamp.isoformat()
+    assert anomalies[1]['timestamp'] == metrics[360 + 42].timestamp.isoformat()
+    assert anomalies[0]['host'] == 'web-1'
+
+
+def test_slow_samples_burn_the_latency_budget():
+    latencies = [100.0] * 120 + [900.0] * 60 + [100.0] * 120
+    metrics = minutes([0.0] * len(latencies), latencies)
+    slo = engine()
+
+    anomalies = slo.detect_batch(metrics)
+    assert_same(anomalies, streamed(slo, metrics))
+    # against a 5% budget, 14.4x over an hour means 44 of the last 60 samples slower than 300 ms
+    assert [(a['type'], a['severity']) for a in anomalies] == [('latency_burn_rate', 'critical'),
+                                                              ('latency_burn_rate', 'high')]
+    assert anomalies[0]['timestamp'] == metrics[120 + 43].timestamp.isoformat()
+
+
+def test_healthy_service_raises_nothing():
+    metrics = minutes([0.002] * 1000)
+    slo = engine()
+    assert slo.detect_batch(metrics) == []
+    assert streamed(slo, metrics) == []
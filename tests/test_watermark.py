@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, timedelta
+
+from src.core.analyzer import InfrastructureAnalyzer
+from src.core.models import Metrics
+from src.core.watermark import ReorderBuffer
+
+START = datetime(2024, 1, 1)
+
+
+def at(second, host="web-1"):
+    return Metrics.model_construct(host=host, timestamp=START + timedelta(seconds=second))
+
+
+def seconds(metrics):
+    return [int((metric.timestamp - START).total_seconds()) for metric in metrics]
+
+
+def drain(buffer, metrics):
+    released = []
+    for metric in metrics:
+        released.extend(buffer.push(metric))
+    return released + list(buffer.flush())
+
+
+def test_releases_late_samples_in_order():
+    buffer = ReorderBuffer(timedelta(seconds=10))
+    released = drain(buffer, [at(s) for s in (0, 5, 3, 12, 8, 20, 30)])
+
+    assert seconds(released) == [0, 3, 5, 8, 12, 20, 30]
+    assert buffer.stats()['reordered_samples'] == 2
+    assert buffer.stats()['late_samples_dropped'] == 0
+
+
+def test_holds_samples_until_the_watermark_passes():
+    buffer = ReorderBuffer(timedelta(seconds=10))
+    assert buffer.push(at(0)) == []
+    assert buffer.push(at(5)) == []
+    assert seconds(buffer.push(at(12))) == [0]
+    assert seconds(buffer.push(at(16))) == [5]
+
+
+def test_drops_samples_older_than_the_watermark():
+    buffer = ReorderBuffer(timedelta(seconds=10))
+    released = drain(buffer, [at(0), at(30), at(15), at(19)])
+
+    assert seconds(released) == [0, 30]
+    assert buffer.dropped_late == 2
+
+
+def test_watermarks_are_per_host():
+    buffer = ReorderBuffer(timedelta(seconds=10))
+    released = drain(buffer, [at(100, "web-1"), at(5, "web-2"), at(0, "web-2")])
+
+    assert [(m.host, s) for m, s in zip(released, seconds(released))] == [
+        ("web-1", 100), ("web-2", 0), ("web-2", 5)]
+    assert buffer.dropped_late == 0
+
+
+def test_full_buffer_releases_oldest_early_and_advances_the_watermark():
+    buffer = ReorderBuffer(timedelta(hours=1), max_buffered=2)
+    released = []
+    for s in (3, 1, 2):
+        released.extend(buffer.push(at(s)))
+    assert seconds(released) == [1]
+    assert buffer.forced_releases == 1
+
+    # older than what was already released early: too late now
+    assert buffer.push(at(0)) == []
+    assert buffer.dropped_late == 1
+
+
+def test_shuffled_stream_within_lateness_matches_sorted_stream(records):
+    metrics = list(InfrastructureAnalyzer().validate_stream(records))
+    # displace samples by at most 5 positions (~2.5 hours apart at most)
+    rng = random.Random(1)
+    shuffled = [metric for _, metric in sorted((i + rng.uniform(0, 5), metric) for i, metric in enumerate(metrics))]
+
+    expected = InfrastructureAnalyzer().detect_anomalies_stream(metrics, verbose=False)
+    reordered = InfrastructureAnalyzer().detect_anomalies_stream(shuffled, verbose=False,
+                                                                 allowed_lateness=timedelta(hours=6))
+
+    assert reordered.pop('late_samples_dropped') == 0
+    assert reordered.pop('watermark')['reordered_samples'] > 0
+    assert reordered == expected